@@ -1,14 +1,13 @@
 import re
 import traceback
 from typing import Literal
-from io import StringIO
-import rdflib
-from rdflib import Graph
 
 from langgraph.types import Command
 
 from approaches.Network.Gen2.setup import cIEState, model, langfuse_handler
-from helper_tools.wikidata_loader import send_query, get_property_example, get_label
+from helper_tools.turtle_parser import parse_turtle_triples
+from helper_tools.property_neighborhood import get_cached_property_examples, get_property_labels, get_property_neighborhoods
+from helper_tools.validation import get_type_matches
 
 
 def agent(state: cIEState) -> Command[Literal] | tuple[cIEState, str]:
@@ -17,155 +16,76 @@ def agent(state: cIEState) -> Command[Literal] | tuple[cIEState, str]:
         tool_id = "network_traversal_search"
         tool_input = state.get("tool_input", "")
         
-        # Parse the turtle input using RDFLib
-        g = Graph()
-        try:
-            g.parse(StringIO(state["tool_input"]), format="turtle")
-        except Exception as e:
-            error_message = f"Failed to parse turtle input: {str(e)}"
+        # Parse the turtle input
+        triples, error = parse_turtle_triples(state["tool_input"])
+        if error:
+            error_message = f"Failed to parse turtle input: {str(error)}"
             if state["debug"]:
                 state["tool_input"] = error_message
-                return state, f"Error parsing turtle input: {str(e)}"
+                return state, f"Error parsing turtle input: {str(error)}"
             return Command(goto="uri_mapping_and_refinement", update={
                 "agent_instruction": error_message,
                 "call_trace": state.get("call_trace", []) + [(tool_id, tool_input)]
             })
         
+        # Neighborhoods of all distinct predicates are fetched at once and cached across documents
+        neighborhoods = get_property_neighborhoods([predicate_uri for _, predicate_uri, _ in triples])
+
+        # Evaluate all type restrictions of all neighbors in bulk
+        type_matches = get_type_matches(
+            (entity_uri, constraint_uri)
+            for subject_uri, predicate_uri, object_uri in triples
+            for direction in ("super", "sub")
+            for prop in neighborhoods[predicate_uri][direction]
+            for entity_uri, constraints in ((subject_uri, prop["subject_constraints"]), (object_uri, prop["value_constraints"]))
+            for constraint_uri, _ in constraints
+        )
+
+        def matched_type_labels(entity_uri, constraints):
+            labels = [
+                constraint_label if constraint_label != constraint_uri else "No Label"
+                for constraint_uri, constraint_label in constraints
+                if (entity_uri, constraint_uri) in type_matches
+            ]
+            return list(dict.fromkeys(labels))
+
+        def format_properties(neighbors, subject_uri, object_uri):
+            # One entry per combination of matched type restrictions, like the rows of the former SPARQL query
+            properties = []
+            for prop in neighbors:
+                for subject_type_label in matched_type_labels(subject_uri, prop["subject_constraints"]) or [None]:
+                    for value_type_label in matched_type_labels(object_uri, prop["value_constraints"]) or [None]:
+                        properties.append({
+                            "uri": prop["uri"],
+                            "label": prop["label"],
+                            "subject_type_matched": "true" if subject_type_label is not None else "false",
+                            "value_type_matched": "true" if value_type_label is not None else "false",
+                            "value_type_label": value_type_label or "No Label",
+                            "subject_type_label": subject_type_label or "No Label"
+                        })
+            return properties
+
         all_results = {}
         
-        for s, p, o in g:
-            predicate_uri = str(p)
-            subject_uri = str(s)
-            object_uri = str(o)
+        for subject_uri, predicate_uri, object_uri in triples:
             
             triple_key = f"{subject_uri}, {predicate_uri}, {object_uri}"
             
-            # Updated super-properties query
-            super_properties_query = f"""
-            SELECT DISTINCT ?superProperty ?superPropertyLabel ?ValueTypeMatched ?SubjectTypeMatched ?valueTypeLabel ?subjectTypeLabel
-            WHERE {{
-              # Step 1: Super property relationship
-              <{predicate_uri}> wdt:P1647 ?superProperty .
-
-              OPTIONAL {{
-                ?superProperty p:P2302 ?csVT .
-                ?csVT ps:P2302 wd:Q21510865 .  # value type constraint
-                ?csVT pq:P2308 ?expectedValueType .
-                <{object_uri}> wdt:P31|wdt:P31/wdt:P279 ?expectedValueType .
-                OPTIONAL {{ ?expectedValueType rdfs:label ?valueTypeLabel . FILTER(LANG(?valueTypeLabel) = "en") }}
-              }}
-
-              OPTIONAL {{
-                ?superProperty p:P2302 ?csST .
-                ?csST ps:P2302 wd:Q21503250 .  # subject type constraint
-                ?csST pq:P2308 ?eST .
-                <{subject_uri}> wdt:P31|wdt:P31/wdt:P279 ?eST .
-                OPTIONAL {{ ?eST rdfs:label ?subjectTypeLabel . FILTER(LANG(?subjectTypeLabel) = "en") }}
-              }}
-
-              BIND(BOUND(?expectedValueType) AS ?ValueTypeMatched)
-              BIND(BOUND(?eST) AS ?SubjectTypeMatched)
-
-              SERVICE wikibase:label {{
-                bd:serviceParam wikibase:language "en" .
-                ?superProperty rdfs:label ?superPropertyLabel .
-              }}
-            }}
-            ORDER BY DESC(?ValueTypeMatched)
-            """
-            
-            # Updated sub-properties query
-            sub_properties_query = f"""
-            SELECT DISTINCT ?subProperty ?subPropertyLabel ?ValueTypeMatched ?SubjectTypeMatched ?valueTypeLabel ?subjectTypeLabel
-            WHERE {{
-              # Step 1: Subproperty of
-              ?subProperty wdt:P1647 <{predicate_uri}> .
-
-              OPTIONAL {{
-                ?subProperty p:P2302 ?csVT .
-                ?csVT ps:P2302 wd:Q21510865 .  # value type constraint
-                ?csVT pq:P2308 ?expectedValueType .
-                <{object_uri}> wdt:P31|wdt:P31/wdt:P279 ?expectedValueType .
-                OPTIONAL {{ ?expectedValueType rdfs:label ?valueTypeLabel . FILTER(LANG(?valueTypeLabel) = "en") }}
-              }}
-
-              OPTIONAL {{
-                ?subProperty p:P2302 ?csST .
-                ?csST ps:P2302 wd:Q21503250 .  # subject type constraint
-                ?csST pq:P2308 ?eST .
-                <{subject_uri}> wdt:P31|wdt:P31/wdt:P279 ?eST .
-                OPTIONAL {{ ?eST rdfs:label ?subjectTypeLabel . FILTER(LANG(?subjectTypeLabel) = "en") }}
-              }}
-
-              BIND(BOUND(?expectedValueType) AS ?ValueTypeMatched)
-              BIND(BOUND(?eST) AS ?SubjectTypeMatched)
-
-              SERVICE wikibase:label {{
-                bd:serviceParam wikibase:language "en" .
-                ?subProperty rdfs:label ?subPropertyLabel .
-              }}
-            }}
-            ORDER BY DESC(?ValueTypeMatched)
-            """
-            
-            # Execute queries using send_query from wikidata_loader
-            super_properties_results = send_query(super_properties_query)
-            sub_properties_results = send_query(sub_properties_query)
-            
-            # Format the results - updated to handle new query response format
-            super_properties = []
-            try:
-                for binding in super_properties_results["results"]["bindings"]:
-                    prop_uri = binding["superProperty"]["value"] if "superProperty" in binding else ""
-                    prop_label = binding["superPropertyLabel"]["value"] if "superPropertyLabel" in binding else "No Label"
-                    subject_type_matched = binding["SubjectTypeMatched"]["value"] if "SubjectTypeMatched" in binding else "false"
-                    value_type_matched = binding["ValueTypeMatched"]["value"] if "ValueTypeMatched" in binding else "false"
-                    value_type_label = binding["valueTypeLabel"]["value"] if "valueTypeLabel" in binding else "No Label"
-                    subject_type_label = binding["subjectTypeLabel"]["value"] if "subjectTypeLabel" in binding else "No Label"
-                    
-                    super_properties.append({
-                        "uri": prop_uri, 
-                        "label": prop_label, 
-                        "subject_type_matched": subject_type_matched, 
-                        "value_type_matched": value_type_matched,
-                        "value_type_label": value_type_label,
-                        "subject_type_label": subject_type_label
-                    })
-            except Exception as e:
-                if state["debug"]:
-                    print(f"Error parsing super properties: {str(e)}")
-                super_properties = []
-            
-            sub_properties = []
-            try:
-                for binding in sub_properties_results["results"]["bindings"]:
-                    prop_uri = binding["subProperty"]["value"] if "subProperty" in binding else ""
-                    prop_label = binding["subPropertyLabel"]["value"] if "subPropertyLabel" in binding else "No Label"
-                    subject_type_matched = binding["SubjectTypeMatched"]["value"] if "SubjectTypeMatched" in binding else "false"
-                    value_type_matched = binding["ValueTypeMatched"]["value"] if "ValueTypeMatched" in binding else "false"
-                    value_type_label = binding["valueTypeLabel"]["value"] if "valueTypeLabel" in binding else "No Label"
-                    subject_type_label = binding["subjectTypeLabel"]["value"] if "subjectTypeLabel" in binding else "No Label"
-                    
-                    sub_properties.append({
-                        "uri": prop_uri, 
-                        "label": prop_label, 
-                        "subject_type_matched": subject_type_matched, 
-                        "value_type_matched": value_type_matched,
-                        "value_type_label": value_type_label,
-                        "subject_type_label": subject_type_label
-                    })
-            except Exception as e:
-                if state["debug"]:
-                    print(f"Error parsing sub properties: {str(e)}")
-                sub_properties = []
-            
             all_results[triple_key] = {
                 "subject_uri": subject_uri,
                 "predicate_uri": predicate_uri,
                 "object_uri": object_uri,
-                "super_properties": super_properties,
-                "sub_properties": sub_properties
+                "super_properties": format_properties(neighborhoods[predicate_uri]["super"], subject_uri, object_uri),
+                "sub_properties": format_properties(neighborhoods[predicate_uri]["sub"], subject_uri, object_uri)
             }
+
+        # Examples of all predicates and neighbors and the labels of all predicates in one batch each
+        property_examples = get_cached_property_examples(
+            [results["predicate_uri"] for results in all_results.values()] +
+            [prop["uri"] for results in all_results.values()
+             for prop in results["super_properties"] + results["sub_properties"]]
+        )
+        predicate_labels = get_property_labels(results["predicate_uri"] for results in all_results.values())
         
         # Format the combined response with updated organization by triple
         response = "Possible Predicate Replacements:\n\n"
@@ -206,11 +126,11 @@ def agent(state: cIEState) -> Command[Literal] | tuple[cIEState, str]:
             response += f"## Possible Predicate Replacements for Triple: {triple_key}\n\n"
             
             # Get an example for the current predicate
-            predicate_example = get_property_example(results['predicate_uri'])
+            predicate_example = property_examples[results['predicate_uri']]
             if predicate_example:
                 response += f"### Current Predicate Example:\n"
                 response += f"Property: {results['predicate_uri']}\n"
-                current_pred_label = get_label(results['predicate_uri'])
+                current_pred_label = predicate_labels[results['predicate_uri']]
                 response += f"Label: {current_pred_label}\n"
                 response += f"Example: {predicate_example['subject_label']}; {current_pred_label}; {predicate_example['object_label']}\n"
 
@@ -219,7 +139,7 @@ def agent(state: cIEState) -> Command[Literal] | tuple[cIEState, str]:
                 response += f"URI: {prop['uri']}\nLabel: {prop['label']}\n"
                 
                 # Get and display example for this super-property
-                prop_example = get_property_example(prop['uri'])
+                prop_example = property_examples[prop['uri']]
                 if prop_example:
                     response += f"Example: {prop_example['subject_label']}; {prop['label']}; {prop_example['object_label']}\n"
 
@@ -243,7 +163,7 @@ def agent(state: cIEState) -> Command[Literal] | tuple[cIEState, str]:
                 response += f"URI: {prop['uri']}\nLabel: {prop['label']}\n"
                 
                 # Get and display example for this sub-property
-                prop_example = get_property_example(prop['uri'])
+                prop_example = property_examples[prop['uri']]
                 if prop_example:
                     response += f"Example: {prop_example['subject_label']}; {prop['label']}; {prop_example['object_label']}\n"
 
@@ -1,8 +1,8 @@
 import traceback
 from typing import Literal
-from rdflib import Graph
 from langgraph.types import Command
-from helper_tools.validation import validate_triple, validate_turtle_response
+from helper_tools.turtle_parser import parse_turtle_triples
+from helper_tools.validation import validate_triples
 from approaches.Network.Gen2.setup import cIEState
 
 def agent(state: cIEState) -> Command[Literal] | tuple[cIEState, str]:
@@ -36,9 +36,10 @@ def agent(state: cIEState) -> Command[Literal] | tuple[cIEState, str]:
                 return state, f"Error: {error_message}"
             return Command(goto="validation_and_output", update=state_update)
 
-        # First validate if the Turtle string is valid
-        is_valid, error_message = validate_turtle_response(turtle_string)
-        if not is_valid:
+        # Parse the Turtle string, which also validates it
+        triples, error = parse_turtle_triples(turtle_string)
+        if error:
+            error_message = str(error)
             state_update = {
                 "tool_input": "",
                 "agent_instruction": f"SYSTEM MESSAGE: Invalid Turtle string: {error_message}",
@@ -49,16 +50,10 @@ def agent(state: cIEState) -> Command[Literal] | tuple[cIEState, str]:
                 return state, f"Error: Invalid Turtle string: {error_message}"
             return Command(goto="validation_and_output", update=state_update)
 
-        # Parse the Turtle string into a graph
-        graph = Graph()
-        graph.parse(data=turtle_string, format="turtle")
-
-        # Validate each triple
+        # Validate all triples in one batch
         results = []
-        for subject, predicate, obj in graph:
-            subject_restriction_matched, unmatched_subject_constraints, object_restriction_matched, unmatched_object_constraints = validate_triple(
-                str(subject), str(predicate), str(obj)
-            )
+        for (subject, predicate, obj), validation in zip(triples, validate_triples(triples)):
+            subject_restriction_matched, unmatched_subject_constraints, object_restriction_matched, unmatched_object_constraints = validation
             
             result = f"Triple: {subject} {predicate} {obj}\n"
             result += f"Subject Type Restriction Matched: {subject_restriction_matched}"
@@ -1,59 +1,41 @@
 import re
 import traceback
 from typing import List, Tuple, Literal
-from rdflib import Graph, URIRef
-from helper_tools.wikidata_loader import send_query
+from helper_tools.turtle_parser import parse_turtle_triples
+from helper_tools.wikidata_loader import get_uri_labels
 from langgraph.types import Command
 from approaches.Network.Gen2.setup import cIEState
 
-def parse_turtle(turtle_string: str) -> List[Tuple[URIRef, URIRef, URIRef]]:
-    """Parse turtle string into list of triples using rdflib."""
-    g = Graph()
-    try:
-        g.parse(data=turtle_string, format="turtle")
-        return list(g.triples((None, None, None)))
-    except Exception as e:
-        raise ValueError(f"Failed to parse turtle string: {str(e)}")
+def parse_turtle(turtle_string: str) -> List[Tuple[str, str, str]]:
+    """Parse turtle string into list of triples."""
+    triples, error = parse_turtle_triples(turtle_string)
+    if error:
+        raise ValueError(f"Failed to parse turtle string: {str(error)}")
+    return triples
+
+def format_uri_label(uri: str, exists: bool, label: str | None) -> str:
+    """Format the label of a URI, noting URIs that do not exist or have no English label."""
+    if not exists:
+        return f"{uri} (URI does not exist)"
+    if label is None:
+        return f"{uri} (URI exists but has no English label)"
+    return label
 
 def get_labels_for_uri(uri: str) -> str:
     """Get label for a Wikidata URI using SPARQL."""
-    # First check if the URI exists
-    existence_query = f"""
-    ASK {{
-        <{uri}> ?p ?o .
-    }}
-    """
-    
-    existence_response = send_query(existence_query)
-    if not existence_response or not existence_response.get('boolean', False):
-        return f"{uri} (URI does not exist)"
-    
-    # If URI exists, try to get the label
-    query = f"""
-    SELECT ?label
-    WHERE {{
-        <{uri}> rdfs:label ?label .
-        FILTER(LANG(?label) = "en")
-    }}
-    LIMIT 1
-    """
-    
-    response = send_query(query)
-    if response and 'results' in response and 'bindings' in response['results']:
-        bindings = response['results']['bindings']
-        if bindings and 'label' in bindings[0]:
-            return bindings[0]['label']['value']
-    return f"{uri} (URI exists but has no English label)"
+    return format_uri_label(uri, *get_uri_labels([uri])[uri])
 
 def turtle_to_labels(turtle_string: str) -> str:
     """Convert turtle triples to their corresponding labels."""
     triples = parse_turtle(turtle_string)
+    # Every distinct URI is resolved once, with one existence and label query per chunk
+    uri_labels = get_uri_labels([str(term) for triple in triples for term in triple])
     labeled_triples = []
     
     for subj, pred, obj in triples:
-        subj_label = get_labels_for_uri(str(subj))
-        pred_label = get_labels_for_uri(str(pred))
-        obj_label = get_labels_for_uri(str(obj))
+        subj_label = format_uri_label(str(subj), *uri_labels[str(subj)])
+        pred_label = format_uri_label(str(pred), *uri_labels[str(pred)])
+        obj_label = format_uri_label(str(obj), *uri_labels[str(obj)])
         
         labeled_triple = f"{subj_label} {pred_label} {obj_label}"
         labeled_triples.append(labeled_triple)
@@ -10,7 +10,7 @@ importlib.reload(approaches.Supervisor.Gen1v2.prompts)
 
 from approaches.Supervisor.Gen1v2.setup import cIEState, model, langfuse_handler, label_vector_store, description_vector_store
 from approaches.Supervisor.Gen1v2.prompts import uri_retriever_prompt as prompt
-from qdrant_client.http import models
+from helper_tools.vector_search import SearchRequest, batch_similarity_search_with_score, type_filter
 
 
 
@@ -38,48 +38,23 @@ def agent(state: cIEState) -> Command[Literal] | tuple[cIEState, str]:
             description_search_terms.append(clean_term)
             description_filters.append(filter_mode)
 
-    # Perform similarity searches with filters
+    # Perform similarity searches with filters, embedding and searching all terms at once
+    all_results = batch_similarity_search_with_score(
+        [SearchRequest(term, label_vector_store, k=3, filter=type_filter(filter_mode))
+         for term, filter_mode in zip(label_search_terms, label_filters)] +
+        [SearchRequest(term, description_vector_store, k=3, filter=type_filter(filter_mode))
+         for term, filter_mode in zip(description_search_terms, description_filters)]
+    )
+    label_results = all_results[:len(label_search_terms)]
+    description_results = all_results[len(label_search_terms):]
+
     search_response = ""
-    for i, term in enumerate(label_search_terms):
-        filter_mode = label_filters[i]
-        filter_condition = models.Filter(
-            must=[
-                models.FieldCondition(
-                    key="metadata.type",
-                    match=models.MatchValue(value="entity" if filter_mode == "Q" else "predicate" if filter_mode == "P" else None)
-                )
-            ]
-        )
-        
-        results = label_vector_store.similarity_search(
-            term, 
-            k=3,
-            filter=filter_condition
-        ) if filter_mode else label_vector_store.similarity_search(
-            term, 
-            k=3
-        )
+    for term, results in zip(label_search_terms, label_results):
+        results = [doc for doc, _ in results]
         search_response += f'Most Similar rdfs:label Search Results for {term}:{[{"label": doc.page_content, "uri": doc.metadata["uri"], "description": doc.metadata["description"]} for doc in results]}\n\n'
     
-    for i, term in enumerate(description_search_terms):
-        filter_mode = description_filters[i]
-        filter_condition = models.Filter(
-            must=[
-                models.FieldCondition(
-                    key="metadata.type",
-                    match=models.MatchValue(value="entity" if filter_mode == "Q" else "predicate" if filter_mode == "P" else None)
-                )
-            ]
-        )
-        
-        results = description_vector_store.similarity_search(
-            term, 
-            k=3,
-            filter=filter_condition
-        ) if filter_mode else description_vector_store.similarity_search(
-            term, 
-            k=3
-        )
+    for term, results in zip(description_search_terms, description_results):
+        results = [doc for doc, _ in results]
         search_response += f'Most Similar schema:description Search Results for {term}:{[{"label": doc.metadata["label"], "uri": doc.metadata["uri"], "description": doc.page_content} for doc in results]}\n\n'
     
     search_response = search_response.replace("},", "},\n")
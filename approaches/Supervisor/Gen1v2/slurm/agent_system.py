@@ -11,8 +11,6 @@ sys.path.append(repo.working_dir)
 
 import re
 
-from tqdm import tqdm
-
 import helper_tools.parser as parser
 import importlib
 import pandas as pd
@@ -26,6 +24,7 @@ from approaches.Supervisor.Gen1v2.agents.triple_extractor import agent as triple
 from approaches.Supervisor.Gen1v2.agents.uri_retriever import agent as uri_retriever_agent
 from approaches.Supervisor.Gen1v2.agents.turtle_extractor import agent as turtle_extraction_agent
 from helper_tools.evaluation import evaluate_doc, calculate_scores_from_array
+from helper_tools.runner import run_documents, ErrorRow, RunJournal
 from dotenv import load_dotenv
 import json
 import argparse
@@ -43,6 +42,8 @@ arg_parser.add_argument("--split", type=str, required=True, help="Dataset split
 arg_parser.add_argument("--num_samples", type=int, required=True, help="Number of samples to process")
 arg_parser.add_argument("--dataset", type=str, required=True, help="Dataset to use (e.g., synthie_code, rebel, redfm)")
 arg_parser.add_argument("--description", type=str, help="Optional description for the evaluation log")
+arg_parser.add_argument("--max_concurrency", type=int, default=8, help="Maximum number of documents processed concurrently")
+arg_parser.add_argument("--overwrite", action="store_true", help="Start from scratch instead of resuming the journal of an interrupted run")
 args = arg_parser.parse_args()
 
 split = args.split
@@ -50,6 +51,10 @@ number_of_samples = args.num_samples
 dataset = args.dataset
 description = args.description
 
+# Resume the journal of an interrupted run before loading the dataset
+journal_path = f"{repo.working_dir}/approaches/evaluation_logs/Gen1v2/journals/{dataset}-{split}-{number_of_samples}-{os.getenv('LLM_MODEL_PROVIDER')}_{os.getenv('LLM_MODEL_ID').replace('/', '-')}.jsonl"
+journal = RunJournal(journal_path, overwrite=args.overwrite)
+
 # Load dataset
 triple_df, entity_df, docs = parser.unified_parser(dataset, split, number_of_samples)
 entity_set = entity_df[['entity', 'entity_uri']].drop_duplicates()
@@ -67,13 +72,10 @@ builder.add_edge(START, "planner")
 
 graph = builder.compile()
 
-evaluation_log = []
 
-for i in tqdm(range(len(docs))):
-    target_doc = docs.iloc[i]
-    doc_id = target_doc["docid"]
-    text = target_doc["text"]
+def process_doc(doc_id, text):
     trace_id = str(uuid.uuid4())
+    failed = False
     try:
         response = graph.invoke({
             "text": text,
@@ -98,11 +100,17 @@ for i in tqdm(range(len(docs))):
         langfuse_client.score(trace_id=trace_id, name="F1-Score", value=score.loc["Triple"]["F1-Score"])
     except Exception as e:
         error_msg = f"Error: {str(e)}\nTraceback:\n{traceback.format_exc()}"
+        failed = True
         turtle_string = ""
         response = {"messages":[error_msg]}
         langfuse_client.score(trace_id=trace_id, name="F1-Score", value=0)
         
-    evaluation_log.append([doc_id, *evaluate_doc(turtle_string, doc_id, triple_df), response["messages"][-1], trace_id])
+    row = [doc_id, *evaluate_doc(turtle_string, doc_id, triple_df), response["messages"][-1], trace_id]
+    return ErrorRow(row) if failed else row
+
+
+evaluation_log = run_documents(process_doc, docs, max_concurrency=args.max_concurrency, journal=journal)
+journal.close()
 
 evaluation_log_df = pd.DataFrame(
     evaluation_log,
@@ -126,6 +134,8 @@ except Exception as e:
     print(e)
     evaluation_log_df.to_excel(f"Output.xlsx", index=False)
 
+journal.finish()
+
 if description:
     log_notes_path = f"{repo.working_dir}/approaches/evaluation_logs/log_notes.json"
     try:
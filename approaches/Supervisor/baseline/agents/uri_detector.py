@@ -8,7 +8,7 @@ from langgraph.types import Command
 from approaches.Supervisor.baseline.setup import cIEState, model, langfuse_handler
 from approaches.Supervisor.baseline.prompts import uri_detection_prompt as prompt
 import approaches.Supervisor.baseline.prompts
-from qdrant_client.http import models
+from helper_tools.vector_search import SearchRequest, batch_similarity_search_with_score, type_filter
 from helper_tools.base_setup import label_vector_store, description_vector_store, example_vector_store
 import importlib
 
@@ -20,6 +20,7 @@ def agent(state: cIEState) -> Command[Literal["supervisor"]] | tuple[cIEState, s
         search_terms = state["instruction"].split(",")
         search_response = ""
         
+        parsed_terms = []
         for term in search_terms:
             term = term.strip()
             if not term:
@@ -35,11 +36,19 @@ def agent(state: cIEState) -> Command[Literal["supervisor"]] | tuple[cIEState, s
                 if mode_match:
                     mode = mode_match.group(1)
                     clean_term = re.sub(r'\[([QPX])\]', '', term).strip()
-            
+            parsed_terms.append((clean_term, mode))
+
+        # Embed and search all terms at once, examples are searched for mode X and labels (filtered by Q/P) otherwise
+        all_results = batch_similarity_search_with_score([
+            SearchRequest(clean_term, example_vector_store if mode == 'X' else label_vector_store, k=3,
+                          filter=type_filter(mode))
+            for clean_term, mode in parsed_terms
+        ])
+
+        for (clean_term, mode), results in zip(parsed_terms, all_results):
             # Default behavior if no mode is specified
             if not mode:
                 # Assume it's a label search
-                results = label_vector_store.similarity_search_with_score(clean_term, k=3)
                 search_response += f'Most Similar Search Results for "{clean_term}" - Default Search Mode (LABEL):\n'
                 
                 for idx, (doc, sim_score) in enumerate(results):
@@ -49,26 +58,8 @@ def agent(state: cIEState) -> Command[Literal["supervisor"]] | tuple[cIEState, s
                 search_response += "\n"
                 continue
             
-            # Create filter condition if mode is Q or P
-            filter_condition = None
-            if mode in ['Q', 'P']:
-                filter_condition = models.Filter(
-                    must=[
-                        models.FieldCondition(
-                            key="metadata.type",
-                            match=models.MatchValue(value="entity" if mode == "Q" else "predicate")
-                        )
-                    ]
-                )
-            
-            # Perform search based on the mode
             if mode in ['Q', 'P']:
-                # Search in labels with type filter
-                results = label_vector_store.similarity_search_with_score(
-                    clean_term, 
-                    k=3,
-                    filter=filter_condition
-                )
+                # Labels with type filter
                 search_response += f'Similar Search Results for "{clean_term}" - Search Mode [{mode}]:\n'
                 
                 for idx, (doc, sim_score) in enumerate(results):
@@ -79,11 +70,7 @@ def agent(state: cIEState) -> Command[Literal["supervisor"]] | tuple[cIEState, s
                         search_response += f"     Example: {doc.metadata['example']}\n"
 
             elif mode == 'X':
-                # Search in examples collection
-                results = example_vector_store.similarity_search_with_score(
-                    clean_term, 
-                    k=3
-                )
+                # Examples collection
                 search_response += f'Similar Search Results for "{clean_term}" - Search Mode [X]:\n'
                 
                 for idx, (doc, sim_score) in enumerate(results):
@@ -80,10 +80,12 @@ if uploaded_file:
     excel_buffer.seek(0)
     report = generate_report(excel_buffer)
     st.write(report)
+    docs_by_id = stss.docs.set_index(stss.docs["docid"].astype(str))
     for _, row in filtered_df.iterrows():
         with st.container(border=True):
             score = calculate_scores_from_array(row.to_list()[1:(22-len(row))])
-            st.write(stss.docs[stss.docs["docid"].astype(str) == str(row["Doc ID"])].iloc[0]["text"])
+            doc = docs_by_id.loc[str(row["Doc ID"])]
+            st.write(doc["text"])
             st.write(score.loc["Triple"]["F1-Score"])
             result_string = str(row["Result String"])
             turtle_string_match = re.search(r'<ttl>(.*?)</ttl>', result_string, re.DOTALL)
@@ -101,7 +103,7 @@ if uploaded_file:
                 st.write(get_uri_labels(result_df)[["subject", "predicate","object"]])
                 st.divider()
                 st.write("*Actual Triples*")
-                st.write(stss.relation_df[stss.relation_df["docid"].astype(str) == str(row["Doc ID"])][["subject", "predicate","object"]])
+                st.write(parser.get_doc_triples(stss.relation_df, doc["docid"])[["subject", "predicate","object"]])
                 st.divider()
                 st.write("*Score*")
                 st.write(score)
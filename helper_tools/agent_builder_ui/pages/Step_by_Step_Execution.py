@@ -219,7 +219,7 @@ def run_agent(id, module):
     return response
 
 with st.expander("Expected Result"):
-    st.write(stss.relation_df[stss.relation_df["docid"] == stss.docs.iloc[stss.doc_index]["docid"]][
+    st.write(parser.get_doc_triples(stss.relation_df, stss.docs.iloc[stss.doc_index]["docid"])[
                  ["subject", "predicate", "object"]])
 
 col1, col2, col3 = st.columns(3)
@@ -255,5 +255,5 @@ if st.button("Run Evaluation"):
     result_df, error = parse_turtle(turtle_string)
     st.write(get_uri_labels(result_df)[
                  ["subject", "predicate", "object"]])
-    st.write(stss.relation_df[stss.relation_df["docid"] == stss.docs.iloc[stss.doc_index]["docid"]][
+    st.write(parser.get_doc_triples(stss.relation_df, stss.docs.iloc[stss.doc_index]["docid"])[
                  ["subject", "predicate", "object"]])
@@ -10,11 +10,14 @@ from langchain_community.vectorstores import FAISS
 from langchain_ollama import OllamaEmbeddings
 from langchain_ollama.chat_models import ChatOllama
 from langchain_openai import ChatOpenAI
-from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_core.globals import set_llm_cache
 from langchain_qdrant import QdrantVectorStore
 from langfuse import Langfuse
 from langfuse.callback import CallbackHandler
 from qdrant_client import QdrantClient
+from .embedding_cache import EMBEDDING_CACHE_PATH, CachedEmbeddings
+from .llm_cache import LLM_CACHE_PATH, SQLiteLLMCache
+from .llm_rate_limiter import AdaptiveRateLimiter, get_model_limits
 from .fuseki_handler import FusekiClient, check_datasets, init_db
 
 # Configure logging
@@ -30,19 +33,28 @@ load_dotenv(repo.working_dir + "/.env", override=True)
 
 llm_provider = os.getenv("LLM_MODEL_PROVIDER")
 model_id = os.getenv("LLM_MODEL_ID")
-req_per_second = int(os.getenv("LLM_RPM")) / 60
-logger.info(f"Initializing {model_id} at {llm_provider} - {req_per_second * 60} RPM")
-
-if req_per_second > 0:
-    rate_limiter = InMemoryRateLimiter(requests_per_second=req_per_second, check_every_n_seconds=0.1)
+llm_rpm, llm_tpm = get_model_limits(llm_provider, model_id)
+logger.info(f"Initializing {model_id} at {llm_provider} - {llm_rpm} RPM, {llm_tpm} TPM")
+
+# Shared by all models of the process. Providers without a known limit start at LLM_INITIAL_RPM and may scale up
+# to LLM_MAX_RPM, backing off on 429s and latency spikes. Providers with a known limit are held at it and only back
+# off on 429s, as the latency of their calls mostly depends on the length of the answers.
+if llm_rpm > 0:
+    rate_limiter = AdaptiveRateLimiter(max_rpm=llm_rpm, tpm=llm_tpm, latency_backoff=False)
 else:
-    rate_limiter = InMemoryRateLimiter(requests_per_second=100, check_every_n_seconds=0.1)
+    rate_limiter = AdaptiveRateLimiter(
+        max_rpm=float(os.getenv("LLM_MAX_RPM", 6000)),
+        tpm=llm_tpm,
+        initial_rpm=float(os.getenv("LLM_INITIAL_RPM", 600))
+    )
 
 if llm_provider == "DeepInfra":
     model = ChatOpenAI(
         api_key=os.getenv("DEEPINFRA_API_TOKEN"),
         base_url="https://api.deepinfra.com/v1/openai",
         model=model_id,
+        rate_limiter=rate_limiter,
+        callbacks=[rate_limiter.callback],
         temperature=0,
         seed=1337
     )
@@ -53,6 +65,7 @@ elif llm_provider == "SambaNova":
         base_url="https://api.sambanova.ai/v1",
         model=model_id,
         rate_limiter=rate_limiter,
+        callbacks=[rate_limiter.callback],
         temperature=0,
         seed=1337
     )
@@ -61,6 +74,8 @@ elif llm_provider == "OpenAI":
     model = ChatOpenAI(
         api_key=os.getenv("OPENAI_API_KEY"),
         model=model_id,
+        rate_limiter=rate_limiter,
+        callbacks=[rate_limiter.callback],
         temperature=0,
         seed=1337
     )
@@ -70,6 +85,8 @@ elif llm_provider == "vLLM":
         api_key="EMPTY",
         base_url="http://localhost:19123/v1",
         model=model_id,
+        rate_limiter=rate_limiter,
+        callbacks=[rate_limiter.callback],
         temperature=0,
         seed=1337
     )
@@ -78,6 +95,8 @@ elif llm_provider == "Ollama":
     model = ChatOllama(
         model=model_id,
         num_ctx=25600,
+        rate_limiter=rate_limiter,
+        callbacks=[rate_limiter.callback],
         temperature=0,
         seed=1337
     )
@@ -88,6 +107,7 @@ elif llm_provider == "Cerebras":
         base_url="https://api.cerebras.ai/v1",
         model=model_id,
         rate_limiter=rate_limiter,
+        callbacks=[rate_limiter.callback],
         temperature=0,
         seed=1337
     )
@@ -98,15 +118,37 @@ elif llm_provider == "Cohere":
         base_url="https://api.cohere.ai/compatibility/v1",
         model=model_id,
         rate_limiter=rate_limiter,
+        callbacks=[rate_limiter.callback],
         temperature=0,
         seed=1337
     )
 
+# Responses of already sent prompts are served from a local cache, set LLM_CACHE=off to disable it
+if os.getenv("LLM_CACHE", "sqlite") != "off":
+    llm_cache = SQLiteLLMCache(
+        llm_provider,
+        model_id,
+        path=os.getenv("LLM_CACHE_PATH", LLM_CACHE_PATH),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 200000))
+    )
+    set_llm_cache(llm_cache)
+    logger.info(f"LLM cache {llm_cache.path} initialized")
+
 embeddings = OllamaEmbeddings(
     model=os.getenv("EMBEDDING_MODEL_ID"),
 )
 logger.info(f"Embeddings model {os.getenv('EMBEDDING_MODEL_ID')} initialized")
 
+# Vectors of already embedded texts are served from a local cache, set EMBEDDING_CACHE=off to disable it
+if os.getenv("EMBEDDING_CACHE", "sqlite") != "off":
+    embeddings = CachedEmbeddings(
+        embeddings,
+        os.getenv("EMBEDDING_MODEL_ID"),
+        path=os.getenv("EMBEDDING_CACHE_PATH", EMBEDDING_CACHE_PATH),
+        max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 1000000))
+    )
+    logger.info(f"Embedding cache {embeddings.path} initialized")
+
 session_id = str(uuid.uuid4())
 
 langfuse_handler = CallbackHandler(
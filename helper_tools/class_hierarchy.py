@@ -0,0 +1,302 @@
+import json
+import logging
+import os
+import threading
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CLASSES_PATH = Path(__file__).parent.parent / "infrastructure" / "classes.nt"
+
+WIKIDATA_ITEM_PREFIX = "http://www.wikidata.org/entity/Q"
+SUBCLASS_PREDICATES = {
+    "<http://www.w3.org/2000/01/rdf-schema#subClassOf>",
+    "<http://www.wikidata.org/prop/direct/P279>",
+}
+INDEX_FILES = ("qids", "indptr", "indices")
+
+
+def _index_path(path):
+    return Path(path).with_suffix(".index")
+
+
+def _is_lfs_pointer(path):
+    with open(path, "rb") as f:
+        return f.read(len(b"version https://git-lfs")) == b"version https://git-lfs"
+
+
+def is_available(path=CLASSES_PATH):
+    """
+    Check whether the class hierarchy can be loaded, i.e. its index or the real classes.nt (not only the git-lfs
+    pointer) exists
+
+    Args:
+        path (str, optional): Path to the N-Triples file. Defaults to infrastructure/classes.nt.
+
+    Returns:
+        bool: True if ClassHierarchy.load can be used
+    """
+    path = Path(path)
+    if (_index_path(path) / "meta.json").exists():
+        return True
+    return path.exists() and not _is_lfs_pointer(path)
+
+
+class ClassHierarchy:
+    """
+    Reachability index over the rdfs:subClassOf edges between Wikidata classes.
+
+    Classes are identified by the position of their Q-number in the sorted qids array, and the superclasses of a
+    class are stored as CSR adjacency (indptr/indices). The arrays can be memory-mapped, so all workers on a node
+    share the same pages. Ancestor sets are computed on demand and memoized.
+    """
+    def __init__(self, qids, indptr, indices, cache_size=65536):
+        """
+        Initialize the hierarchy
+
+        Args:
+            qids (np.ndarray): Sorted Q-numbers of all classes, where the position is the integer class ID
+            indptr (np.ndarray): CSR offsets, the superclasses of class i are indices[indptr[i]:indptr[i + 1]]
+            indices (np.ndarray): CSR superclass IDs
+            cache_size (int, optional): Maximum number of memoized ancestor sets. Defaults to 65536.
+        """
+        self.qids = qids
+        self.indptr = indptr
+        self.indices = indices
+        self.cache_size = cache_size
+        self._ancestors = {}
+
+    @classmethod
+    def from_edges(cls, sub_qids, super_qids):
+        """
+        Build the CSR adjacency from (subclass, superclass) Q-number pairs
+
+        Args:
+            sub_qids: Q-numbers of the subclasses
+            super_qids: Q-numbers of the superclasses, aligned with sub_qids
+
+        Returns:
+            ClassHierarchy: The hierarchy containing all classes of the edges
+        """
+        sub_qids = np.asarray(sub_qids, dtype=np.int64)
+        super_qids = np.asarray(super_qids, dtype=np.int64)
+        qids = np.unique(np.concatenate([sub_qids, super_qids]))
+        sources = np.searchsorted(qids, sub_qids)
+        targets = np.searchsorted(qids, super_qids)
+
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(len(qids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(qids)), out=indptr[1:])
+        indices = targets[order].astype(np.int32)
+        return cls(qids, indptr, indices)
+
+    @classmethod
+    def from_ntriples(cls, path):
+        """
+        Build the hierarchy from the subclass triples between Wikidata items of an N-Triples file
+
+        Args:
+            path (str): Path to the N-Triples file, e.g. infrastructure/classes.nt
+
+        Returns:
+            ClassHierarchy: The hierarchy of all classes in the file
+        """
+        prefix = f"<{WIKIDATA_ITEM_PREFIX}"
+        sub_qids = array("q")
+        super_qids = array("q")
+        skipped = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split(maxsplit=3)
+                if len(parts) < 3 or parts[1] not in SUBCLASS_PREDICATES:
+                    continue
+                subject, obj = parts[0], parts[2]
+                try:
+                    if not subject.startswith(prefix) or not obj.startswith(prefix):
+                        raise ValueError
+                    sub_qid = int(subject[len(prefix):-1])
+                    super_qid = int(obj[len(prefix):-1])
+                except ValueError:
+                    skipped += 1
+                    continue
+                sub_qids.append(sub_qid)
+                super_qids.append(super_qid)
+        if skipped:
+            logger.warning(f"Skipped {skipped} subclass triples that are not between Wikidata items")
+        return cls.from_edges(np.frombuffer(sub_qids, dtype=np.int64), np.frombuffer(super_qids, dtype=np.int64))
+
+    def save(self, index_path, source_mtime=None):
+        """
+        Save the index as .npy files that can be memory-mapped
+
+        Args:
+            index_path (str): Directory to save the index to
+            source_mtime (float, optional): Modification time of the source file the index was built from
+        """
+        index_path = Path(index_path)
+        index_path.mkdir(parents=True, exist_ok=True)
+        for name in INDEX_FILES:
+            np.save(index_path / f"{name}.npy", getattr(self, name))
+        # meta.json is written last and marks the index as complete
+        with open(index_path / "meta.json", "w") as f:
+            json.dump({"source_mtime": source_mtime, "classes": len(self.qids), "edges": len(self.indices)}, f)
+
+    @classmethod
+    def open(cls, index_path):
+        """
+        Memory-map a saved index
+
+        Args:
+            index_path (str): Directory of the index
+
+        Returns:
+            ClassHierarchy: The memory-mapped hierarchy
+        """
+        index_path = Path(index_path)
+        return cls(*(np.load(index_path / f"{name}.npy", mmap_mode="r") for name in INDEX_FILES))
+
+    @classmethod
+    def load(cls, path=CLASSES_PATH):
+        """
+        Load the hierarchy of an N-Triples file, using the index next to the file if it is up to date
+
+        Args:
+            path (str, optional): Path to the N-Triples file. Defaults to infrastructure/classes.nt.
+
+        Returns:
+            ClassHierarchy: The loaded hierarchy
+        """
+        path = Path(path)
+        index_path = _index_path(path)
+        meta_path = index_path / "meta.json"
+        if meta_path.exists():
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if not path.exists() or _is_lfs_pointer(path) or meta["source_mtime"] == path.stat().st_mtime:
+                return cls.open(index_path)
+
+        if _is_lfs_pointer(path):
+            raise FileNotFoundError(f"{path} is a git-lfs pointer, run git lfs pull to fetch the class hierarchy")
+        logger.info(f"Building class hierarchy index of {path}")
+        hierarchy = cls.from_ntriples(path)
+        try:
+            hierarchy.save(index_path, source_mtime=path.stat().st_mtime)
+            hierarchy = cls.open(index_path)
+        except OSError as e:
+            logger.warning(f"Could not save class hierarchy index to {index_path}: {e}")
+        logger.info(f"Class hierarchy of {len(hierarchy.qids)} classes and {len(hierarchy.indices)} edges loaded")
+        return hierarchy
+
+    def class_id(self, uri):
+        """
+        Get the integer ID of a class URI
+
+        Args:
+            uri (str): URI of the class
+
+        Returns:
+            int: The class ID, None if the URI is not a class of the hierarchy
+        """
+        if not uri.startswith(WIKIDATA_ITEM_PREFIX):
+            return None
+        try:
+            qid = int(uri[len(WIKIDATA_ITEM_PREFIX):])
+        except ValueError:
+            return None
+        i = int(np.searchsorted(self.qids, qid))
+        if i < len(self.qids) and self.qids[i] == qid:
+            return i
+        return None
+
+    def superclass_ids(self, class_id):
+        """
+        Get the IDs of the direct superclasses of a class
+
+        Args:
+            class_id (int): ID of the class
+
+        Returns:
+            list: The IDs of the direct superclasses
+        """
+        return self.indices[self.indptr[class_id]:self.indptr[class_id + 1]].tolist()
+
+    def ancestor_ids(self, class_id):
+        """
+        Get the IDs of all transitive superclasses of a class
+
+        Args:
+            class_id (int): ID of the class
+
+        Returns:
+            frozenset: The IDs of all classes reachable over one or more subclass edges
+        """
+        ancestors = self._ancestors.get(class_id)
+        if ancestors is not None:
+            return ancestors
+
+        reached = set()
+        stack = self.superclass_ids(class_id)
+        while stack:
+            current = stack.pop()
+            if current in reached:
+                continue
+            reached.add(current)
+            known = self._ancestors.get(current)
+            if known is not None:
+                # Memoized ancestor sets are closed, so they do not have to be traversed again
+                reached |= known
+            else:
+                stack.extend(self.superclass_ids(current))
+
+        ancestors = frozenset(reached)
+        if len(self._ancestors) >= self.cache_size:
+            self._ancestors.clear()
+        self._ancestors[class_id] = ancestors
+        return ancestors
+
+    def is_subclass(self, class_uri, superclass_uri):
+        """
+        Check whether class_uri rdfs:subClassOf* superclass_uri holds
+
+        Args:
+            class_uri (str): URI of the potential subclass
+            superclass_uri (str): URI of the potential superclass
+
+        Returns:
+            bool: True if the classes are equal or superclass_uri is a transitive superclass of class_uri
+        """
+        if class_uri == superclass_uri:
+            return True
+        class_id = self.class_id(class_uri)
+        superclass_id = self.class_id(superclass_uri)
+        if class_id is None or superclass_id is None:
+            return False
+        return superclass_id in self.ancestor_ids(class_id)
+
+
+_class_hierarchy = None
+_class_hierarchy_lock = threading.Lock()
+
+
+def get_class_hierarchy():
+    """
+    Get the process-wide class hierarchy, loading it on first use
+
+    Returns:
+        ClassHierarchy: The hierarchy of infrastructure/classes.nt
+    """
+    global _class_hierarchy
+    with _class_hierarchy_lock:
+        if _class_hierarchy is None:
+            _class_hierarchy = ClassHierarchy.load(os.getenv("CLASSES_PATH", CLASSES_PATH))
+    return _class_hierarchy
+
+
+if __name__ == "__main__":
+    # Builds the index ahead of the runs, so the workers only memory-map it
+    get_class_hierarchy()
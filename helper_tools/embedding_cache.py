@@ -0,0 +1,169 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from helper_tools.sqlite_cache import connect
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_PATH = Path(__file__).parent.parent / "infrastructure" / "embedding_cache.sqlite"
+
+# SQLite limits the number of variables of a statement
+LOOKUP_BATCH_SIZE = 500
+# Evicting down to this share of max_entries, so that not every insert has to evict
+EVICTION_RATIO = 0.9
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS embeddings (
+        key TEXT PRIMARY KEY,
+        vector BLOB NOT NULL,
+        last_used REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper caching the vectors of an embedding model in a local SQLite file.
+
+    Vectors are stored as float32 under the hash of the model ID and the text, so the same surface forms are only
+    embedded once across documents, retries, runs and processes. If the cache grows beyond max_entries, the least
+    recently used vectors are evicted.
+    """
+    def __init__(self, embeddings, model_id, path=EMBEDDING_CACHE_PATH, max_entries=1000000):
+        """
+        Initialize the cache
+
+        Args:
+            embeddings (Embeddings): The embeddings to cache, e.g. OllamaEmbeddings
+            model_id (str): ID of the embedding model, part of the cache key
+            path (str, optional): Path to the SQLite file. Defaults to infrastructure/embedding_cache.sqlite.
+            max_entries (int, optional): Maximum number of cached vectors. Defaults to 1000000.
+        """
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+        self._entries = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @property
+    def connection(self):
+        """SQLite connection of the current thread, as connections must not be shared between threads"""
+        if not hasattr(self._local, "connection"):
+            self._local.connection = connect(self.path)
+        return self._local.connection
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_id}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys):
+        """Get the cached vectors of the keys and mark them as used"""
+        vectors = {}
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            chunk = keys[start:start + LOOKUP_BATCH_SIZE]
+            rows = self.connection.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            vectors.update((key, np.frombuffer(vector, dtype=np.float32).tolist()) for key, vector in rows)
+        if vectors:
+            now = time.time()
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in vectors]
+                )
+        return vectors
+
+    def _store(self, vectors):
+        """Cache the vectors of the keys, evicting the least recently used vectors if the cache is full"""
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in vectors.items()]
+            )
+        with self._lock:
+            self._entries += len(vectors)
+            if self._entries <= self.max_entries:
+                return
+            # Other processes may share the file, so the counter is only trusted to trigger the eviction
+            with self.connection:
+                entries = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                evict = entries - int(self.max_entries * EVICTION_RATIO)
+                if evict > 0:
+                    self.connection.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (evict,)
+                    )
+                    logger.info(f"Evicted {evict} vectors from the embedding cache")
+                    entries -= evict
+            self._entries = entries
+
+    def embed_documents(self, texts):
+        """
+        Embed texts, only sending the texts that are not cached to the embedding model (in one batch)
+
+        Args:
+            texts (list): The texts to embed
+
+        Returns:
+            list: The vectors of the texts, in the same order
+        """
+        texts = list(texts)
+        keys = [self._key(text) for text in texts]
+        try:
+            vectors = self._lookup(list(dict.fromkeys(keys)))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read the embedding cache: {e}")
+            vectors = {}
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        missed = sum(key in missing for key in keys)
+        with self._lock:
+            self.hits += len(keys) - missed
+            self.misses += missed
+        if missing:
+            new_vectors = dict(zip(missing, self.embeddings.embed_documents(list(missing.values()))))
+            try:
+                self._store(new_vectors)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not write to the embedding cache: {e}")
+            vectors.update(new_vectors)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        """
+        Embed a query text, see embed_documents
+
+        Args:
+            text (str): The text to embed
+
+        Returns:
+            list: The vector of the text
+        """
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        """
+        Get the cache counters
+
+        Returns:
+            dict: Number of texts served from the cache and texts sent to the embedding model
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -1,50 +1,72 @@
+import logging
 import os
 import re
 import pickle
+from functools import lru_cache
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
-from rdflib import Graph, URIRef
+from redis.exceptions import RedisError
 from tqdm import tqdm
 
 from helper_tools import parser
-from helper_tools.base_setup import wikidata_predicate_graph
-from helper_tools.wikidata_loader import get_label
+from helper_tools.predicate_hierarchy import ALL_PROPERTIES_PATH, get_predicate_hierarchy
+from helper_tools.redis_handler import get_inter_predicate_relations, inter_predicate_relations_upload
+from helper_tools.turtle_parser import parse_turtle_triples
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PERSISTENT_PREDICATE_RELATION_CACHE = os.getenv("PREDICATE_RELATION_CACHE", "redis") != "none"
+
+# "memory" serves predicate hierarchy checks from the closure of all_properties.ttl, "fuseki" asks the
+# wikidata_predicates dataset. Defaults to "memory" if all_properties.ttl is available.
+PREDICATE_HIERARCHY_BACKEND = os.getenv(
+    "PREDICATE_HIERARCHY_BACKEND",
+    "memory" if os.path.exists(os.getenv("ALL_PROPERTIES_PATH", ALL_PROPERTIES_PATH)) else "fuseki"
+)
 
 
 def get_uri_labels(df):
-    subjects = []
-    predicates = []
-    objects = []
-    for i, row in df.iterrows():
-        subjects.append(get_label(row["subject_uri"]))
-        predicates.append(get_label(row["predicate_uri"]))
-        if row["object_uri"] is not None and "^^" in row["object_uri"]:
-            objects.append(row["object_uri"])
-        else:
-            objects.append(get_label(row["object_uri"]))
+    from helper_tools.wikidata_loader import get_labels
+    df = df.reset_index(drop=True)
+    # Typed literals are shown as they are, all other URIs are labelled in one batch
+    is_literal = df["object_uri"].map(lambda uri: uri is not None and "^^" in uri).to_numpy(dtype=bool)
+    object_uris = df["object_uri"].loc[~is_literal].tolist()
+    labels = get_labels(df["subject_uri"].tolist() + df["predicate_uri"].tolist() + object_uris)
+    n = len(df)
+    objects = df["object_uri"].to_numpy(dtype=object).copy()
+    objects[~is_literal] = labels[2 * n:]
     return pd.concat(
-        [df.reset_index(drop=True), pd.DataFrame({"subject": subjects, "predicate": predicates, "object": objects})],
+        [df, pd.DataFrame({"subject": labels[:n], "predicate": labels[n:2 * n], "object": objects})],
         axis=1)
 
 
 def parse_turtle(turtle_string):
-    try:
-        # Load the Turtle file into an RDF graph
-        result_graph = Graph()
-        result_graph.parse(data=turtle_string, format="turtle")
+    triples, error = parse_turtle_triples(turtle_string)
+    if error:
+        return pd.DataFrame(columns=["subject_uri", "predicate_uri", "object_uri"]), f"Error: {error}"
+    return pd.DataFrame(triples, columns=["subject_uri", "predicate_uri", "object_uri"]), "Success"
 
-        final_result = []
-        for subj, pred, obj in result_graph:
-            final_result.append([str(subj), str(pred), str(obj)])
 
-        return pd.DataFrame(final_result,
-                            columns=["subject_uri", "predicate_uri", "object_uri"]).drop_duplicates(), "Success"
-    except Exception as e:
-        return pd.DataFrame(columns=["subject_uri", "predicate_uri", "object_uri"]), f"Error: {str(e)}"
+TRIPLE_COLUMNS = ["subject_uri", "predicate_uri", "object_uri"]
 
+METRIC_COLUMNS = [
+    "Correct Triples", "Correct Triples with Parents", "Correct Triples with Related", "Gold Standard Triples",
+    "Total Triples Predicted",
+    "Extracted Subjects", "Gold Standard Subjects", "Correct Extracted Subjects",
+    "Extracted Predicates", "Gold Standard Predicates", "Correct Extracted Predicates",
+    "Detected Predicates Doc Parent", "Detected Predicates Doc Related",
+    "Correct Pred Predicates Parents", "Correct Pred Predicates Related",
+    "Extracted Objects", "Gold Standard Objects", "Correct Extracted Objects",
+    "Extracted Entities", "Gold Standard Entities", "Correct Extracted Entities"
+]
 
-def check_inter_predicate_relations(predicate_a, predicate_b):
+
+def _query_inter_predicate_relations(predicate_a, predicate_b):
+    from helper_tools.base_setup import wikidata_predicate_graph
     inter_predicate_relations = []
     if wikidata_predicate_graph.query(
             f'ASK {{<{predicate_a}> <http://www.w3.org/2000/01/rdf-schema#subPropertyOf>+ <{predicate_b}>.}}').askAnswer:
@@ -55,6 +77,177 @@ def check_inter_predicate_relations(predicate_a, predicate_b):
     return inter_predicate_relations
 
 
+_predicate_relation_cache_enabled = PERSISTENT_PREDICATE_RELATION_CACHE
+
+
+def _disable_predicate_relation_cache(error):
+    """Fall back to Fuseki for the rest of the process, so an unreachable Redis does not delay every pair"""
+    global _predicate_relation_cache_enabled
+    if _predicate_relation_cache_enabled:
+        logger.warning(f"Predicate relation cache unavailable, querying Fuseki without it: {error}")
+    _predicate_relation_cache_enabled = False
+
+
+@lru_cache(maxsize=65536)
+def _cached_inter_predicate_relations(predicate_a, predicate_b):
+    if PREDICATE_HIERARCHY_BACKEND == "memory":
+        return tuple(get_predicate_hierarchy().relations(predicate_a, predicate_b))
+
+    # Redis is only a cache in front of Fuseki, so the metrics do not depend on it being reachable
+    if _predicate_relation_cache_enabled:
+        try:
+            cached = get_inter_predicate_relations(predicate_a, predicate_b)
+        except RedisError as e:
+            _disable_predicate_relation_cache(e)
+            cached = None
+        if cached is not None:
+            return tuple(cached)
+
+    inter_predicate_relations = _query_inter_predicate_relations(predicate_a, predicate_b)
+
+    if _predicate_relation_cache_enabled:
+        try:
+            inter_predicate_relations_upload(predicate_a, predicate_b, inter_predicate_relations)
+        except RedisError as e:
+            _disable_predicate_relation_cache(e)
+    return tuple(inter_predicate_relations)
+
+
+def check_inter_predicate_relations(predicate_a, predicate_b):
+    """
+    Check whether predicate_a is a (transitive) sub- or parent property of predicate_b.
+
+    With the "memory" PREDICATE_HIERARCHY_BACKEND, the relations are answered from the precomputed subproperty
+    closure of all_properties.ttl without any network calls. With the "fuseki" backend, results are memoized per
+    ordered predicate pair in-process and, unless PREDICATE_RELATION_CACHE is set to "none", in Redis, so every
+    distinct pair is only queried once against Fuseki.
+
+    Args:
+        predicate_a (str): URI of the first predicate
+        predicate_b (str): URI of the second predicate
+
+    Returns:
+        list: ["subPropertyOf"], ["parentPropertyOf"] or [] if the predicates are not related
+    """
+    return list(_cached_inter_predicate_relations(predicate_a, predicate_b))
+
+
+def _count_per_doc(df, doc_ids):
+    return df.groupby("docid").size().reindex(doc_ids, fill_value=0)
+
+
+def _count_unique_per_doc(df, doc_ids):
+    return _count_per_doc(df.drop_duplicates(), doc_ids)
+
+
+def _entities(triple_df):
+    return pd.concat([
+        triple_df[["docid", "subject_uri"]].rename(columns={"subject_uri": "entity_uri"}),
+        triple_df[["docid", "object_uri"]].rename(columns={"object_uri": "entity_uri"})
+    ]).drop_duplicates()
+
+
+def _inter_predicate_relation_flags(pred_predicates, gold_predicates):
+    """
+    Check the inter predicate relations of all (pred, gold) predicate pairs, querying every distinct pair once.
+
+    Returns:
+        tuple: Two lists of booleans, whether the pred predicate is a parent of / related to the gold predicate
+    """
+    pairs = list(zip(pred_predicates, gold_predicates))
+    relations = {pair: check_inter_predicate_relations(*pair) for pair in set(pairs)}
+    parent = np.array([("parentPropertyOf" in relations[pair]) for pair in pairs], dtype=bool)
+    related = np.array([(len(relations[pair]) > 0) for pair in pairs], dtype=bool)
+    return parent, related
+
+
+def calculate_metrics_batch(pred_triple_df, gold_triple_df, doc_ids=None):
+    """
+    Calculate all evaluation metrics for many documents at once with grouped operations.
+
+    Args:
+        pred_triple_df (pd.DataFrame): Predicted triples of all documents, tagged by a "docid" column
+        gold_triple_df (pd.DataFrame): Gold standard triples of all documents, tagged by a "docid" column
+        doc_ids (list, optional): Documents to report, in output order. Defaults to all doc ids of both DataFrames.
+
+    Returns:
+        pd.DataFrame: One row per doc id with the METRIC_COLUMNS counts
+    """
+    pred = pred_triple_df[["docid", *TRIPLE_COLUMNS]].astype({"docid": object}).drop_duplicates()
+    gold = gold_triple_df[["docid", *TRIPLE_COLUMNS]].astype({"docid": object})
+    gold_unique = gold.drop_duplicates()
+    if doc_ids is None:
+        doc_ids = pd.unique(pd.concat([pred["docid"], gold["docid"]]))
+
+    # Triples
+    correct_triples = _count_per_doc(pred.merge(gold, on=["docid", *TRIPLE_COLUMNS]), doc_ids)
+    correct_triples_unique = pred.merge(gold_unique, on=["docid", *TRIPLE_COLUMNS])
+
+    # Triples with Parent and Related Predicates - replace the predicate of an incorrect triple by the gold
+    # predicate with the same subject and object if the two predicates are related
+    incorrect_triples = pred.merge(gold_unique, how="left", indicator=True).query('_merge == "left_only"')
+    partial_matching_triples = incorrect_triples.drop(columns="_merge").merge(
+        gold_unique, on=["docid", "subject_uri", "object_uri"])
+    parent, related = _inter_predicate_relation_flags(partial_matching_triples["predicate_uri_x"],
+                                                      partial_matching_triples["predicate_uri_y"])
+    partial_matching_triples = partial_matching_triples.drop(columns="predicate_uri_x").rename(
+        columns={"predicate_uri_y": "predicate_uri"})
+    correct_triples_with_parents = _count_unique_per_doc(
+        pd.concat([correct_triples_unique, partial_matching_triples.loc[parent]]), doc_ids)
+    correct_triples_with_related = _count_unique_per_doc(
+        pd.concat([correct_triples_unique, partial_matching_triples.loc[related]]), doc_ids)
+
+    # Subjects, Predicates, Objects and Entities (Subjects + Objects)
+    element_counts = {}
+    for element, pred_elements, gold_elements in [
+        ("subject", pred[["docid", "subject_uri"]], gold[["docid", "subject_uri"]]),
+        ("predicate", pred[["docid", "predicate_uri"]], gold[["docid", "predicate_uri"]]),
+        ("object", pred[["docid", "object_uri"]], gold[["docid", "object_uri"]]),
+        ("entity", _entities(pred), _entities(gold)),
+    ]:
+        pred_elements = pred_elements.drop_duplicates()
+        gold_elements = gold_elements.drop_duplicates()
+        element_counts[element] = (
+            _count_per_doc(pred_elements, doc_ids),
+            _count_per_doc(gold_elements, doc_ids),
+            _count_per_doc(pred_elements.merge(gold_elements), doc_ids)
+        )
+
+    # Predicates including Parent and Related Predicates - every gold predicate is detected by an identical pred
+    # predicate or, if there is none, by the first related pred predicate
+    predicate_pairs = pred[["docid", "predicate_uri"]].drop_duplicates().merge(
+        gold[["docid", "predicate_uri"]].drop_duplicates(), on="docid")
+    exact = predicate_pairs["predicate_uri_x"] == predicate_pairs["predicate_uri_y"]
+    parent, related = _inter_predicate_relation_flags(predicate_pairs.loc[~exact, "predicate_uri_x"],
+                                                      predicate_pairs.loc[~exact, "predicate_uri_y"])
+    predicate_pairs["exact"] = exact
+    predicate_pairs["parent"] = exact
+    predicate_pairs["related"] = exact
+    predicate_pairs.loc[~exact, "parent"] = parent
+    predicate_pairs.loc[~exact, "related"] = related
+    predicate_hits = predicate_pairs[predicate_pairs["related"]].sort_values(
+        ["exact", "predicate_uri_x"], ascending=[False, True]).drop_duplicates(["docid", "predicate_uri_y"])
+    parent_hits = predicate_hits[predicate_hits["parent"]]
+
+    detected_predicates_doc_parent = _count_per_doc(parent_hits, doc_ids)
+    detected_predicates_doc_related = _count_per_doc(predicate_hits, doc_ids)
+    correct_pred_predicates_parent = _count_unique_per_doc(parent_hits[["docid", "predicate_uri_x"]], doc_ids)
+    correct_pred_predicates_related = _count_unique_per_doc(predicate_hits[["docid", "predicate_uri_x"]], doc_ids)
+
+    counts = [
+        correct_triples, correct_triples_with_parents, correct_triples_with_related,
+        _count_per_doc(gold, doc_ids), _count_per_doc(pred, doc_ids),
+        *element_counts["subject"],
+        *element_counts["predicate"],
+        detected_predicates_doc_parent, detected_predicates_doc_related,
+        correct_pred_predicates_parent, correct_pred_predicates_related,
+        *element_counts["object"],
+        *element_counts["entity"]
+    ]
+    return pd.DataFrame({column: count.to_numpy() for column, count in zip(METRIC_COLUMNS, counts)},
+                        index=pd.Index(doc_ids, name="docid"))
+
+
 def _calculate_metrics(pred_triple_df, gold_triple_df):
     """
     Helper function to calculate all evaluation metrics from two triple DataFrames.
@@ -66,110 +259,52 @@ def _calculate_metrics(pred_triple_df, gold_triple_df):
     Returns:
         tuple: A tuple containing all evaluation metrics
     """
-    correct_triple_df = pred_triple_df.merge(gold_triple_df[["subject_uri", "predicate_uri", "object_uri"]],
-                                           on=["subject_uri", "predicate_uri", "object_uri"], how="inner")
-
-    # Subjects
-    extracted_subjects = len(set(pred_triple_df["subject_uri"]))
-    gold_standard_subjects = len(set(gold_triple_df["subject_uri"]))
-    correct_extracted_subjects = len(
-        set(pred_triple_df["subject_uri"]).intersection(set(gold_triple_df["subject_uri"])))
-
-    # Predicates
-    extracted_predicates = len(set(pred_triple_df["predicate_uri"]))
-    gold_standard_predicates = len(set(gold_triple_df["predicate_uri"]))
-    correct_extracted_predicates = len(
-        set(pred_triple_df["predicate_uri"]).intersection(set(gold_triple_df["predicate_uri"])))
-
-    # Objects
-    extracted_objects = len(set(pred_triple_df["object_uri"]))
-    gold_standard_objects = len(set(gold_triple_df["object_uri"]))
-    correct_extracted_objects = len(
-        set(pred_triple_df["object_uri"]).intersection(set(gold_triple_df["object_uri"])))
-
-    # Entities (Subjects + Objects)
-    extracted_entities = len(set(pred_triple_df["subject_uri"]).union(set(pred_triple_df["object_uri"])))
-    gold_standard_entities = len(set(gold_triple_df["subject_uri"]).union(set(gold_triple_df["object_uri"])))
-    correct_extracted_entities = len(
-        set(pred_triple_df["subject_uri"]).union(set(pred_triple_df["object_uri"]))
-        .intersection(set(gold_triple_df["subject_uri"]).union(set(gold_triple_df["object_uri"])))
-    )
-
-    # Triples with Parent and Related Predicates
-    correct_triples_df = pred_triple_df.merge(gold_triple_df[["subject_uri", "predicate_uri", "object_uri"]],
-                                            on=["subject_uri", "predicate_uri", "object_uri"], how="inner")
-    incorrect_triples_df = \
-    pred_triple_df.merge(correct_triples_df, how="outer", indicator=True).query('_merge=="left_only"')[
-        ["subject_uri", "predicate_uri", "object_uri"]]
-    partial_matching_triples_df = incorrect_triples_df.merge(
-        gold_triple_df[["subject_uri", "predicate_uri", "object_uri"]], on=["subject_uri", "object_uri"], how="inner")
-    correct_triples_with_parent_predicates_df = []
-    correct_triples_with_related_predicates_df = []
-    for i, row in partial_matching_triples_df.iterrows():
-        inter_predicate_relations = check_inter_predicate_relations(row["predicate_uri_x"], row["predicate_uri_y"])
-        if "parentPropertyOf" in inter_predicate_relations:
-            correct_triples_with_parent_predicates_df.append(row)
-        if len(inter_predicate_relations) > 0:
-            correct_triples_with_related_predicates_df.append(row)
-
-    correct_triples_with_parent_predicates_df = pd.DataFrame(correct_triples_with_parent_predicates_df).drop(
-        "predicate_uri_x", axis=1, errors='ignore').rename(columns={"predicate_uri_y": "predicate_uri"},
-                                                         errors='ignore')
-    correct_triples_with_parent_predicates_df = pd.concat(
-        [correct_triples_with_parent_predicates_df, correct_triples_df]).drop_duplicates()
-    correct_triples_with_related_predicates_df = pd.DataFrame(correct_triples_with_related_predicates_df).drop(
-        "predicate_uri_x", axis=1, errors='ignore').rename(columns={"predicate_uri_y": "predicate_uri"},
-                                                         errors='ignore')
-    correct_triples_with_related_predicates_df = pd.concat(
-        [correct_triples_with_related_predicates_df, correct_triples_df]).drop_duplicates()
-
-    # Predicates including Parent and Related Predicates
-    pred_predicate_set = set(pred_triple_df["predicate_uri"])
-    gold_predicate_set = set(gold_triple_df["predicate_uri"])
-    detected_predicates_doc_parent = set()  # For doc predicates detected through parent relationships
-    detected_predicates_doc_related = set()  # For doc predicates detected through related relationships
-    correct_pred_predicates_parent = set()  # New variable for correct predicates from pred
-    correct_pred_predicates_related = set()  # New variable for correct predicates from pred
-    
-    for gold_predicate in gold_predicate_set:
-        found = False
-        for pred_predicate in pred_predicate_set:
-            if pred_predicate == gold_predicate:
-                correct_pred_predicates_parent.add(pred_predicate)
-                correct_pred_predicates_related.add(pred_predicate)
-                detected_predicates_doc_parent.add(gold_predicate)
-                detected_predicates_doc_related.add(gold_predicate)
-                found = True
-                break
-            inter_predicate_relations = check_inter_predicate_relations(pred_predicate, gold_predicate)
-            if "parentPropertyOf" in inter_predicate_relations:
-                correct_pred_predicates_parent.add(pred_predicate)
-                detected_predicates_doc_parent.add(gold_predicate)
-                found = True
-            if len(inter_predicate_relations) > 0:
-                correct_pred_predicates_related.add(pred_predicate)
-                detected_predicates_doc_related.add(gold_predicate)
-                found = True
-                break
-    
-    detected_predicates_doc_parent_count = len(detected_predicates_doc_parent)
-    detected_predicates_doc_related_count = len(detected_predicates_doc_related)
-    correct_pred_predicates_parent_count = len(correct_pred_predicates_parent)
-    correct_pred_predicates_related_count = len(correct_pred_predicates_related)
-
-    return len(correct_triple_df), len(correct_triples_with_parent_predicates_df), len(
-        correct_triples_with_related_predicates_df), len(gold_triple_df), len(
-        pred_triple_df), extracted_subjects, gold_standard_subjects, correct_extracted_subjects, extracted_predicates, gold_standard_predicates, correct_extracted_predicates, detected_predicates_doc_parent_count, detected_predicates_doc_related_count, correct_pred_predicates_parent_count, correct_pred_predicates_related_count, extracted_objects, gold_standard_objects, correct_extracted_objects, extracted_entities, gold_standard_entities, correct_extracted_entities
+    metrics = calculate_metrics_batch(pred_triple_df.assign(docid=0), gold_triple_df.assign(docid=0), doc_ids=[0])
+    return tuple(int(value) for value in metrics.iloc[0])
 
 
 def evaluate_doc(turtle_string, doc_id, triple_df):
     pred_triple_df, error = parse_turtle(turtle_string)
     if error != "Success":
         raise ValueError(f"Error parsing turtle string: {error}")
-    doc_triple_df = triple_df[triple_df["docid"] == doc_id][["subject_uri", "predicate_uri", "object_uri"]]
+    doc_triple_df = parser.get_doc_triples(triple_df, doc_id)[TRIPLE_COLUMNS]
     return _calculate_metrics(pred_triple_df, doc_triple_df)
 
 
+def evaluate_docs(turtle_strings, triple_df, on_error="raise"):
+    """
+    Evaluate the turtle strings of many documents at once.
+
+    Args:
+        turtle_strings (dict): Dictionary of {doc_id: turtle_string}
+        triple_df (pd.DataFrame): Gold standard triples of the dataset
+        on_error (str, optional): "raise" to raise a ValueError for unparsable turtle strings, "zero" to report
+            all metrics of such documents as 0. Defaults to "raise".
+
+    Returns:
+        pd.DataFrame: One row per doc id (in the order of turtle_strings) with the METRIC_COLUMNS counts
+    """
+    doc_ids = list(turtle_strings.keys())
+    pred_triple_dfs = []
+    failed_doc_ids = []
+    for doc_id, turtle_string in turtle_strings.items():
+        pred_triple_df, error = parse_turtle(turtle_string)
+        if error != "Success":
+            if on_error == "raise":
+                raise ValueError(f"Error parsing turtle string: {error}")
+            print(f"Error evaluating doc {doc_id}: {error}")
+            failed_doc_ids.append(doc_id)
+            continue
+        pred_triple_dfs.append(pred_triple_df.assign(docid=doc_id))
+
+    pred_triple_df = pd.concat(pred_triple_dfs) if pred_triple_dfs else pd.DataFrame(columns=["docid", *TRIPLE_COLUMNS])
+    gold_triple_df = triple_df[triple_df["docid"].isin(doc_ids)]
+    metrics = calculate_metrics_batch(pred_triple_df, gold_triple_df, doc_ids=doc_ids)
+    if failed_doc_ids:
+        metrics.loc[failed_doc_ids] = 0
+    return metrics
+
+
 def generate_pr_f1_score(correct, gold_standard, total_predicted):
     try:
         precision = correct / total_predicted
@@ -392,7 +527,8 @@ def convert_eval_log(path, dataset_cache):
         return
 
     evaluation_log_df = pd.read_excel(path)
-    evaluation_log = []
+    result_strings = {}
+    turtle_strings = {}
     for doc_id, row in evaluation_log_df.iterrows():
         result_string = str(row["Result String"])
         turtle_string_match = re.search(r'<ttl>(.*?)</ttl>', result_string, re.DOTALL)
@@ -400,23 +536,11 @@ def convert_eval_log(path, dataset_cache):
             turtle_string = turtle_string_match.group(1)
         else:
             turtle_string = result_string
-        evaluation_log.append([doc_id, *evaluate_doc(turtle_string, doc_id, triple_df), result_string])
-
-    evaluation_log_df = pd.DataFrame(
-        evaluation_log,
-        columns=[
-            "Doc ID",
-            "Correct Triples", "Correct Triples with Parents", "Correct Triples with Related", "Gold Standard Triples",
-            "Total Triples Predicted",
-            "Extracted Subjects", "Gold Standard Subjects", "Correct Extracted Subjects",
-            "Extracted Predicates", "Gold Standard Predicates", "Correct Extracted Predicates",
-            "Detected Predicates Doc Parent", "Detected Predicates Doc Related", 
-            "Correct Pred Predicates Parents", "Correct Pred Predicates Related", 
-            "Extracted Objects", "Gold Standard Objects", "Correct Extracted Objects",
-            "Extracted Entities", "Gold Standard Entities", "Correct Extracted Entities", 
-            "Result String"
-        ]
-    )
+        result_strings[doc_id] = result_string
+        turtle_strings[doc_id] = turtle_string
+
+    evaluation_log_df = evaluate_docs(turtle_strings, triple_df).reset_index(names="Doc ID")
+    evaluation_log_df["Result String"] = list(result_strings.values())
     evaluation_log_df.to_excel(path, index=False)
     return dataset_cache
 
@@ -479,35 +603,10 @@ def convert_pickle_eval_log(pickle_path, dataset_cache):
         print(f"Error loading pickle file {pickle_path}: {e}")
         return dataset_cache
     
-    # Convert to evaluation log format
-    evaluation_log = []
-    for doc_id, turtle_string in docid_turtle_dict.items():
-        turtle_string = turtle_string.replace("wdt:","wd:")
-        try:
-            metrics = evaluate_doc(turtle_string, doc_id, triple_df)
-            evaluation_log.append([doc_id, *metrics, turtle_string])
-        except Exception as e:
-            print(f"Error evaluating doc {doc_id}: {e}")
-            # Add row with zeros for failed evaluations
-            zero_metrics = [0] * 21  # 21 metrics from _calculate_metrics
-            evaluation_log.append([doc_id, *zero_metrics, turtle_string])
-    
-    # Create DataFrame
-    evaluation_log_df = pd.DataFrame(
-        evaluation_log,
-        columns=[
-            "Doc ID",
-            "Correct Triples", "Correct Triples with Parents", "Correct Triples with Related", "Gold Standard Triples",
-            "Total Triples Predicted",
-            "Extracted Subjects", "Gold Standard Subjects", "Correct Extracted Subjects",
-            "Extracted Predicates", "Gold Standard Predicates", "Correct Extracted Predicates",
-            "Detected Predicates Doc Parent", "Detected Predicates Doc Related", 
-            "Correct Pred Predicates Parents", "Correct Pred Predicates Related", 
-            "Extracted Objects", "Gold Standard Objects", "Correct Extracted Objects",
-            "Extracted Entities", "Gold Standard Entities", "Correct Extracted Entities", 
-            "Result String"
-        ]
-    )
+    # Convert to evaluation log format, reporting all metrics of failed evaluations as zero
+    turtle_strings = {doc_id: turtle_string.replace("wdt:", "wd:") for doc_id, turtle_string in docid_turtle_dict.items()}
+    evaluation_log_df = evaluate_docs(turtle_strings, triple_df, on_error="zero").reset_index(names="Doc ID")
+    evaluation_log_df["Result String"] = list(turtle_strings.values())
     
     # Save as Excel file (replace .pkl with .xlsx)
     excel_path = pickle_path.replace('.pkl', '.xlsx')
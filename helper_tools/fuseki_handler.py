@@ -1,6 +1,12 @@
 import os
+import asyncio
+import gzip
 import logging
+import shutil
+import subprocess
+import threading
 import requests
+import requests.adapters
 from SPARQLWrapper import SPARQLWrapper, POST, JSON
 from dotenv import load_dotenv
 import git
@@ -10,6 +16,7 @@ import json
 from typing import Dict, List, Union, Any, Optional
 from dataclasses import dataclass
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,6 +30,15 @@ FUSEKI_URL = os.getenv("FUSEKI_URL")
 FUSEKI_USER = os.getenv("FUSEKI_USER")
 FUSEKI_PASSWORD = os.getenv("FUSEKI_PASSWORD")
 BATCH_SIZE = 10000  # Number of triples per batch
+POOL_SIZE = int(os.getenv("FUSEKI_POOL_SIZE", 32))  # Kept-alive connections per dataset client
+QUERY_TIMEOUT = float(os.getenv("FUSEKI_QUERY_TIMEOUT", 60))
+MAX_GET_QUERY_LENGTH = 2000  # Longer queries are sent as POST to stay below URL length limits
+UPLOAD_CHUNK_BYTES = 16 * 1024 * 1024  # Size of the N-Triples chunks of a bulk upload
+UPLOAD_WORKERS = int(os.getenv("FUSEKI_UPLOAD_WORKERS", 4))
+RDF_CONTENT_TYPES = {"nt": "application/n-triples", "ttl": "text/turtle", "rdf": "application/rdf+xml"}
+# Offline loading requires a local Jena install and the directory holding the TDB2 databases of Fuseki
+TDBLOADER = shutil.which(os.getenv("TDBLOADER", "tdb2.tdbloader"))
+FUSEKI_DATABASE_DIR = os.getenv("FUSEKI_DATABASE_DIR")
 
 if not FUSEKI_URL:
     raise ValueError("FUSEKI_URL not found in environment variables")
@@ -94,36 +110,49 @@ class ASKResult:
 
 class FusekiClient:
     """
-    Client for interacting with a specific Fuseki dataset
+    Thread-safe client for interacting with a specific Fuseki dataset over a pooled keep-alive HTTP session
     """
-    def __init__(self, dataset_name: str):
+    def __init__(self, dataset_name: str, pool_size: int = POOL_SIZE, timeout: float = QUERY_TIMEOUT):
         """
         Initialize the Fuseki client for a specific dataset
         
         Args:
             dataset_name: Name of the dataset to connect to
+            pool_size: Maximum number of kept-alive connections, should be at least the number of worker threads
+            timeout: Timeout of a query in seconds
         """
         self.dataset_name = dataset_name
         self.endpoint = f"{FUSEKI_URL}/{dataset_name}/query"
-        self.sparql = SPARQLWrapper(self.endpoint)
-        self.sparql.setCredentials(FUSEKI_USER, FUSEKI_PASSWORD)
-        self.sparql.setReturnFormat(JSON)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = (FUSEKI_USER, FUSEKI_PASSWORD)
+        self.session.headers["Accept"] = "application/sparql-results+json, application/ld+json;q=0.9"
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
     
-    def query(self, query: str) -> Union[List[SPARQLResult], ASKResult, Dict[str, Any]]:
+    def query(self, query: str, method: Optional[str] = None) -> Union[List[SPARQLResult], ASKResult, Dict[str, Any]]:
         """
         Execute a SPARQL query and return the results in a structured format
         
         Args:
             query: SPARQL query string
+            method: "GET" or "POST". Defaults to POST for queries longer than MAX_GET_QUERY_LENGTH, GET otherwise.
             
         Returns:
             For SELECT queries: List of SPARQLResult objects
             For ASK queries: ASKResult object
             For CONSTRUCT/DESCRIBE queries: Dictionary containing the constructed graph
         """
-        self.sparql.setQuery(query)
+        if method is None:
+            method = "POST" if len(query) > MAX_GET_QUERY_LENGTH else "GET"
         try:
-            results = self.sparql.query().convert()
+            if method == "POST":
+                response = self.session.post(self.endpoint, data={"query": query}, timeout=self.timeout)
+            else:
+                response = self.session.get(self.endpoint, params={"query": query}, timeout=self.timeout)
+            response.raise_for_status()
+            results = response.json()
             
             # Handle different query types
             if 'results' in results:  # SELECT query
@@ -139,6 +168,18 @@ class FusekiClient:
             logger.error(f"Error executing query on dataset {self.dataset_name}: {str(e)}")
             raise
 
+    async def aquery(self, query: str, method: Optional[str] = None) -> Union[List[SPARQLResult], ASKResult, Dict[str, Any]]:
+        """
+        Execute a SPARQL query without blocking the event loop, see query
+        """
+        return await asyncio.to_thread(self.query, query, method)
+
+    def close(self):
+        """
+        Close the pooled connections
+        """
+        self.session.close()
+
 def get_sparql_wrapper(endpoint):
     """
     Create a SPARQLWrapper instance with authentication
@@ -266,28 +307,130 @@ def upload_file_in_batches(file_path, dataset_name):
                 sparql.query()
                 pbar.update(len(batch))
 
-def init_db():
+def _rdf_content_type(file_path):
+    """
+    Get the content type of an RDF file from its extension, ignoring a trailing .gz
+    """
+    extension = file_path.removesuffix(".gz").split('.')[-1]
+    if extension not in RDF_CONTENT_TYPES:
+        raise ValueError(f"Unsupported RDF file format: {file_path}")
+    return RDF_CONTENT_TYPES[extension]
+
+def _read_ntriples_chunks(f, chunk_bytes):
+    """
+    Yield chunks of whole N-Triples lines of roughly chunk_bytes bytes
+    """
+    while True:
+        chunk = f.read(chunk_bytes)
+        if not chunk:
+            return
+        # Complete the last line, so every chunk is a valid N-Triples document
+        yield chunk + f.readline()
+
+def upload_file_bulk(file_path, dataset_name, chunk_bytes=UPLOAD_CHUNK_BYTES, max_workers=UPLOAD_WORKERS):
+    """
+    Upload an RDF file to the default graph of a dataset using the Graph Store Protocol.
+
+    N-Triples files are streamed in chunks of whole lines that are uploaded in parallel, so blank node labels must
+    not be shared across lines. Other formats, e.g. Turtle, are streamed as a single request. Files ending in .gz
+    are decompressed on the fly. The progress bar counts the bytes read from the (compressed) file.
+
+    Args:
+        file_path (str): Path to the RDF file, e.g. .nt, .nt.gz or .ttl
+        dataset_name (str): Name of the dataset to upload to
+        chunk_bytes (int, optional): Approximate size of an uploaded N-Triples chunk in bytes
+        max_workers (int, optional): Number of chunks uploaded in parallel
+    """
+    file_name = ntpath.basename(file_path)
+    content_type = _rdf_content_type(file_path)
+    url = f"{FUSEKI_URL}/{dataset_name}/data"
+    session = requests.Session()
+    session.auth = (FUSEKI_USER, FUSEKI_PASSWORD)
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=max_workers))
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=max_workers))
+
+    def upload(data):
+        response = session.post(url, params={"default": ""}, data=data, headers={"Content-Type": content_type})
+        if response.status_code not in (200, 201, 204):
+            raise Exception(f"Failed to upload {file_name} to {dataset_name}: {response.text}")
+
+    logger.info(f"Uploading {file_name} to {dataset_name} dataset")
+    with open(file_path, "rb") as raw, tqdm(total=os.path.getsize(file_path), unit="B", unit_scale=True,
+                                            desc=f"Uploading {file_name}") as pbar:
+        f = gzip.GzipFile(fileobj=raw) if file_path.endswith(".gz") else raw
+        if content_type != RDF_CONTENT_TYPES["nt"]:
+            def stream():
+                for block in iter(lambda: f.read(chunk_bytes), b""):
+                    pbar.update(raw.tell() - pbar.n)
+                    yield block
+            upload(stream())
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Bound the chunks held in memory to two per worker
+                in_flight = threading.BoundedSemaphore(2 * max_workers)
+                futures = []
+                for chunk in _read_ntriples_chunks(f, chunk_bytes):
+                    in_flight.acquire()
+                    future = executor.submit(upload, chunk)
+                    future.add_done_callback(lambda _: in_flight.release())
+                    futures.append(future)
+                    pbar.update(raw.tell() - pbar.n)
+                for future in as_completed(futures):
+                    future.result()
+        pbar.update(raw.tell() - pbar.n)
+    session.close()
+
+def load_with_tdbloader(file_paths, dataset_name):
+    """
+    Load RDF files offline into the TDB2 database of a dataset with tdb2.tdbloader of a local Jena install.
+
+    The database has to be at FUSEKI_DATABASE_DIR/<dataset_name> and must not be opened by Fuseki at the same time.
+    Afterwards, create_dataset registers the loaded database with Fuseki.
+
+    Args:
+        file_paths (list): Paths to the RDF files, compressed files (.gz) are supported by tdb2.tdbloader
+        dataset_name (str): Name of the dataset to load into
+    """
+    location = os.path.join(FUSEKI_DATABASE_DIR, dataset_name)
+    logger.info(f"Loading {', '.join(map(ntpath.basename, file_paths))} into {location} with tdb2.tdbloader")
+    subprocess.run([TDBLOADER, "--loc", location, *file_paths], check=True)
+
+def init_db(loader=None):
     """
     Initialize two datasets in Jena Fuseki:
     1. wikidata_predicates
     2. wikidata_class_hierarchy
+
+    Args:
+        loader (str, optional): "tdbloader" to load offline with a local Jena install, "http" to upload through the
+            Graph Store Protocol or "insert" for SPARQL INSERT DATA batches. Defaults to FUSEKI_LOADER, or
+            "tdbloader" if tdb2.tdbloader and FUSEKI_DATABASE_DIR are available and "http" otherwise.
     """
     logger.info("Initializing Fuseki datasets...")
-    
+    loader = loader or os.getenv("FUSEKI_LOADER") or ("tdbloader" if TDBLOADER and FUSEKI_DATABASE_DIR else "http")
+    dataset_files = {
+        "wikidata_predicates": os.path.join(repo.working_dir, "infrastructure/all_properties.ttl"),
+        "wikidata_class_hierarchy": os.path.join(repo.working_dir, "infrastructure/classes.nt"),
+    }
+
+    if loader == "tdbloader":
+        # Load before creating the datasets, so Fuseki opens the finished databases
+        for dataset_name, file_path in dataset_files.items():
+            load_with_tdbloader([file_path], dataset_name)
+        for dataset_name in dataset_files:
+            create_dataset(dataset_name)
+        return
+
     # Create datasets
-    create_dataset("wikidata_predicates")
-    create_dataset("wikidata_class_hierarchy")
+    for dataset_name in dataset_files:
+        create_dataset(dataset_name)
 
     # Load data into datasets
-    upload_file_in_batches(
-        os.path.join(repo.working_dir, "infrastructure/all_properties.ttl"),
-        "wikidata_predicates"
-    )
-    
-    upload_file_in_batches(
-        os.path.join(repo.working_dir, "infrastructure/classes.nt"),
-        "wikidata_class_hierarchy"
-    )
+    for dataset_name, file_path in dataset_files.items():
+        if loader == "insert":
+            upload_file_in_batches(file_path, dataset_name)
+        else:
+            upload_file_bulk(file_path, dataset_name)
 
 def reinit_db():
     """
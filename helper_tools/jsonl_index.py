@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+from tqdm import tqdm
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+INDEX_FILES = ("offsets", "lengths", "docids")
+
+
+def _index_path(filename):
+    return Path(f"{filename}.index")
+
+
+class JsonlIndex:
+    """
+    Sidecar index of the byte offsets of the records of a JSONL file, sorted by their doc ID.
+
+    The index is built with a single pass over the file and saved as .npy files next to it, so that any N documents
+    or doc ID range of the (sorted) dataset can be read by seeking to the records, without sorting or rewriting the
+    file and without reading the records in front of them.
+    """
+    def __init__(self, filename, offsets, lengths, docids):
+        """
+        Initialize the index
+
+        Args:
+            filename (str): Path to the JSONL file
+            offsets (np.ndarray): Byte offsets of the records, sorted by doc ID
+            lengths (np.ndarray): Byte lengths of the records, aligned with offsets
+            docids (np.ndarray): Sorted doc IDs, aligned with offsets
+        """
+        self.filename = filename
+        self.offsets = offsets
+        self.lengths = lengths
+        self.docids = docids
+
+    @classmethod
+    def build(cls, filename, doc_id_key="docid"):
+        """
+        Build the index of a JSONL file
+
+        Args:
+            filename (str): Path to the JSONL file
+            doc_id_key (str, optional): Key of the doc ID of a record. Defaults to "docid".
+
+        Returns:
+            JsonlIndex: The index, records with equal doc IDs keep their order in the file
+        """
+        offsets = []
+        lengths = []
+        docids = []
+        offset = 0
+        with open(filename, "rb") as f, tqdm(total=os.path.getsize(filename), unit="B", unit_scale=True,
+                                             desc=f"Indexing {Path(filename).name}") as progress:
+            for line in f:
+                if line.strip():
+                    offsets.append(offset)
+                    lengths.append(len(line))
+                    docids.append(json.loads(line)[doc_id_key])
+                offset += len(line)
+                progress.update(len(line))
+
+        if all(isinstance(docid, int) for docid in docids):
+            docids = np.array(docids, dtype=np.int64)
+        else:
+            docids = np.array([str(docid) for docid in docids], dtype=str)
+        order = np.argsort(docids, kind="stable")
+        return cls(
+            filename,
+            np.array(offsets, dtype=np.int64)[order],
+            np.array(lengths, dtype=np.int64)[order],
+            docids[order],
+        )
+
+    def save(self, index_path, meta):
+        """
+        Save the index as .npy files that can be memory-mapped
+
+        Args:
+            index_path (str): Directory to save the index to
+            meta (dict): Metadata identifying the indexed file
+        """
+        index_path = Path(index_path)
+        index_path.mkdir(parents=True, exist_ok=True)
+        for name in INDEX_FILES:
+            np.save(index_path / f"{name}.npy", getattr(self, name))
+        # meta.json is written last and marks the index as complete
+        with open(index_path / "meta.json", "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def open(cls, filename, index_path):
+        """
+        Memory-map a saved index
+
+        Args:
+            filename (str): Path to the indexed JSONL file
+            index_path (str): Directory of the index
+
+        Returns:
+            JsonlIndex: The memory-mapped index
+        """
+        index_path = Path(index_path)
+        return cls(filename, *(np.load(index_path / f"{name}.npy", mmap_mode="r") for name in INDEX_FILES))
+
+    @classmethod
+    def load(cls, filename, doc_id_key="docid"):
+        """
+        Load the index of a JSONL file, building it if it does not exist or the file changed
+
+        Args:
+            filename (str): Path to the JSONL file
+            doc_id_key (str, optional): Key of the doc ID of a record. Defaults to "docid".
+
+        Returns:
+            JsonlIndex: The index of the file
+        """
+        stat = os.stat(filename)
+        meta = {"source_size": stat.st_size, "source_mtime": stat.st_mtime, "doc_id_key": doc_id_key}
+        index_path = _index_path(filename)
+        meta_path = index_path / "meta.json"
+        if meta_path.exists():
+            with open(meta_path) as f:
+                if json.load(f) == meta:
+                    return cls.open(filename, index_path)
+
+        index = cls.build(filename, doc_id_key)
+        try:
+            index.save(index_path, meta)
+            index = cls.open(filename, index_path)
+        except OSError as e:
+            logger.warning(f"Could not save JSONL index to {index_path}: {e}")
+        logger.info(f"Indexed {len(index)} records of {filename}")
+        return index
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def read(self, positions):
+        """
+        Read records by their position in doc ID order
+
+        Args:
+            positions: Positions of the records, e.g. range(10) for the first 10 documents
+
+        Returns:
+            list: The parsed records, in the order of positions
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        records = [None] * len(positions)
+        with open(self.filename, "rb") as f:
+            # Seeking in file order keeps the reads mostly sequential
+            for i in np.argsort(self.offsets[positions], kind="stable"):
+                f.seek(int(self.offsets[positions[i]]))
+                records[i] = json.loads(f.read(int(self.lengths[positions[i]])))
+        return records
+
+    def head(self, number_of_samples=None, start=0):
+        """
+        Read consecutive records in doc ID order
+
+        Args:
+            number_of_samples (int, optional): Number of records to read. If None or negative, reads all records
+                after start.
+            start (int, optional): Position of the first record. Defaults to 0.
+
+        Returns:
+            list: The parsed records
+        """
+        if number_of_samples is None or number_of_samples < 0:
+            stop = len(self)
+        else:
+            stop = min(start + number_of_samples, len(self))
+        return self.read(range(start, stop))
+
+    def file_positions(self, number_of_samples=None):
+        """
+        Get the positions of the first records of the file, in file order
+
+        Args:
+            number_of_samples (int, optional): Number of records. If None or negative, returns the positions of all
+                records.
+
+        Returns:
+            np.ndarray: Positions in doc ID order, as taken by read, of the first records in the file
+        """
+        if number_of_samples is None or number_of_samples < 0 or number_of_samples >= len(self):
+            return np.argsort(self.offsets, kind="stable")
+        if number_of_samples == 0:
+            return np.empty(0, dtype=np.int64)
+        # Partitioning finds the first records in linear time, only these have to be sorted by their offset
+        first = np.argpartition(self.offsets, number_of_samples - 1)[:number_of_samples]
+        return first[np.argsort(self.offsets[first], kind="stable")]
+
+    def docid_range(self, first_docid, last_docid):
+        """
+        Read all records whose doc ID lies in a range
+
+        Args:
+            first_docid: Smallest doc ID of the range
+            last_docid: Largest doc ID of the range (inclusive)
+
+        Returns:
+            list: The parsed records in doc ID order
+        """
+        start = int(np.searchsorted(self.docids, first_docid, side="left"))
+        stop = int(np.searchsorted(self.docids, last_docid, side="right"))
+        return self.read(range(start, stop))
@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import warnings
+from pathlib import Path
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+from helper_tools.sqlite_cache import connect
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_PATH = Path(__file__).parent.parent / "infrastructure" / "llm_cache.sqlite"
+
+# Evicting down to this share of max_entries, so that not every insert has to evict
+EVICTION_RATIO = 0.9
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        response TEXT NOT NULL,
+        last_used REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    LLM cache storing the responses of the chat model in a local SQLite file.
+
+    Responses are stored under the hash of the provider, the model ID, the rendered prompt and the model parameters
+    (LangChain's llm_string, which contains temperature, seed, stop words etc.), so re-running an approach only pays
+    for the LLM calls whose prompt or parameters changed. If the cache grows beyond max_entries, the least recently
+    used responses are evicted.
+    """
+    def __init__(self, provider, model_id, path=LLM_CACHE_PATH, max_entries=200000):
+        """
+        Initialize the cache
+
+        Args:
+            provider (str): The LLM provider, e.g. "SambaNova", part of the cache key
+            model_id (str): ID of the LLM, part of the cache key
+            path (str, optional): Path to the SQLite file. Defaults to infrastructure/llm_cache.sqlite.
+            max_entries (int, optional): Maximum number of cached responses. Defaults to 200000.
+        """
+        self.provider = provider
+        self.model_id = model_id
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+        self._entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def connection(self):
+        """SQLite connection of the current thread, as connections must not be shared between threads"""
+        if not hasattr(self._local, "connection"):
+            self._local.connection = connect(self.path)
+        return self._local.connection
+
+    def _key(self, prompt, llm_string):
+        return hashlib.sha256(
+            f"{self.provider}\0{self.model_id}\0{llm_string}\0{prompt}".encode("utf-8")
+        ).hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        """
+        Look up the cached response of a prompt
+
+        Args:
+            prompt (str): The serialized prompt
+            llm_string (str): The serialized model and its parameters
+
+        Returns:
+            list: The cached generations, or None if the prompt is not cached
+        """
+        key = self._key(prompt, llm_string)
+        try:
+            row = self.connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                with self.connection:
+                    self.connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read the LLM cache: {e}")
+            row = None
+
+        generations = None
+        if row is not None:
+            try:
+                # The cache file is written by this module only, so its responses are trusted on deserialization
+                with warnings.catch_warnings():
+                    warnings.filterwarnings("ignore", message="The function `loads` is in beta")
+                    warnings.filterwarnings("ignore", message="The default value of `allowed_objects`")
+                    generations = loads(row[0])
+            except Exception as e:
+                logger.warning(f"Could not deserialize a cached LLM response: {e}")
+        with self._lock:
+            if generations is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return generations
+
+    def update(self, prompt, llm_string, return_val):
+        """
+        Cache the response of a prompt, evicting the least recently used responses if the cache is full
+
+        Args:
+            prompt (str): The serialized prompt
+            llm_string (str): The serialized model and its parameters
+            return_val (list): The generations of the response
+        """
+        try:
+            response = dumps(return_val)
+        except Exception as e:
+            logger.warning(f"Could not serialize an LLM response: {e}")
+            return
+        try:
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, last_used) VALUES (?, ?, ?)",
+                    (self._key(prompt, llm_string), response, time.time())
+                )
+            self._evict()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write to the LLM cache: {e}")
+
+    def _evict(self):
+        with self._lock:
+            self._entries += 1
+            if self._entries <= self.max_entries:
+                return
+            # Other processes may share the file, so the counter is only trusted to trigger the eviction
+            with self.connection:
+                entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                evict = entries - int(self.max_entries * EVICTION_RATIO)
+                if evict > 0:
+                    self.connection.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY last_used LIMIT ?)", (evict,)
+                    )
+                    logger.info(f"Evicted {evict} responses from the LLM cache")
+                    entries -= evict
+            self._entries = entries
+
+    def clear(self, **kwargs):
+        """Remove all cached responses"""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM responses")
+            self._entries = 0
+
+    def stats(self):
+        """
+        Get the cache counters
+
+        Returns:
+            dict: Number of LLM calls served from the cache and calls sent to the provider
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,331 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from helper_tools.set_llm_config import AVAILABLE_MODELS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Window of the tokens per minute limit
+TOKEN_WINDOW_SECONDS = 60
+# Smoothing of the latency and tokens per request averages
+EWMA_ALPHA = 0.1
+# Latency samples needed before a response counts as latency spike
+MIN_LATENCY_SAMPLES = 5
+# Consecutive latency spikes needed for a decrease, as single slow calls are mostly just long answers
+LATENCY_SPIKES_IN_A_ROW = 3
+
+# The LLM call of the current context, set by AdaptiveRateLimitCallback.on_chat_model_start and marked as sent to
+# the provider by AdaptiveRateLimiter.acquire. Cache hits never acquire, so only provider calls give feedback.
+_current_call = ContextVar("current_llm_call", default=None)
+
+
+def get_model_limits(provider, model_id):
+    """
+    Get the requests and tokens per minute limits of a model from set_llm_config.AVAILABLE_MODELS
+
+    Args:
+        provider (str): The LLM provider, e.g. "SambaNova"
+        model_id (str): ID of the model
+
+    Returns:
+        tuple containing:
+        - int: Requests per minute, 0 if the provider has no limit. Falls back to LLM_RPM for unlisted models.
+        - int: Tokens per minute, 0 if the provider has no limit. Falls back to LLM_TPM for unlisted models.
+    """
+    for model_info in AVAILABLE_MODELS.get(provider, []):
+        if model_info["model"] == model_id:
+            return model_info["rpm"], model_info.get("tpm", 0)
+    return int(os.getenv("LLM_RPM", 0)), int(os.getenv("LLM_TPM", 0))
+
+
+def _total_tokens(response):
+    """Get the number of prompt and completion tokens of an LLMResult, 0 if the provider reports no usage"""
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    if token_usage.get("total_tokens"):
+        return token_usage["total_tokens"]
+    total = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            total += usage_metadata.get("total_tokens", 0)
+    return total
+
+
+def _is_rate_limit_error(error):
+    status_code = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status_code == 429 or type(error).__name__ == "RateLimitError"
+
+
+def _retry_after(error):
+    """Get the Retry-After header of a 429 response in seconds, None if it is missing"""
+    try:
+        return float(error.response.headers["retry-after"])
+    except Exception:
+        return None
+
+
+class AdaptiveRateLimiter(BaseRateLimiter):
+    """
+    Process-wide rate limiter for the LLM provider, enforcing requests per minute and tokens per minute.
+
+    The request rate is adapted AIMD style: every successful provider call raises it additively by about
+    increase_rpm per minute of calls up to max_rpm, while a 429 response halves it and pauses all requests for the
+    Retry-After time. With latency_backoff, LATENCY_SPIKES_IN_A_ROW consecutive latency spikes (calls taking
+    latency_spike_factor times the average latency) halve it as well, which is meant for providers without a known
+    limit, where slowing responses are the only sign of an overloaded server. The limits are enforced on acquire, the
+    feedback comes from the callback handler, which has to be registered on the same model.
+    """
+    def __init__(self, max_rpm, tpm=0, initial_rpm=None, min_rpm=1.0, increase_rpm=None, decrease_factor=0.5,
+                 latency_backoff=True, latency_spike_factor=3.0, cooldown=5.0, max_bucket_size=1,
+                 check_every_n_seconds=0.1):
+        """
+        Initialize the limiter
+
+        Args:
+            max_rpm (float): Maximum requests per minute, e.g. the limit of the provider
+            tpm (int, optional): Tokens per minute, 0 for no limit. Defaults to 0.
+            initial_rpm (float, optional): Requests per minute to start with. Defaults to max_rpm.
+            min_rpm (float, optional): Requests per minute the rate is never reduced below. Defaults to 1.
+            increase_rpm (float, optional): Additive increase per minute of successful calls. Defaults to max_rpm / 20.
+            decrease_factor (float, optional): Multiplicative decrease on 429s and latency spikes. Defaults to 0.5.
+            latency_backoff (bool, optional): Whether latency spikes decrease the rate. Defaults to True.
+            latency_spike_factor (float, optional): Latency relative to the average that counts as spike.
+                Defaults to 3.
+            cooldown (float, optional): Seconds between two decreases and default pause after a 429, so that a burst
+                of failing calls only decreases the rate once. Defaults to 5.
+            max_bucket_size (int, optional): Maximum number of requests sent in a burst. Defaults to 1.
+            check_every_n_seconds (float, optional): Polling interval of a blocking acquire. Defaults to 0.1.
+        """
+        self.max_rpm = max_rpm
+        self.tpm = tpm
+        self.min_rpm = min(min_rpm, max_rpm)
+        self.rpm = min(initial_rpm or max_rpm, max_rpm)
+        self.increase_rpm = increase_rpm or max_rpm / 20
+        self.decrease_factor = decrease_factor
+        self.latency_backoff = latency_backoff
+        self.latency_spike_factor = latency_spike_factor
+        self.cooldown = cooldown
+        self.max_bucket_size = max_bucket_size
+        self.check_every_n_seconds = check_every_n_seconds
+        self.callback = AdaptiveRateLimitCallback(self)
+
+        self._lock = threading.Lock()
+        self._available_requests = 0.0
+        self._last_refill = None
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._token_window = deque()
+        self._window_tokens = 0
+        self._tokens_per_request = 0.0
+        self._latency = None
+        self._latency_samples = 0
+        self._spikes_in_a_row = 0
+        self.in_flight = 0
+        self.successes = 0
+        self.rate_limited = 0
+        self.latency_spikes = 0
+
+    def _consume(self):
+        """Take a request from the bucket if the request and token limits allow it"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return False
+            if self._last_refill is not None:
+                self._available_requests = min(
+                    self._available_requests + (now - self._last_refill) * self.rpm / 60, self.max_bucket_size
+                )
+            self._last_refill = now
+            if self._available_requests < 1:
+                return False
+
+            if self.tpm:
+                while self._token_window and self._token_window[0][0] <= now - TOKEN_WINDOW_SECONDS:
+                    self._window_tokens -= self._token_window.popleft()[1]
+                # Reserve the average tokens of the calls in flight and of this call, a single call is always allowed
+                expected_tokens = self._window_tokens + (self.in_flight + 1) * self._tokens_per_request
+                if expected_tokens > self.tpm and (self._window_tokens or self.in_flight):
+                    return False
+
+            self._available_requests -= 1
+            return True
+
+    def _mark_sent(self):
+        call = _current_call.get()
+        if call is not None and "sent_at" not in call:
+            call["sent_at"] = time.monotonic()
+            with self._lock:
+                self.in_flight += 1
+
+    def acquire(self, *, blocking=True):
+        """
+        Acquire a request, waiting for the request and token limits if blocking
+
+        Args:
+            blocking (bool, optional): Whether to wait until a request is available. Defaults to True.
+
+        Returns:
+            bool: True if a request was acquired
+        """
+        if not blocking:
+            acquired = self._consume()
+        else:
+            while not self._consume():
+                time.sleep(self.check_every_n_seconds)
+            acquired = True
+        if acquired:
+            self._mark_sent()
+        return acquired
+
+    async def aacquire(self, *, blocking=True):
+        """
+        Async version of acquire
+
+        Args:
+            blocking (bool, optional): Whether to wait until a request is available. Defaults to True.
+
+        Returns:
+            bool: True if a request was acquired
+        """
+        if not blocking:
+            acquired = self._consume()
+        else:
+            while not self._consume():
+                await asyncio.sleep(self.check_every_n_seconds)
+            acquired = True
+        if acquired:
+            self._mark_sent()
+        return acquired
+
+    def _decrease(self, now, reason):
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.rpm = max(self.min_rpm, self.rpm * self.decrease_factor)
+        logger.warning(f"LLM {reason}, reducing the request rate to {self.rpm:.1f} RPM")
+
+    def record_success(self, latency, tokens):
+        """
+        Feed back a successful provider call
+
+        Args:
+            latency (float): Seconds between acquiring the request and the response
+            tokens (int): Prompt and completion tokens of the call
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.in_flight = max(0, self.in_flight - 1)
+            self.successes += 1
+            if tokens:
+                self._token_window.append((now, tokens))
+                self._window_tokens += tokens
+                self._tokens_per_request += EWMA_ALPHA * (tokens - self._tokens_per_request) \
+                    if self._tokens_per_request else tokens
+
+            spike = (self._latency_samples >= MIN_LATENCY_SAMPLES
+                     and latency > self.latency_spike_factor * self._latency)
+            self._latency = latency if self._latency is None else self._latency + EWMA_ALPHA * (latency - self._latency)
+            self._latency_samples += 1
+            if spike:
+                self.latency_spikes += 1
+                self._spikes_in_a_row += 1
+            else:
+                self._spikes_in_a_row = 0
+            if self.latency_backoff and self._spikes_in_a_row >= LATENCY_SPIKES_IN_A_ROW:
+                self._spikes_in_a_row = 0
+                self._decrease(now, f"latency spikes ({latency:.1f}s)")
+            elif not spike:
+                # About increase_rpm per minute of calls at the current rate
+                self.rpm = min(self.max_rpm, self.rpm + self.increase_rpm / self.rpm)
+
+    def record_rate_limit(self, retry_after=None):
+        """
+        Feed back a provider call that was rejected with 429
+
+        Args:
+            retry_after (float, optional): Seconds to pause all requests. Defaults to cooldown.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.in_flight = max(0, self.in_flight - 1)
+            self.rate_limited += 1
+            self._blocked_until = max(self._blocked_until, now + (retry_after or self.cooldown))
+            self._available_requests = 0.0
+            self._decrease(now, "rate limit (429)")
+
+    def record_failure(self):
+        """Feed back a provider call that failed for another reason"""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def stats(self):
+        """
+        Get the current state of the limiter
+
+        Returns:
+            dict: Current requests per minute, tokens in the current window, calls in flight and the counters
+        """
+        with self._lock:
+            return {
+                "rpm": self.rpm,
+                "window_tokens": self._window_tokens,
+                "in_flight": self.in_flight,
+                "successes": self.successes,
+                "rate_limited": self.rate_limited,
+                "latency_spikes": self.latency_spikes,
+            }
+
+
+class AdaptiveRateLimitCallback(BaseCallbackHandler):
+    """
+    Callback handler feeding the latency, token usage and 429 responses of the provider calls back to an
+    AdaptiveRateLimiter. Runs inline, so that the call of the current context is visible to acquire.
+    """
+    run_inline = True
+
+    def __init__(self, rate_limiter):
+        self.rate_limiter = rate_limiter
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id):
+        call = {}
+        _current_call.set(call)
+        with self._lock:
+            self._calls[run_id] = call
+
+    def _end(self, run_id):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        # Calls that were answered from the LLM cache have never been sent
+        return call if call and "sent_at" in call else None
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        call = self._end(run_id)
+        if call:
+            self.rate_limiter.record_success(time.monotonic() - call["sent_at"], _total_tokens(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        call = self._end(run_id)
+        if not call:
+            return
+        if _is_rate_limit_error(error):
+            self.rate_limiter.record_rate_limit(_retry_after(error))
+        else:
+            self.rate_limiter.record_failure()
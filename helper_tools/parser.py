@@ -1,6 +1,9 @@
+import numbers
 import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-import jsonlines
+import numpy as np
 import pandas as pd
 import tqdm
 from huggingface_hub import snapshot_download
@@ -10,35 +13,55 @@ from tqdm import tqdm
 import gzip
 from dotenv import load_dotenv
 import git
-from helper_tools.sort_jsonl import sort_jsonl_file
+from helper_tools.jsonl_index import JsonlIndex
 
 repo = git.Repo(search_parent_directories=True)
 
 load_dotenv(repo.working_dir + "/.env")
 
 
-def is_jsonl_sorted(filename, doc_id_key="docid", number_of_samples=None):
+DOC_INDEX_NAME = "doc_index"
+
+
+def index_by_docid(triple_df):
     """
-    Check if a JSONL file is sorted by docid.
-    
+    Sort triples by docid and index them by it, so get_doc_triples can look up a document in O(log n).
+
     Args:
-        filename (str): Path to the JSONL file
-        doc_id_key (str): Key to use for checking sort order
-        number_of_samples (int, optional): Number of samples to check. If None, checks all samples.
-        
+        triple_df (pd.DataFrame): Triples with a "docid" column
+
     Returns:
-        bool: True if file is sorted, False otherwise
+        pd.DataFrame: The sorted triples, indexed by their docid
     """
-    last_id = None
-    with jsonlines.open(filename) as reader:
-        for i, entry in enumerate(reader):
-            if number_of_samples is not None and i >= number_of_samples:
-                break
-            current_id = entry.get(doc_id_key)
-            if last_id is not None and current_id < last_id:
-                return False
-            last_id = current_id
-    return True
+    if "docid" not in triple_df.columns:
+        return triple_df
+    triple_df = triple_df.sort_values("docid", kind="stable")
+    triple_df.index = pd.Index(triple_df["docid"], name=DOC_INDEX_NAME)
+    return triple_df
+
+
+def get_doc_triples(triple_df, doc_id):
+    """
+    Get the triples of a single document.
+
+    Uses the docid index built by index_by_docid if available and falls back to a full scan otherwise.
+
+    Args:
+        triple_df (pd.DataFrame): Triples with a "docid" column
+        doc_id: ID of the document
+
+    Returns:
+        pd.DataFrame: The triples of the document
+    """
+    # The index is only used if doc_id matches its dtype, as pandas may coerce e.g. a str ID against int docids
+    # in the slice, where the mask (like before the index) finds no triples
+    if (triple_df.index.name == DOC_INDEX_NAME and triple_df.index.is_monotonic_increasing
+            and pd.api.types.is_numeric_dtype(triple_df.index) == isinstance(doc_id, numbers.Number)):
+        try:
+            return triple_df.loc[doc_id:doc_id]
+        except (TypeError, KeyError):
+            pass
+    return triple_df[triple_df["docid"] == doc_id]
 
 
 def add_wikidata_prefix(uri):
@@ -47,98 +70,127 @@ def add_wikidata_prefix(uri):
     return uri
 
 
+UPLOAD_BATCH_SIZE = int(os.getenv("UPLOAD_BATCH_SIZE", 100))
+UPLOAD_FETCH_WORKERS = int(os.getenv("UPLOAD_FETCH_WORKERS", 4))
+# Number of fetched batches that may wait for the embedding stage
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", 8))
+
+
+def fetch_upload_metadata(batch, with_examples=False):
+    """
+    Fetch the descriptions (and property examples) of a batch of elements in batched queries.
+
+    Args:
+        batch: List of (uri, label) tuples
+        with_examples (bool, optional): Also build the example sentence of every (predicate) element
+
+    Returns:
+        dict: Mapping of URI to the element dict expected by QdrantUploader.add_many
+    """
+    from helper_tools.wikidata_loader import get_descriptions, get_property_examples
+
+    uris = [uri for uri, _ in batch]
+    descriptions = get_descriptions(uris)
+    property_examples = get_property_examples(uris) if with_examples else {}
+    elements = {}
+    for (uri, label), description in zip(batch, descriptions):
+        elements[uri] = {'label': label, 'description': description}
+        if with_examples:
+            property_example = property_examples.get(uri)
+            elements[uri]['example'] = f"{property_example['subject_label']} {label} {property_example['object_label']}" if property_example else ""
+    return elements
+
+
+def upload_elements_pipelined(uploader, elements, with_examples=False, desc="Uploading elements"):
+    """
+    Upload elements that are not yet tracked in Redis as a pipeline of stages: Redis dedup and embedding run on the
+    calling thread, the metadata of the next UPLOAD_QUEUE_SIZE batches is fetched by UPLOAD_FETCH_WORKERS threads
+    meanwhile, and the uploader upserts the embedded batches on its own threads.
+
+    Args:
+        uploader (QdrantUploader): Uploader to embed and upsert the elements with
+        elements: Iterable of (uri, label) tuples, the first label of a URI is used
+        with_examples (bool, optional): Upload property examples, for predicates
+        desc (str, optional): Description of the progress bar
+
+    Returns:
+        tuple: Number of elements that were uploaded and number of elements that were already in the database
+    """
+    from helper_tools.redis_handler import get_element_infos
+
+    labels = {}
+    for uri, label in elements:
+        if "^^" not in uri:
+            labels.setdefault(uri, label)
+    uris = list(labels)
+
+    uploaded = 0
+    already_uploaded = 0
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=UPLOAD_FETCH_WORKERS) as fetch_pool, tqdm(total=len(uris), desc=desc) as progress:
+        for start in range(0, len(uris), UPLOAD_BATCH_SIZE):
+            batch_uris = uris[start:start + UPLOAD_BATCH_SIZE]
+            tracked = get_element_infos(batch_uris)
+            batch = [(uri, labels[uri]) for uri, info in zip(batch_uris, tracked) if not info]
+            already_uploaded += len(batch_uris) - len(batch)
+            progress.update(len(batch_uris) - len(batch))
+            if batch:
+                pending.append(fetch_pool.submit(fetch_upload_metadata, batch, with_examples))
+            while len(pending) > UPLOAD_QUEUE_SIZE or (pending and pending[0].done()):
+                batch_elements = pending.popleft().result()
+                uploader.add_many(batch_elements)
+                uploaded += len(batch_elements)
+                progress.update(len(batch_elements))
+        while pending:
+            batch_elements = pending.popleft().result()
+            uploader.add_many(batch_elements)
+            uploaded += len(batch_elements)
+            progress.update(len(batch_elements))
+    uploader.wait()
+    return uploaded, already_uploaded
+
+
 def upload_parsed_data(relation_df, entity_df):
-    from helper_tools.wikidata_loader import get_property_example
     """
-    Upload parsed entities and predicates to the vector store using bulk upload.
+    Upload parsed entities and predicates to the vector store using the pipelined bulk upload.
     
     Args:
         relation_df: DataFrame containing relations with predicates
         entity_df: DataFrame containing entities
     """
     if os.getenv("VECTOR_STORE") == "qdrant":
-        from helper_tools.qdrant_handler import upload_wikidata_elements
-        from helper_tools.redis_handler import get_element_info
-        from helper_tools.wikidata_loader import get_description
+        from helper_tools.qdrant_handler import QdrantUploader
     else:
         from helper_tools.faiss_handler import upload_wikidata_entity
         return
-    
-    # Process entities in bulk
-    entity_set = entity_df[['entity', 'entity_uri']].drop_duplicates()
-    print(f"Preparing entities for bulk upload to {os.getenv('VECTOR_STORE')}...")
-    
-    # Create a dictionary for bulk upload
-    entity_elements = {}
-    already_uploaded_entities = 0
-    
-    # Build dictionary for entities
-    for i, row in tqdm(entity_set.iterrows(), total=entity_set.shape[0], desc="Preparing entities"):
-        uri = row["entity_uri"]
-        label = row["entity"]
-        
-        # Check if entity is already in Redis
-        if get_element_info(uri):
-            already_uploaded_entities += 1
-            continue
-            
-        # Get description for the entity
-        description = get_description(uri)
-        
-        # Add to bulk upload dictionary
-        entity_elements[uri] = {
-            'label': label,
-            'description': description
-        }
-    
-    # Upload entities in bulk
-    if entity_elements:
-        print(f"Uploading {len(entity_elements)} entities to {os.getenv('VECTOR_STORE')} in batches...")
-        upload_wikidata_elements(entity_elements, "entity")
-        print(f"Entity upload complete. {len(entity_elements)} new entities uploaded, {already_uploaded_entities} entities were already in the database.")
-    else:
-        print(f"No new entities to upload. {already_uploaded_entities} entities were already in the database.")
-    
-    # Process predicates in bulk
-    predicate_set_df = relation_df[["predicate", "predicate_uri"]].drop_duplicates()
-    print(f"Preparing predicates for bulk upload to {os.getenv('VECTOR_STORE')}...")
-    
-    # Create a dictionary for bulk upload
-    predicate_elements = {}
-    already_uploaded_predicates = 0
-    
-    # Build dictionary for predicates
-    for i, row in tqdm(predicate_set_df.iterrows(), total=predicate_set_df.shape[0], desc="Preparing predicates"):
-        uri = row["predicate_uri"]
-        label = row["predicate"]
-        
-        # Check if predicate is already in Redis
-        if get_element_info(uri):
-            already_uploaded_predicates += 1
-            continue
-            
-        # Get description for the predicate
-        description = get_description(uri)
-        property_example = get_property_example(uri)
-        example = f"{property_example['subject_label']} {label} {property_example['object_label']}" if property_example else ""
-        
-        # Add to bulk upload dictionary
-        predicate_elements[uri] = {
-            'label': label,
-            'description': description,
-            'example': example
-        }
-    
-    # Upload predicates in bulk
-    if predicate_elements:
-        print(f"Uploading {len(predicate_elements)} predicates to {os.getenv('VECTOR_STORE')} in batches...")
-        upload_wikidata_elements(predicate_elements, "predicates")
-        print(f"Predicate upload complete. {len(predicate_elements)} new predicates uploaded, {already_uploaded_predicates} predicates were already in the database.")
-    else:
-        print(f"No new predicates to upload. {already_uploaded_predicates} predicates were already in the database.")
-
 
-def babelscape_parser(filename, number_of_samples=10, upload=True):
+    # Elements are deduplicated before their metadata is fetched, which also tracks them in Redis
+    with QdrantUploader(deduplicate=False) as uploader:
+        # Process entities in bulk
+        entity_set = entity_df[['entity', 'entity_uri']].drop_duplicates()
+        print(f"Uploading entities to {os.getenv('VECTOR_STORE')}...")
+        new_entities, already_uploaded_entities = upload_elements_pipelined(
+            uploader, zip(entity_set["entity_uri"], entity_set["entity"]), desc="Uploading entities"
+        )
+        if new_entities:
+            print(f"Entity upload complete. {new_entities} new entities uploaded, {already_uploaded_entities} entities were already in the database.")
+        else:
+            print(f"No new entities to upload. {already_uploaded_entities} entities were already in the database.")
+
+        # Process predicates in bulk
+        predicate_set_df = relation_df[["predicate", "predicate_uri"]].drop_duplicates()
+        print(f"Uploading predicates to {os.getenv('VECTOR_STORE')}...")
+        new_predicates, already_uploaded_predicates = upload_elements_pipelined(
+            uploader, zip(predicate_set_df["predicate_uri"], predicate_set_df["predicate"]), with_examples=True,
+            desc="Uploading predicates"
+        )
+        if new_predicates:
+            print(f"Predicate upload complete. {new_predicates} new predicates uploaded, {already_uploaded_predicates} predicates were already in the database.")
+        else:
+            print(f"No new predicates to upload. {already_uploaded_predicates} predicates were already in the database.")
+
+
+def babelscape_parser(filename, number_of_samples=10, upload=True, start=0):
     doc_id_key = "docid"
     relation_key = "relations"
     if "rebel" in filename:
@@ -149,55 +201,42 @@ def babelscape_parser(filename, number_of_samples=10, upload=True):
     elif "redfm" in filename:
         relation_key = "relations"
 
-    # Check if file is sorted
-    if not is_jsonl_sorted(filename, doc_id_key, number_of_samples):
-        print(f"File {filename} is not sorted by {doc_id_key} in the first {number_of_samples} samples. Sorting now...")
-        sort_jsonl_file(filename)
-        print("Sorting complete. Re-parsing file...")
-
-    data = []
-
-    i = 0
-
-    with jsonlines.open(filename) as reader:
-        with tqdm(total=number_of_samples) as pbar:
-            for obj in reader:
-                data.append(obj)
-                i += 1
-                pbar.update(1)
-                if i == number_of_samples:
-                    break
-
-    docs = pd.DataFrame([{
-        "docid": datapoint[doc_id_key],
-        "text": datapoint["text"]
-    }
-        for datapoint in data
-    ]).drop_duplicates()
-
-    relation_df = pd.DataFrame([
-        {
-            "docid": datapoint[doc_id_key],
-            "subject": triple["subject"]["surfaceform"],
-            "subject_uri": add_wikidata_prefix(triple["subject"]["uri"]),
-            "predicate": triple["predicate"]["surfaceform"],
-            "predicate_uri": add_wikidata_prefix(triple["predicate"]["uri"]),
-            "object": triple["object"]["surfaceform"],
-            "object_uri": add_wikidata_prefix(triple["object"]["uri"])
-        }
-        for datapoint in data
-        for triple in datapoint[relation_key]
-    ])
-
-    entity_df = pd.DataFrame([
-        {
-            "docid": datapoint[doc_id_key],
-            "entity": entity["surfaceform"],
-            "entity_uri": add_wikidata_prefix(entity["uri"])
-        }
-        for datapoint in data
-        for entity in datapoint["entities"]
-    ])
+    # The documents are read through the sidecar index of the file, which is built on first use, instead of sorting
+    # the file. Like before, the first documents of the file are used if they are sorted by docid, otherwise the
+    # documents with the smallest docids.
+    index = JsonlIndex.load(filename, doc_id_key)
+    if number_of_samples is not None and number_of_samples < 0:
+        number_of_samples = None
+    file_positions = index.file_positions(None if number_of_samples is None else start + number_of_samples)
+    file_docids = index.docids[file_positions]
+    if np.all(file_docids[1:] >= file_docids[:-1]):
+        data = index.read(file_positions[start:])
+    else:
+        print(f"File {filename} is not sorted by {doc_id_key} in the first {len(file_positions)} samples. Reading them in {doc_id_key} order...")
+        data = index.head(number_of_samples, start=start)
+
+    docs = pd.DataFrame({
+        "docid": [datapoint[doc_id_key] for datapoint in data],
+        "text": [datapoint["text"] for datapoint in data]
+    }).drop_duplicates()
+
+    relation_columns = {column: [] for column in ["docid", "subject", "subject_uri", "predicate", "predicate_uri", "object", "object_uri"]}
+    for datapoint in data:
+        for triple in datapoint[relation_key]:
+            relation_columns["docid"].append(datapoint[doc_id_key])
+            for part in ["subject", "predicate", "object"]:
+                relation_columns[part].append(triple[part]["surfaceform"])
+                relation_columns[f"{part}_uri"].append(add_wikidata_prefix(triple[part]["uri"]))
+    relation_df = pd.DataFrame(relation_columns) if relation_columns["docid"] else pd.DataFrame()
+    relation_df = index_by_docid(relation_df)
+
+    entity_columns = {column: [] for column in ["docid", "entity", "entity_uri"]}
+    for datapoint in data:
+        for entity in datapoint["entities"]:
+            entity_columns["docid"].append(datapoint[doc_id_key])
+            entity_columns["entity"].append(entity["surfaceform"])
+            entity_columns["entity_uri"].append(add_wikidata_prefix(entity["uri"]))
+    entity_df = pd.DataFrame(entity_columns) if entity_columns["docid"] else pd.DataFrame()
 
     if upload:
         upload_parsed_data(relation_df=relation_df, entity_df=entity_df)
@@ -231,7 +270,7 @@ def _synthie_base_parser(split: str, version: str, number_of_samples: int = 10,
     Args:
         split (str): Dataset split to use ('train', 'test')
         version (str): Dataset version ('code' or 'text')
-        number_of_samples (int, optional): Number of samples to parse. Defaults to 10.
+        number_of_samples (int, optional): Number of samples to parse, None or -1 for all. Defaults to 10.
         upload (bool, optional): Whether to upload parsed data. Defaults to True.
         
     Returns:
@@ -268,7 +307,7 @@ def synthie_code_parser(split: str, number_of_samples: int = 10, upload=True):
     
     Args:
         split (str): Dataset split to use ('train', 'test')
-        number_of_samples (int, optional): Number of samples to parse. Defaults to 10.
+        number_of_samples (int, optional): Number of samples to parse, None or -1 for all. Defaults to 10.
         upload (bool, optional): Whether to upload parsed data. Defaults to True.
         
     Returns:
@@ -283,7 +322,7 @@ def synthie_text_parser(split: str, number_of_samples: int = 10, upload=True):
     
     Args:
         split (str): Dataset split to use ('train', 'test')
-        number_of_samples (int, optional): Number of samples to parse. Defaults to 10.
+        number_of_samples (int, optional): Number of samples to parse, None or -1 for all. Defaults to 10.
         upload (bool, optional): Whether to upload parsed data. Defaults to True.
         
     Returns:
@@ -299,7 +338,7 @@ def unified_parser(dataset: str, split: str, number_of_samples: int = 10, upload
     Args:
         dataset (str): Name of the dataset ('rebel', 'redfm', 'synthie_code', or 'synthie_text')
         split (str): Dataset split to use ('train', 'test')
-        number_of_samples (int, optional): Number of samples to parse. Defaults to 10.
+        number_of_samples (int, optional): Number of samples to parse, None or -1 for all. Defaults to 10.
         upload (bool, optional): Whether to upload parsed data. Defaults to True.
         
     Returns:
@@ -0,0 +1,164 @@
+import logging
+import os
+import pickle
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+from rdflib import Graph, RDFS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ALL_PROPERTIES_PATH = Path(__file__).parent.parent / "infrastructure" / "all_properties.ttl"
+
+
+class PredicateHierarchy:
+    """
+    In-memory transitive closure of rdfs:subPropertyOf between Wikidata properties
+    """
+    def __init__(self, uris, ancestors):
+        """
+        Initialize the hierarchy
+
+        Args:
+            uris (list): Property URIs, where the position of a URI is its integer ID
+            ancestors (list): For every integer ID, the frozenset of IDs it is a transitive subproperty of
+        """
+        self.uris = uris
+        self.ids = {uri: i for i, uri in enumerate(uris)}
+        self.ancestors = ancestors
+
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        Compute the transitive closure from (subproperty, superproperty) URI pairs
+
+        Args:
+            edges: Iterable of (subproperty_uri, superproperty_uri) tuples
+
+        Returns:
+            PredicateHierarchy: The hierarchy containing all properties of the edges
+        """
+        ids = {}
+        parents = defaultdict(set)
+        for sub_uri, super_uri in edges:
+            sub_id = ids.setdefault(sub_uri, len(ids))
+            super_id = ids.setdefault(super_uri, len(ids))
+            parents[sub_id].add(super_id)
+
+        ancestors = []
+        for node in range(len(ids)):
+            # Like SPARQL's subPropertyOf+, a property only is its own ancestor if it lies on a cycle
+            reached = set()
+            stack = list(parents[node])
+            while stack:
+                current = stack.pop()
+                if current in reached:
+                    continue
+                reached.add(current)
+                stack.extend(parents[current] - reached)
+            ancestors.append(frozenset(reached))
+
+        uris = [None] * len(ids)
+        for uri, i in ids.items():
+            uris[i] = uri
+        return cls(uris, ancestors)
+
+    @classmethod
+    def from_turtle(cls, path):
+        """
+        Build the hierarchy from the rdfs:subPropertyOf triples of a Turtle file
+
+        Args:
+            path (str): Path to the Turtle file, e.g. infrastructure/all_properties.ttl
+
+        Returns:
+            PredicateHierarchy: The hierarchy of all properties in the file
+        """
+        graph = Graph()
+        graph.parse(str(path), format="turtle")
+        return cls.from_edges(
+            (str(sub), str(sup)) for sub, sup in graph.subject_objects(RDFS.subPropertyOf)
+        )
+
+    @classmethod
+    def load(cls, path=ALL_PROPERTIES_PATH):
+        """
+        Load the hierarchy of a Turtle file, using a pickled index next to the file if it is up to date
+
+        Args:
+            path (str, optional): Path to the Turtle file. Defaults to infrastructure/all_properties.ttl.
+
+        Returns:
+            PredicateHierarchy: The loaded hierarchy
+        """
+        path = Path(path)
+        index_path = path.with_suffix(".closure.pkl")
+        if index_path.exists() and index_path.stat().st_mtime >= path.stat().st_mtime:
+            with open(index_path, "rb") as f:
+                uris, ancestors = pickle.load(f)
+            return cls(uris, ancestors)
+
+        logger.info(f"Computing subproperty closure of {path}")
+        hierarchy = cls.from_turtle(path)
+        try:
+            with open(index_path, "wb") as f:
+                pickle.dump((hierarchy.uris, hierarchy.ancestors), f)
+        except OSError as e:
+            logger.warning(f"Could not save subproperty closure to {index_path}: {e}")
+        logger.info(f"Subproperty closure of {len(hierarchy.uris)} properties loaded")
+        return hierarchy
+
+    def is_subproperty(self, predicate_a, predicate_b):
+        """
+        Check whether predicate_a is a transitive subproperty of predicate_b
+
+        Args:
+            predicate_a (str): URI of the potential subproperty
+            predicate_b (str): URI of the potential superproperty
+
+        Returns:
+            bool: True if predicate_a rdfs:subPropertyOf+ predicate_b holds
+        """
+        a = self.ids.get(predicate_a)
+        b = self.ids.get(predicate_b)
+        if a is None or b is None:
+            return False
+        return b in self.ancestors[a]
+
+    def relations(self, predicate_a, predicate_b):
+        """
+        Get the relations of predicate_a to predicate_b, in the format of check_inter_predicate_relations
+
+        Args:
+            predicate_a (str): URI of the first predicate
+            predicate_b (str): URI of the second predicate
+
+        Returns:
+            list: ["subPropertyOf"], ["parentPropertyOf"] or [] if the predicates are not related
+        """
+        if self.is_subproperty(predicate_a, predicate_b):
+            return ["subPropertyOf"]
+        if self.is_subproperty(predicate_b, predicate_a):
+            return ["parentPropertyOf"]
+        return []
+
+
+_predicate_hierarchy = None
+_predicate_hierarchy_lock = threading.Lock()
+
+
+def get_predicate_hierarchy():
+    """
+    Get the process-wide predicate hierarchy, loading it on first use
+
+    Returns:
+        PredicateHierarchy: The hierarchy of infrastructure/all_properties.ttl
+    """
+    global _predicate_hierarchy
+    with _predicate_hierarchy_lock:
+        if _predicate_hierarchy is None:
+            _predicate_hierarchy = PredicateHierarchy.load(os.getenv("ALL_PROPERTIES_PATH", ALL_PROPERTIES_PATH))
+    return _predicate_hierarchy
@@ -0,0 +1,210 @@
+import argparse
+import logging
+import os
+import pickle
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+from rdflib import Graph, RDFS
+
+from helper_tools.predicate_hierarchy import ALL_PROPERTIES_PATH
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PROPERTY_GRAPH_PATH = Path(__file__).parent.parent / "infrastructure" / "all_properties.graph.pkl"
+
+
+def is_available(path=PROPERTY_GRAPH_PATH):
+    """
+    Check whether the property graph has been built
+
+    Args:
+        path (str, optional): Path to the property graph. Defaults to infrastructure/all_properties.graph.pkl.
+
+    Returns:
+        bool: True if PropertyGraph.load can be used
+    """
+    return Path(path).exists()
+
+
+class PropertyGraph:
+    """
+    Precompiled neighborhood of every Wikidata property: its direct super- and sub-properties, its subject and value
+    type constraints, its label and its P1855 example, so network_traversal_search can rank replacement candidates
+    without querying Wikidata.
+    """
+    def __init__(self, labels, superproperties, constraints, examples):
+        """
+        Initialize the graph
+
+        Args:
+            labels (dict): Mapping of property URI to its English label
+            superproperties (dict): Mapping of property URI to the list of its direct super-property URIs
+            constraints (dict): Mapping of (property_uri, constraint_type) to the list of (class_uri, class_label)
+                tuples, for constraint_type "subject" and "value"
+            examples (dict): Mapping of property URI to its example as returned by get_property_example
+        """
+        self.labels = labels
+        self.superproperties = superproperties
+        self.constraints = constraints
+        self.examples = examples
+        self.subproperties = defaultdict(list)
+        for sub_uri, super_uris in superproperties.items():
+            for super_uri in super_uris:
+                self.subproperties[super_uri].append(sub_uri)
+
+    @classmethod
+    def build(cls, path=ALL_PROPERTIES_PATH):
+        """
+        Build the graph from the rdfs:subPropertyOf triples and labels of a Turtle file and a one-time dump of the
+        type constraints and examples of its properties from Wikidata
+
+        Args:
+            path (str, optional): Path to the Turtle file. Defaults to infrastructure/all_properties.ttl.
+
+        Returns:
+            PropertyGraph: The graph of all properties in the file
+        """
+        from helper_tools.wikidata_loader import fetch_element_infos_from_sparql
+        from helper_tools.wikidata_snapshot import fetch_property_examples, fetch_type_constraints
+
+        graph = Graph()
+        graph.parse(str(path), format="turtle")
+        superproperties = defaultdict(list)
+        for sub, sup in graph.subject_objects(RDFS.subPropertyOf):
+            superproperties[str(sub)].append(str(sup))
+        labels = {}
+        for subject, label in graph.subject_objects(RDFS.label):
+            if getattr(label, "language", None) == "en":
+                labels.setdefault(str(subject), str(label))
+        property_uris = sorted(set(labels) | set(superproperties) | {
+            super_uri for super_uris in superproperties.values() for super_uri in super_uris
+        })
+        logger.info(f"Read {len(property_uris)} properties from {path}")
+
+        type_constraints = fetch_type_constraints(property_uris)
+        class_uris = sorted({class_uri for _, _, class_uri in type_constraints})
+        class_labels = {
+            uri: label for uri, (label, _) in fetch_element_infos_from_sparql(class_uris).items()
+            if label != "No Label Found"
+        }
+        constraints = defaultdict(list)
+        for property_uri, constraint_type, class_uri in sorted(type_constraints):
+            # Like validation.get_type_constraints, the label falls back to the URI
+            constraints[(property_uri, constraint_type)].append((class_uri, class_labels.get(class_uri, class_uri)))
+        logger.info(f"Fetched {len(type_constraints)} type constraints")
+
+        examples = {
+            uri: dict(zip(["subject_uri", "subject_label", "object_uri", "object_label"], example))
+            for uri, example in fetch_property_examples(property_uris).items()
+        }
+        logger.info(f"Fetched examples of {len(examples)} properties")
+        return cls(labels, dict(superproperties), dict(constraints), examples)
+
+    def save(self, path=PROPERTY_GRAPH_PATH):
+        """
+        Save the graph, replacing an existing graph atomically
+
+        Args:
+            path (str, optional): Path of the graph. Defaults to infrastructure/all_properties.graph.pkl.
+        """
+        path = Path(path)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump((self.labels, self.superproperties, self.constraints, self.examples), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=PROPERTY_GRAPH_PATH):
+        """
+        Load a saved graph
+
+        Args:
+            path (str, optional): Path of the graph. Defaults to infrastructure/all_properties.graph.pkl.
+
+        Returns:
+            PropertyGraph: The loaded graph
+        """
+        with open(path, "rb") as f:
+            return cls(*pickle.load(f))
+
+    def type_constraints(self, property_uri, constraint_type):
+        """
+        Get the subject or value type constraints of a property, in the format of validation.get_type_constraints
+
+        Args:
+            property_uri (str): URI of the property
+            constraint_type (str): "subject" or "value"
+
+        Returns:
+            list: (constraint_uri, constraint_label) tuples
+        """
+        return self.constraints.get((property_uri, constraint_type), [])
+
+    def neighborhood(self, property_uri):
+        """
+        Get the direct super- and sub-properties of a property with their type constraints, in the format of
+        property_neighborhood.get_property_neighborhoods
+
+        Args:
+            property_uri (str): URI of the property
+
+        Returns:
+            dict: {"super": [...], "sub": [...]} lists of neighbor dicts
+        """
+        return {
+            direction: [
+                {
+                    "uri": neighbor_uri,
+                    "label": self.labels.get(neighbor_uri, "No Label"),
+                    "subject_constraints": self.type_constraints(neighbor_uri, "subject"),
+                    "value_constraints": self.type_constraints(neighbor_uri, "value"),
+                }
+                for neighbor_uri in neighbors.get(property_uri, [])
+            ]
+            for direction, neighbors in (("super", self.superproperties), ("sub", self.subproperties))
+        }
+
+    def example(self, property_uri):
+        """
+        Get the example of a property, in the format of wikidata_loader.get_property_example
+
+        Args:
+            property_uri (str): URI of the property
+
+        Returns:
+            dict: Example subject and object with their labels, or empty dict if no example is known
+        """
+        return self.examples.get(property_uri, {})
+
+
+_property_graph = None
+_property_graph_lock = threading.Lock()
+
+
+def get_property_graph():
+    """
+    Get the process-wide property graph, loading it on first use
+
+    Returns:
+        PropertyGraph: The graph at PROPERTY_GRAPH_PATH
+    """
+    global _property_graph
+    with _property_graph_lock:
+        if _property_graph is None:
+            _property_graph = PropertyGraph.load(os.getenv("PROPERTY_GRAPH_PATH", PROPERTY_GRAPH_PATH))
+    return _property_graph
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Build the offline property graph used by PROPERTY_NEIGHBORHOOD_BACKEND=memory")
+    arg_parser.add_argument("--properties", type=str, default=str(ALL_PROPERTIES_PATH), help="Path of all_properties.ttl")
+    arg_parser.add_argument("--output", type=str, default=str(PROPERTY_GRAPH_PATH), help="Path of the property graph")
+    args = arg_parser.parse_args()
+
+    property_graph = PropertyGraph.build(args.properties)
+    property_graph.save(args.output)
+    logger.info(f"Property graph of {len(property_graph.labels)} properties written to {args.output}")
@@ -0,0 +1,172 @@
+import logging
+import os
+import threading
+
+from helper_tools.property_graph import PROPERTY_GRAPH_PATH, get_property_graph, is_available as property_graph_available
+from helper_tools.validation import get_type_constraints_batch
+from helper_tools.wikidata_loader import VALID_IRI_PATTERN, get_labels, get_property_examples, send_query
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+NEIGHBORHOOD_BATCH_SIZE = 50
+
+# "memory" serves neighborhoods and examples from the precompiled property graph, "sparql" asks Wikidata.
+# Defaults to "memory" if the property graph has been built.
+PROPERTY_NEIGHBORHOOD_BACKEND = os.getenv(
+    "PROPERTY_NEIGHBORHOOD_BACKEND",
+    "memory" if property_graph_available(os.getenv("PROPERTY_GRAPH_PATH", PROPERTY_GRAPH_PATH)) else "sparql"
+)
+
+# Process-wide caches, neighborhoods and examples of properties rarely change during a run
+_neighborhoods = {}
+_property_examples = {}
+_cache_lock = threading.Lock()
+
+
+def fetch_property_neighbors(property_uris):
+    """
+    Fetch the super-properties and sub-properties (P1647) of multiple properties with one query per chunk.
+
+    Args:
+        property_uris (list): The property URIs
+
+    Returns:
+        dict: Mapping of property URI to {"super": [(uri, label)], "sub": [(uri, label)]}, properties of failed
+            queries are left out
+    """
+    property_uris = [uri for uri in dict.fromkeys(property_uris) if VALID_IRI_PATTERN.match(uri)]
+    neighbors = {}
+    for start in range(0, len(property_uris), NEIGHBORHOOD_BATCH_SIZE):
+        chunk = property_uris[start:start + NEIGHBORHOOD_BATCH_SIZE]
+        values = " ".join(f"<{uri}>" for uri in chunk)
+        query = f"""
+        SELECT DISTINCT ?property ?direction ?neighbor ?neighborLabel
+        WHERE {{
+          VALUES ?property {{ {values} }}
+          {{ ?property wdt:P1647 ?neighbor . BIND("super" AS ?direction) }}
+          UNION
+          {{ ?neighbor wdt:P1647 ?property . BIND("sub" AS ?direction) }}
+          SERVICE wikibase:label {{
+            bd:serviceParam wikibase:language "en" .
+            ?neighbor rdfs:label ?neighborLabel .
+          }}
+        }}
+        """
+        results = send_query(query)
+        if not results:
+            logger.warning(f"Neighborhood query for {len(chunk)} properties failed")
+            continue
+        for uri in chunk:
+            neighbors[uri] = {"super": [], "sub": []}
+        for binding in results["results"]["bindings"]:
+            neighbors[binding["property"]["value"]][binding["direction"]["value"]].append((
+                binding["neighbor"]["value"],
+                binding.get("neighborLabel", {}).get("value", "No Label")
+            ))
+    return neighbors
+
+
+def get_property_neighborhoods(property_uris):
+    """
+    Get the super-properties and sub-properties of multiple properties with the type constraints of these neighbors,
+    fetching only the properties that are not cached yet.
+
+    Args:
+        property_uris (list): The property URIs
+
+    Returns:
+        dict: Mapping of every property URI to {"super": [...], "sub": [...]}, where each neighbor is a dict with
+            "uri", "label", "subject_constraints" and "value_constraints" ((constraint_uri, constraint_label) lists)
+    """
+    property_uris = list(dict.fromkeys(property_uris))
+    if PROPERTY_NEIGHBORHOOD_BACKEND == "memory":
+        property_graph = get_property_graph()
+        return {uri: property_graph.neighborhood(uri) for uri in property_uris}
+
+    with _cache_lock:
+        missing = [uri for uri in property_uris if uri not in _neighborhoods]
+
+    fetched = {}
+    if missing:
+        neighbors = fetch_property_neighbors(missing)
+        constraints, failed_constraints = get_type_constraints_batch(
+            [neighbor_uri for directions in neighbors.values() for direction in directions.values()
+             for neighbor_uri, _ in direction],
+            return_failed=True
+        )
+        fetched = {
+            property_uri: {
+                direction: [
+                    {
+                        "uri": neighbor_uri,
+                        "label": neighbor_label,
+                        "subject_constraints": constraints[(neighbor_uri, "subject")],
+                        "value_constraints": constraints[(neighbor_uri, "value")],
+                    }
+                    for neighbor_uri, neighbor_label in direction_neighbors
+                ]
+                for direction, direction_neighbors in directions.items()
+            }
+            for property_uri, directions in neighbors.items()
+        }
+        with _cache_lock:
+            # Neighborhoods with neighbors of failed constraint queries are returned, but fetched again on the next
+            # call, instead of treating these neighbors as unconstrained for the rest of the run
+            _neighborhoods.update(
+                (property_uri, neighborhood) for property_uri, neighborhood in fetched.items()
+                if not any(neighbor_uri in failed_constraints
+                           for direction in neighbors[property_uri].values() for neighbor_uri, _ in direction)
+            )
+
+    with _cache_lock:
+        return {uri: _neighborhoods.get(uri, fetched.get(uri, {"super": [], "sub": []})) for uri in property_uris}
+
+
+def get_cached_property_examples(property_uris):
+    """
+    Cached version of wikidata_loader.get_property_examples
+
+    Args:
+        property_uris (list): The property URIs
+
+    Returns:
+        dict: Mapping of every property URI to its example as returned by get_property_example
+    """
+    property_uris = list(dict.fromkeys(property_uris))
+    if PROPERTY_NEIGHBORHOOD_BACKEND == "memory":
+        property_graph = get_property_graph()
+        return {uri: property_graph.example(uri) for uri in property_uris}
+
+    with _cache_lock:
+        missing = [uri for uri in property_uris if uri not in _property_examples]
+    if missing:
+        examples = get_property_examples(missing)
+        with _cache_lock:
+            # Properties of failed chunks come back as {} like properties without an example, so only the found
+            # examples are cached and the others are fetched again on the next call
+            _property_examples.update((uri, example) for uri, example in examples.items() if example)
+    with _cache_lock:
+        return {uri: _property_examples.get(uri, {}) for uri in property_uris}
+
+
+def get_property_labels(property_uris):
+    """
+    Get the labels of multiple properties, from the property graph if available
+
+    Args:
+        property_uris (list): The property URIs
+
+    Returns:
+        dict: Mapping of every property URI to its label
+    """
+    property_uris = list(dict.fromkeys(property_uris))
+    labels = {}
+    if PROPERTY_NEIGHBORHOOD_BACKEND == "memory":
+        property_graph = get_property_graph()
+        labels = {uri: property_graph.labels[uri] for uri in property_uris if uri in property_graph.labels}
+    missing = [uri for uri in property_uris if uri not in labels]
+    if missing:
+        labels.update(zip(missing, get_labels(missing)))
+    return labels
@@ -1,156 +1,227 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import tqdm
 from langchain_core.documents import Document
-from langchain_ollama.embeddings import OllamaEmbeddings
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient, models
 
-from helper_tools.base_setup import client
-from helper_tools.redis_handler import get_element_info, element_info_upload, clear_redis
+from helper_tools.base_setup import client, embeddings
+from helper_tools.redis_handler import get_element_infos, element_infos_upload, clear_redis
 from dotenv import load_dotenv
 import os
 import git
 
-from helper_tools.wikidata_loader import get_description
+from helper_tools.wikidata_loader import get_descriptions
 
 repo = git.Repo(search_parent_directories=True)
 load_dotenv(repo.working_dir + "/.env", override=True)
 
+QDRANT_UPLOAD_BATCH_SIZE = int(os.getenv("QDRANT_UPLOAD_BATCH_SIZE", 100))
+QDRANT_UPLOAD_WORKERS = int(os.getenv("QDRANT_UPLOAD_WORKERS", 4))
 
-def upload_wikidata_element(uri, label, description=None):
-    if "^^" in uri:
-        return None
+LABEL_COLLECTION = "wikidata_labels"
+DESCRIPTION_COLLECTION = "wikidata_descriptions"
+EXAMPLE_COLLECTION = "wikidata_examples"
+
+
+def get_element_type(uri):
+    return "predicate" if "entity/P" in uri else "entity" if "entity/Q" in uri else "unknown"
+
+
+class QdrantUploader:
+    """
+    Long-lived uploader of Wikidata elements to the label, description and example collections.
+
+    Elements are buffered and flushed in batches: the batch is deduplicated against Redis with one pipeline, missing
+    descriptions are fetched in one batch, all texts are embedded with one call and the upserts run on a thread pool,
+    so the next batch is prepared while the previous ones are uploaded. Uploaded elements are tracked in Redis.
+    """
+    def __init__(self, qdrant_client=client, embedding=embeddings, batch_size=QDRANT_UPLOAD_BATCH_SIZE,
+                 workers=QDRANT_UPLOAD_WORKERS, deduplicate=True):
+        """
+        Initialize the uploader
+
+        Args:
+            qdrant_client (QdrantClient, optional): Qdrant client. Defaults to the client of base_setup.
+            embedding (Embeddings, optional): Embedding model. Defaults to the (cached) embeddings of base_setup.
+            batch_size (int, optional): Number of elements per flush. Defaults to QDRANT_UPLOAD_BATCH_SIZE.
+            workers (int, optional): Number of batches upserted in parallel. Defaults to QDRANT_UPLOAD_WORKERS.
+            deduplicate (bool, optional): Skip elements that are already tracked in Redis. Defaults to True.
+        """
+        self.embedding = embedding
+        self.batch_size = batch_size
+        self.workers = workers
+        self.deduplicate = deduplicate
+        self.stores = {
+            collection_name: QdrantVectorStore(client=qdrant_client, collection_name=collection_name, embedding=embedding)
+            for collection_name in (LABEL_COLLECTION, DESCRIPTION_COLLECTION, EXAMPLE_COLLECTION)
+        }
+        self.uploaded = 0
+        self.skipped = 0
+        self._buffer = {}
+        self._submitted = set()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qdrant-upload")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, uri, label, description=None, example=None):
+        """
+        Add an element, flushing the buffer once it holds batch_size elements
+
+        Args:
+            uri (str): URI of the element
+            label (str): Label of the element
+            description (str, optional): Description of the element, fetched from Wikidata if missing
+            example (str, optional): Usage example of a predicate, uploaded to the example collection
+        """
+        if "^^" in uri:
+            return
+        with self._lock:
+            self._buffer[uri] = (label, description, example)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def add_many(self, elements):
+        """
+        Add multiple elements
+
+        Args:
+            elements: Mapping or iterable of (uri, content) pairs, where content is a dict with 'label' and optionally
+                'description' and 'example'
+        """
+        if isinstance(elements, dict):
+            elements = elements.items()
+        for uri, content in elements:
+            self.add(uri, content.get("label"), content.get("description"), content.get("example"))
+
+    def flush(self):
+        """
+        Prepare the buffered elements and submit their upsert
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, {}
+            if not batch:
+                return
+
+            uris = [uri for uri in batch if uri not in self._submitted]
+            if self.deduplicate and uris:
+                tracked = get_element_infos(uris)
+                uris = [uri for uri, info in zip(uris, tracked) if not info]
+            self.skipped += len(batch) - len(uris)
+            self._submitted.update(uris)
+            missing_descriptions = [uri for uri in uris if not batch[uri][1]]
+            descriptions = dict(zip(missing_descriptions, get_descriptions(missing_descriptions))) if missing_descriptions else {}
+
+            documents = {collection_name: [] for collection_name in self.stores}
+            element_infos = {}
+            for uri in uris:
+                label, description, example = batch[uri]
+                description = description or descriptions[uri]
+                element_type = get_element_type(uri)
+                label_metadata = {"uri": uri, "description": description, "type": element_type}
+                description_metadata = {"uri": uri, "label": label, "type": element_type}
+                if example:
+                    label_metadata["example"] = example
+                    description_metadata["example"] = example
+                    documents[EXAMPLE_COLLECTION].append(Document(
+                        page_content=example,
+                        metadata={"uri": uri, "label": label, "description": description, "type": element_type}
+                    ))
+                documents[LABEL_COLLECTION].append(Document(page_content=label, metadata=label_metadata))
+                documents[DESCRIPTION_COLLECTION].append(Document(page_content=description, metadata=description_metadata))
+                element_infos[uri] = (label, description)
+            if not element_infos:
+                return
+
+            # One embedding call for the texts of all collections
+            texts = [document.page_content for docs in documents.values() for document in docs]
+            vectors = iter(self.embedding.embed_documents(texts))
+            points = {
+                collection_name: [
+                    self._point(self.stores[collection_name], document, next(vectors)) for document in docs
+                ]
+                for collection_name, docs in documents.items()
+            }
+
+            # Bound the number of batches held in memory
+            while len(self._pending) >= 2 * self.workers:
+                self._pending.pop(0).result()
+            self._pending.append(self._executor.submit(self._upsert, points, element_infos))
+
+    @staticmethod
+    def _point(store, document, vector):
+        return models.PointStruct(
+            id=uuid.uuid4().hex,
+            vector={store.vector_name: vector},
+            payload={store.content_payload_key: document.page_content, store.metadata_payload_key: document.metadata},
+        )
+
+    def _upsert(self, points, element_infos):
+        for collection_name, collection_points in points.items():
+            if collection_points:
+                self.stores[collection_name].client.upsert(collection_name=collection_name, points=collection_points)
+        # Only track the elements in Redis once they are in all collections
+        element_infos_upload(element_infos)
+        with self._lock:
+            self.uploaded += len(element_infos)
+
+    def wait(self):
+        """
+        Flush the buffer and wait until all upserts are done
+
+        Raises:
+            Exception: The first error of a failed upsert
+        """
+        self.flush()
+        with self._flush_lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self):
+        """
+        Upload the remaining elements and shut down the upload threads
+        """
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown(wait=True)
 
-    # Check if entity is already tracked in Redis
-    tracking_info = get_element_info(uri)
-    if tracking_info:
-        return None
 
-    # Determine element type from URI
-    element_type = "predicate" if "entity/P" in uri else "entity" if "entity/Q" in uri else "unknown"
-
-    embeddings = OllamaEmbeddings(model=os.getenv("EMBEDDING_MODEL_ID"))
-    qdrant_wikidata_labels = QdrantVectorStore(
-        client=client,
-        collection_name="wikidata_labels",
-        embedding=embeddings
-    )
-    qdrant_wikidata_descriptions = QdrantVectorStore(
-        client=client,
-        collection_name="wikidata_descriptions",
-        embedding=embeddings
-    )
-
-    if not description:
-        description = get_description(uri)
-
-    label_doc = Document(page_content=label, metadata={"uri": uri, "description": description, "type": element_type})
-    description_doc = Document(page_content=description, metadata={"uri": uri, "label": label, "type": element_type})
-    qdrant_wikidata_labels.add_documents([label_doc])
-    qdrant_wikidata_descriptions.add_documents([description_doc])
-
-    # Track the upload in Redis with type information
-    element_info_upload(uri, label, description)
+def upload_wikidata_element(uri, label, description=None):
+    with QdrantUploader(batch_size=1, workers=1) as uploader:
+        uploader.add(uri, label, description)
     return None
 
 
-def upload_wikidata_elements(elements_dict, type):
+def upload_wikidata_elements(elements_dict, type=None):
     """
-    Upload multiple Wikidata elements in bulk, processing in batches of 100.
+    Upload multiple Wikidata elements in bulk, see QdrantUploader.
     
     Args:
         elements_dict: A dictionary where each key is a URI and each value is a dict with 'label' and optionally 'description'
                       Example: {'http://wikidata.org/entity/Q123': {'label': 'Example', 'description': 'This is an example'}}
+        type: "predicates" or "entity", kept for compatibility. Examples are uploaded for all elements that have one.
     """
     if not elements_dict:
         return None
-    
-    import tqdm
-    
-    # Initialize embedding model once for all uploads
-    embeddings = OllamaEmbeddings(model=os.getenv("EMBEDDING_MODEL_ID"))
-    qdrant_wikidata_labels = QdrantVectorStore(
-        client=client,
-        collection_name="wikidata_labels",
-        embedding=embeddings
-    )
-    qdrant_wikidata_descriptions = QdrantVectorStore(
-        client=client,
-        collection_name="wikidata_descriptions",
-        embedding=embeddings
-    )
-    qdrant_wikidata_examples = QdrantVectorStore(
-        client=client,
-        collection_name="wikidata_examples",
-        embedding=embeddings
-    )
-
-
-    # Process elements in batches of 100
-    batch_size = 100
-    all_uris = list(elements_dict.keys())
-    total_batches = (len(all_uris) + batch_size - 1) // batch_size  # Ceiling division
-    
-    print(f"Processing {len(elements_dict)} elements in {total_batches} batches of {batch_size}")
-    
-    # Process each batch with a progress bar
-    for batch_idx in tqdm.tqdm(range(total_batches), desc="Uploading batches"):
-        start_idx = batch_idx * batch_size
-        end_idx = min(start_idx + batch_size, len(all_uris))
-        batch_uris = all_uris[start_idx:end_idx]
-        
-        label_docs = []
-        description_docs = []
-        example_docs = []
-        
-        for uri in batch_uris:
-            if "^^" in uri:
-                continue
-                
-            content = elements_dict[uri]
-            label = content.get('label')
-            description = content.get('description')
-            example = content.get('example')
-            
-            # Determine element type from URI
-            element_type = "predicate" if "entity/P" in uri else "entity" if "entity/Q" in uri else "unknown"
-            
-            if not description:
-                description = get_description(uri)
-
-            
-            # Create document objects
-
-
-            if type == "predicates" and example != "":
-                label_doc = Document(page_content=label,
-                                     metadata={"uri": uri, "description": description, "type": element_type, "example": example})
-                description_doc = Document(page_content=description,
-                                           metadata={"uri": uri, "label": label, "type": element_type, "example": example})
-
-                label_docs.append(label_doc)
-                description_docs.append(description_doc)
-
-                example_doc = Document(page_content=example, metadata={"uri": uri, "label": label, "description": description, "type": element_type})
-                example_docs.append(example_doc)
-
-            else:
-                label_doc = Document(page_content=label,
-                                     metadata={"uri": uri, "description": description, "type": element_type})
-                description_doc = Document(page_content=description,
-                                           metadata={"uri": uri, "label": label, "type": element_type})
-
-                label_docs.append(label_doc)
-                description_docs.append(description_doc)
-
-            # Track the upload in Redis with type information
-            element_info_upload(uri, label, description)
-        
-        # Batch upload the current batch of documents
-        if label_docs:
-            qdrant_wikidata_labels.add_documents(label_docs)
-        if description_docs:
-            qdrant_wikidata_descriptions.add_documents(description_docs)
-        if example_docs:
-            qdrant_wikidata_examples.add_documents(example_docs)
+
+    print(f"Processing {len(elements_dict)} elements in batches of {QDRANT_UPLOAD_BATCH_SIZE}")
+
+    # The callers already skipped the elements tracked in Redis (and may have tracked their descriptions since)
+    with QdrantUploader(deduplicate=False) as uploader:
+        uploader.add_many(tqdm.tqdm(elements_dict.items(), desc="Uploading elements"))
     
     return None
 
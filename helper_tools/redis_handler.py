@@ -39,6 +39,63 @@ def get_element_info(uri: str) -> dict:
         return r.hgetall(uri)
     return {}
 
+def get_element_infos(uris: list) -> list:
+    """
+    Get the tracking information for multiple URIs in a single round trip.
+
+    Args:
+        uris (list): The URIs to check
+
+    Returns:
+        list: The tracking information of every URI in the same order, empty dicts for URIs that are not found
+    """
+    pipe = r.pipeline(transaction=False)
+    for uri in uris:
+        pipe.hgetall(uri)
+    return pipe.execute()
+
+def element_infos_upload(element_infos: dict) -> None:
+    """
+    Store the labels and descriptions of multiple URIs in a single round trip.
+
+    Args:
+        element_infos (dict): Mapping of URI to a (label, description) tuple
+    """
+    pipe = r.pipeline(transaction=False)
+    for uri, (label, description) in element_infos.items():
+        element_type = "predicate" if "entity/P" in uri else "entity" if "entity/Q" in uri else "unknown"
+        pipe.hset(uri, mapping={"label": label, "description": description, "type": element_type})
+    pipe.execute()
+
+INTER_PREDICATE_RELATIONS_KEY = "inter_predicate_relations"
+
+def get_inter_predicate_relations(predicate_a: str, predicate_b: str) -> list | None:
+    """
+    Get the cached inter predicate relations of an ordered predicate pair.
+    
+    Args:
+        predicate_a (str): URI of the first predicate
+        predicate_b (str): URI of the second predicate
+        
+    Returns:
+        list: The cached relations (possibly empty), None if the pair is not cached
+    """
+    cached = r.hget(INTER_PREDICATE_RELATIONS_KEY, f"{predicate_a} {predicate_b}")
+    if cached is None:
+        return None
+    return cached.split(",") if cached else []
+
+def inter_predicate_relations_upload(predicate_a: str, predicate_b: str, relations: list) -> None:
+    """
+    Cache the inter predicate relations of an ordered predicate pair.
+    
+    Args:
+        predicate_a (str): URI of the first predicate
+        predicate_b (str): URI of the second predicate
+        relations (list): Relations of predicate_a to predicate_b
+    """
+    r.hset(INTER_PREDICATE_RELATIONS_KEY, f"{predicate_a} {predicate_b}", ",".join(relations))
+
 def clear_redis() -> None:
     """
     Clear all data from the Redis database.
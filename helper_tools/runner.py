@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+from helper_tools.sparql_client import get_request_stats
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _to_json(value):
+    """Convert numpy scalars (e.g. doc ids from pandas) into plain Python values"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class ErrorRow(list):
+    """
+    Evaluation log row of a document whose processing failed. It is journaled as error, so that the document is
+    processed again when the run is resumed.
+    """
+
+
+class RunJournal:
+    """
+    On-disk JSONL journal of the evaluation log rows of finished documents, so an interrupted run can be resumed
+    """
+    def __init__(self, path, overwrite=False):
+        """
+        Initialize the journal, resuming an existing journal of an interrupted run
+
+        Args:
+            path (str): Path to the JSONL journal file
+            overwrite (bool, optional): Whether to start from scratch instead of resuming an existing journal.
+                Defaults to False.
+        """
+        self.path = path
+        self.finished = {}
+        self.failed = set()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path) and not overwrite:
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # The last line may be incomplete if the previous run was killed while writing
+                        continue
+                    if entry.get("error"):
+                        self.finished.pop(entry["doc_id"], None)
+                    else:
+                        self.finished[entry["doc_id"]] = entry["row"]
+            logger.info(f"Resuming from {path} with {len(self.finished)} finished documents")
+        else:
+            open(path, "w").close()
+
+        self._file = open(path, "a")
+
+    def append(self, doc_id, row, error=False):
+        """
+        Persist the evaluation log row of a finished document
+
+        Args:
+            doc_id: ID of the finished document
+            row (list): Evaluation log row of the document
+            error (bool, optional): Whether processing the document failed, so that it is processed again on resume.
+                Defaults to False.
+        """
+        entry = {"doc_id": doc_id, "row": row}
+        if error:
+            entry["error"] = True
+        line = json.dumps(entry, default=_to_json)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if error:
+                self.failed.add(doc_id)
+            else:
+                self.failed.discard(doc_id)
+                self.finished[doc_id] = row
+
+    def close(self):
+        """
+        Close the journal file
+        """
+        if not self._file.closed:
+            self._file.close()
+
+    def finish(self):
+        """
+        Close the journal once the results of the run are saved. It is deleted if all documents were processed, so
+        that the next run starts from scratch, otherwise it is kept to process the failed documents again.
+        """
+        self.close()
+        if self.failed:
+            logger.warning(f"Keeping {self.path}, the next run processes the {len(self.failed)} failed documents again")
+        else:
+            os.remove(self.path)
+
+
+def run_documents(process_doc, docs, max_concurrency=8, journal=None):
+    """
+    Execute process_doc for every document concurrently and return the results in doc order.
+
+    The documents are processed by a bounded pool of worker threads within the current process. All workers
+    share the model from base_setup, so its AdaptiveRateLimiter caps the requests and tokens per minute across
+    all documents.
+
+    Args:
+        process_doc: Callable taking (doc_id, text) and returning the evaluation log row of the document, as ErrorRow
+            if processing the document failed
+        docs: DataFrame containing the "docid" and "text" columns of the documents to process
+        max_concurrency (int, optional): Maximum number of documents processed at the same time. Defaults to 8.
+        journal (RunJournal, optional): Journal to persist every finished row to. Documents already finished in
+            the journal are skipped and their rows are taken from the journal, failed documents are processed again.
+
+    Returns:
+        list: The results of process_doc, in the same order as docs
+    """
+    targets = list(zip(docs["docid"], docs["text"]))
+    results = [None] * len(targets)
+
+    pending = []
+    for i, (doc_id, text) in enumerate(targets):
+        if journal is not None and doc_id in journal.finished:
+            results[i] = journal.finished[doc_id]
+        else:
+            pending.append((i, doc_id, text))
+
+    max_concurrency = max(1, min(max_concurrency, len(pending)))
+    logger.info(f"Processing {len(pending)} of {len(targets)} documents with a concurrency of {max_concurrency}")
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = {
+            executor.submit(process_doc, doc_id, text): (i, doc_id)
+            for i, doc_id, text in pending
+        }
+        with tqdm(total=len(targets), initial=len(targets) - len(pending)) as pbar:
+            for future in as_completed(futures):
+                i, doc_id = futures[future]
+                results[i] = future.result()
+                if isinstance(results[i], ErrorRow):
+                    failed += 1
+                if journal is not None:
+                    journal.append(doc_id, results[i], error=isinstance(results[i], ErrorRow))
+                pbar.update(1)
+
+    if failed:
+        logger.warning(f"Processing {failed} of {len(pending)} documents failed"
+                       + (", they are processed again when the run is resumed" if journal is not None else ""))
+
+    for name, stats in get_request_stats().items():
+        logger.info(f"SPARQL requests to {name}: " + ", ".join(f"{key}={value}" for key, value in stats.items()))
+
+    return results
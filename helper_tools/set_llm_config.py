@@ -2,7 +2,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv, set_key
 
-# Updated AVAILABLE_MODELS to include RPM values
+# Updated AVAILABLE_MODELS to include RPM values, an optional "tpm" sets a tokens per minute limit
 AVAILABLE_MODELS = {
     "OpenAI": [
         {"model": "gpt-4o-search-preview-2025-03-11", "rpm": 0}
@@ -89,16 +89,19 @@ def main():
     model_info = select_model(provider)
     model = model_info['model']
     rpm = model_info['rpm']
+    tpm = model_info.get('tpm', 0)
 
     # Update .env file
     set_key(env_path, "LLM_MODEL_PROVIDER", provider)
     set_key(env_path, "LLM_MODEL_ID", model)
     set_key(env_path, "LLM_RPM", str(rpm))
+    set_key(env_path, "LLM_TPM", str(tpm))
 
     print(f"\nSuccessfully set:")
     print(f"Provider: {provider}")
     print(f"Model: {model}")
     print(f"RPM: {rpm}")
+    print(f"TPM: {tpm}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,5 +1,7 @@
+import heapq
+import json
 import os
-import jsonlines
+import tempfile
 from tqdm import tqdm
 from huggingface_hub import snapshot_download
 import shutil
@@ -10,33 +12,109 @@ import git
 repo = git.Repo(search_parent_directories=True)
 load_dotenv(repo.working_dir + "/.env", override=True)
 
-def sort_jsonl_file(input_file, output_file=None):
+SORT_MEMORY_BUDGET = int(os.getenv("SORT_MEMORY_BUDGET", 256 * 1024 * 1024))
+# Maximum number of runs merged at once, more runs are merged in multiple passes
+MAX_MERGE_FAN_IN = 64
+
+
+def _open(filename, mode, gzipped=None):
+    """Open a file in binary mode, gzipped if its name ends in .gz (or gzipped is True)"""
+    if gzipped or (gzipped is None and str(filename).endswith(".gz")):
+        return gzip.open(filename, mode)
+    return open(filename, mode)
+
+
+def _sort_key(line):
+    entry = json.loads(line)
+    return entry.get('id', entry.get('docid'))
+
+
+def _write_run(run, temp_dir):
+    """Sort a run by its keys and spill it to a temporary file of key<TAB>line records"""
+    run.sort(key=lambda record: record[0])
+    fd, path = tempfile.mkstemp(suffix=".run", dir=temp_dir)
+    with os.fdopen(fd, "wb") as f:
+        for key, line in run:
+            f.write(json.dumps(key).encode("utf-8") + b"\t" + line)
+    return path
+
+
+def _read_run(path):
+    with open(path, "rb") as f:
+        for record in f:
+            key, line = record.split(b"\t", 1)
+            yield json.loads(key), line
+
+
+def _merge_runs(paths, temp_dir):
+    """Merge sorted runs into a single run"""
+    fd, path = tempfile.mkstemp(suffix=".run", dir=temp_dir)
+    with os.fdopen(fd, "wb") as f:
+        for key, line in heapq.merge(*(_read_run(run_path) for run_path in paths), key=lambda record: record[0]):
+            f.write(json.dumps(key).encode("utf-8") + b"\t" + line)
+    for run_path in paths:
+        os.remove(run_path)
+    return path
+
+
+def sort_jsonl_file(input_file, output_file=None, memory_budget=SORT_MEMORY_BUDGET, temp_dir=None):
     """
-    Sort a JSONL file by docid and write it back.
+    Sort a JSONL file by docid (or id) with an external merge sort and write it back.
+
+    The file is read in runs of about memory_budget bytes, which are sorted and spilled to temporary files and then
+    merged with a k-way heap merge, so the memory use does not depend on the size of the file. Entries with equal
+    ids keep their order and are written unchanged. Files ending in .gz are read and written gzipped.
     
     Args:
         input_file (str): Path to the input JSONL file
         output_file (str, optional): Path to the output JSONL file. If None, overwrites input file.
+        memory_budget (int, optional): Bytes of entries held in memory at once. Defaults to SORT_MEMORY_BUDGET.
+        temp_dir (str, optional): Directory for the sorted runs. Defaults to the directory of the output file.
     """
     if output_file is None:
         output_file = input_file
+    output_dir = os.path.dirname(os.path.abspath(output_file))
     
-    # Read all entries
-    print(f"Reading entries from {input_file}...")
-    entries = []
-    with jsonlines.open(input_file) as reader:
-        for entry in tqdm(reader):
-            entries.append(entry)
-    
-    # Sort by docid
-    print("Sorting entries by docid...")
-    entries.sort(key=lambda x: x.get('id', x.get('docid')))
-    
-    # Write back sorted entries
-    print(f"Writing sorted entries to {output_file}...")
-    with jsonlines.open(output_file, mode='w') as writer:
-        for entry in tqdm(entries):
-            writer.write(entry)
+    with tempfile.TemporaryDirectory(dir=temp_dir or output_dir) as run_dir:
+        # Read and spill sorted runs
+        print(f"Reading entries from {input_file}...")
+        runs = []
+        run = []
+        run_size = 0
+        with _open(input_file, "rb") as reader:
+            for line in tqdm(reader, desc="Sorting runs"):
+                if not line.strip():
+                    continue
+                if not line.endswith(b"\n"):
+                    line += b"\n"
+                run.append((_sort_key(line), line))
+                run_size += len(line)
+                if run_size >= memory_budget:
+                    runs.append(_write_run(run, run_dir))
+                    run = []
+                    run_size = 0
+        if run or not runs:
+            runs.append(_write_run(run, run_dir))
+        
+        # Merge the runs, in multiple passes if there are too many to open at once
+        print(f"Merging {len(runs)} sorted runs...")
+        while len(runs) > MAX_MERGE_FAN_IN:
+            runs = [_merge_runs(runs[start:start + MAX_MERGE_FAN_IN], run_dir)
+                    for start in range(0, len(runs), MAX_MERGE_FAN_IN)]
+        
+        # Write to a temporary file that atomically replaces the output file
+        print(f"Writing sorted entries to {output_file}...")
+        fd, temp_output = tempfile.mkstemp(suffix=".tmp", dir=output_dir)
+        os.close(fd)
+        try:
+            with _open(temp_output, "wb", gzipped=str(output_file).endswith(".gz")) as writer:
+                for key, line in tqdm(heapq.merge(*(_read_run(run_path) for run_path in runs), key=lambda record: record[0])):
+                    writer.write(line)
+            shutil.copymode(input_file, temp_output)
+            os.replace(temp_output, output_file)
+        except BaseException:
+            os.remove(temp_output)
+            raise
     
     print("Sorting complete!")
 
@@ -0,0 +1,280 @@
+import logging
+import os
+import random
+import threading
+import time
+import urllib.error
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from SPARQLWrapper.SPARQLExceptions import EndPointNotFound, QueryBadFormed, Unauthorized, URITooLong
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Errors caused by the request itself, which are not retried and do not count against the endpoint
+NON_RETRYABLE_ERRORS = (QueryBadFormed, Unauthorized, EndPointNotFound, URITooLong)
+THROTTLING_STATUS_CODES = (429, 503)
+
+
+class SPARQLRequestError(Exception):
+    """Raised when a SPARQL request fails permanently or all retries are used up"""
+
+
+class CircuitOpenError(SPARQLRequestError):
+    """Raised without sending a request while the circuit breaker of the endpoint is open"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the request rate of all threads of the process
+    """
+    def __init__(self, rate, capacity):
+        """
+        Initialize the token bucket
+
+        Args:
+            rate (float): Tokens added per second, i.e. the sustained requests per second
+            capacity (float): Maximum number of tokens, i.e. the allowed burst
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available and take it
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Stop handing out tokens to all threads for the given time, e.g. when the endpoint sent Retry-After
+
+        Args:
+            seconds (float): Duration of the pause
+        """
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker that fails fast after consecutive endpoint failures and lets a single probe request through
+    once the reset timeout has passed
+    """
+    def __init__(self, failure_threshold, reset_timeout):
+        """
+        Initialize the circuit breaker
+
+        Args:
+            failure_threshold (int): Consecutive failures after which the circuit opens
+            reset_timeout (float): Seconds the circuit stays open before a probe request is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Check whether a request may be sent
+
+        Returns:
+            bool: False while the circuit is open
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self.probing and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        """
+        Record a failed request
+
+        Returns:
+            bool: True if this failure opened the circuit
+        """
+        with self._lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.probing = False
+                return True
+            return False
+
+
+def _retry_after(error):
+    """Get the delay requested by the Retry-After header of an HTTP error in seconds, if any"""
+    headers = getattr(error, "headers", None)
+    value = headers.get("Retry-After") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class SPARQLRequestLayer:
+    """
+    Sends requests to a SPARQL endpoint with a shared rate limit, exponential backoff honoring Retry-After and a
+    circuit breaker, and counts retries and failures
+    """
+    def __init__(self, name, requests_per_second=5.0, burst=5, max_retries=5, backoff_base=1.0, backoff_max=60.0,
+                 failure_threshold=5, reset_timeout=30.0):
+        """
+        Initialize the request layer
+
+        Args:
+            name (str): Name of the endpoint in the request stats
+            requests_per_second (float, optional): Sustained request rate of the process. Defaults to 5.
+            burst (int, optional): Number of requests that may be sent at once. Defaults to 5.
+            max_retries (int, optional): Retries per request after the first attempt. Defaults to 5.
+            backoff_base (float, optional): Delay before the first retry in seconds. Defaults to 1.
+            backoff_max (float, optional): Upper bound of the delay between retries in seconds. Defaults to 60.
+            failure_threshold (int, optional): Consecutive endpoint failures that open the circuit. Defaults to 5.
+            reset_timeout (float, optional): Seconds until an open circuit lets a probe through. Defaults to 30.
+        """
+        self.name = name
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.counters = {
+            "requests": 0, "retries": 0, "throttled": 0, "failures": 0, "rejected": 0, "circuit_opened": 0
+        }
+        self._lock = threading.Lock()
+        _request_layers[name] = self
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def stats(self):
+        """
+        Get the request counters
+
+        Returns:
+            dict: Number of requests, retries, throttled responses, failed requests, requests rejected by the open
+                circuit and times the circuit opened
+        """
+        with self._lock:
+            return dict(self.counters)
+
+    def execute(self, send):
+        """
+        Execute a request
+
+        Args:
+            send: Callable sending the request once and returning its result, raising on errors
+
+        Returns:
+            The result of send
+
+        Raises:
+            CircuitOpenError: If the endpoint is considered down
+            SPARQLRequestError: If the request fails permanently or all retries are used up
+        """
+        self._count("requests")
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise CircuitOpenError(f"Circuit breaker of {self.name} is open")
+            self.bucket.acquire()
+            try:
+                result = send()
+            except NON_RETRYABLE_ERRORS as e:
+                self.breaker.record_success()
+                self._count("failures")
+                raise SPARQLRequestError(f"{self.name} request failed: {e}") from e
+            except Exception as e:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+                if isinstance(e, urllib.error.HTTPError) and e.code in THROTTLING_STATUS_CODES:
+                    # Throttling means the endpoint is up, so all threads back off instead of tripping the breaker
+                    self._count("throttled")
+                    self.breaker.record_success()
+                    retry_after = _retry_after(e)
+                    if retry_after is not None:
+                        delay = min(self.backoff_max, retry_after)
+                    self.bucket.pause(delay)
+                else:
+                    if self.breaker.record_failure():
+                        self._count("circuit_opened")
+                        logger.warning(f"{self.name} seems to be down, opening the circuit breaker: {e}")
+                if attempt == self.max_retries:
+                    self._count("failures")
+                    raise SPARQLRequestError(
+                        f"{self.name} request failed after {self.max_retries + 1} attempts: {e}"
+                    ) from e
+                self._count("retries")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+
+_request_layers = {}
+
+
+def get_request_stats():
+    """
+    Get the request counters of all SPARQL endpoints of the process
+
+    Returns:
+        dict: Mapping of endpoint name to its counters
+    """
+    return {name: layer.stats() for name, layer in _request_layers.items()}
+
+
+def request_layer_from_env(name, prefix):
+    """
+    Create a request layer configured by environment variables, e.g. WIKIDATA_REQUESTS_PER_SECOND
+
+    Args:
+        name (str): Name of the endpoint in the request stats
+        prefix (str): Prefix of the environment variables
+
+    Returns:
+        SPARQLRequestLayer: The configured request layer
+    """
+    return SPARQLRequestLayer(
+        name,
+        requests_per_second=float(os.getenv(f"{prefix}_REQUESTS_PER_SECOND", 5)),
+        burst=int(os.getenv(f"{prefix}_BURST", 5)),
+        max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", 5)),
+        backoff_base=float(os.getenv(f"{prefix}_BACKOFF_BASE", 1.0)),
+        backoff_max=float(os.getenv(f"{prefix}_BACKOFF_MAX", 60.0)),
+        failure_threshold=int(os.getenv(f"{prefix}_FAILURE_THRESHOLD", 5)),
+        reset_timeout=float(os.getenv(f"{prefix}_RESET_TIMEOUT", 30.0)),
+    )
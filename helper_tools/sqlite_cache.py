@@ -0,0 +1,63 @@
+import logging
+import os
+import sqlite3
+from functools import lru_cache
+from pathlib import Path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# File systems on which the shared memory of SQLite's WAL mode does not work across nodes
+NETWORK_FILESYSTEMS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "lustre", "gpfs", "beegfs", "glusterfs", "fuse.glusterfs", "ceph",
+    "fuse.sshfs", "9p", "afs",
+}
+
+
+@lru_cache(maxsize=None)
+def is_network_filesystem(path):
+    """
+    Check whether a path lies on a network file system, according to the longest matching mount of /proc/mounts
+
+    Args:
+        path (str): The path to check, which does not need to exist yet
+
+    Returns:
+        bool: True for network file systems, False for local ones and if the mounts can not be read
+    """
+    path = os.path.realpath(path)
+    try:
+        with open("/proc/mounts") as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return False
+    _, fs_type = max(
+        ((mount_point.replace("\\040", " "), fs_type) for mount_point, fs_type in mounts
+         if path == mount_point or path.startswith(mount_point.rstrip("/") + "/")),
+        key=lambda mount: len(mount[0]),
+        default=("/", "")
+    )
+    return fs_type in NETWORK_FILESYSTEMS
+
+
+def connect(path):
+    """
+    Open a connection to a SQLite cache file, in WAL mode on local file systems and with the rollback journal on
+    network file systems, where WAL is not supported
+
+    Args:
+        path (str): Path to the SQLite file
+
+    Returns:
+        sqlite3.Connection: The connection
+    """
+    connection = sqlite3.connect(path, timeout=30)
+    if is_network_filesystem(str(Path(path).parent)):
+        connection.execute("PRAGMA journal_mode = DELETE")
+    else:
+        journal_mode = connection.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        if journal_mode.lower() != "wal":
+            logger.warning(f"Could not enable WAL for {path}, using journal mode {journal_mode}")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    return connection
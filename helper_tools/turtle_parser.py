@@ -0,0 +1,194 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from rdflib import Graph
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+XSD_STRING = "http://www.w3.org/2001/XMLSchema#string"
+
+_WHITESPACE = re.compile(r'(?:\s+|#[^\r\n]*)*')
+_IRI = re.compile(r'<([^<>"{}|^`\\\x00-\x20]*)>')
+_PNAME_NS = re.compile(r'([A-Za-z][\w\-]*(?:\.[\w\-]+)*)?:')
+_PNAME_LOCAL = re.compile(r'(?:[\w:\-]|%[0-9A-Fa-f]{2}|\.(?=[\w:%\-]))*')
+_STRING = re.compile(r'"((?:[^"\\\r\n]|\\.)*)"|\'((?:[^\'\\\r\n]|\\.)*)\'')
+_LANGTAG = re.compile(r'@[a-zA-Z]+(?:-[a-zA-Z0-9]+)*')
+# @prefix is case-sensitive like in rdflib, only the SPARQL-style PREFIX keyword is case-insensitive
+_PREFIX_DIRECTIVE = re.compile(r'@prefix\b|(?i:PREFIX)\b')
+_A_KEYWORD = re.compile(r'a(?=[\s<])')
+_ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+
+@dataclass
+class TurtleParseError:
+    """
+    Represents a Turtle syntax error
+    """
+    message: str
+    line: Optional[int] = None
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class _Unsupported(Exception):
+    """
+    Raised by the fast parser for syntax it does not handle, which is then passed on to rdflib
+    """
+
+
+class _FastTurtleParser:
+    """
+    Recursive descent parser for the Turtle subset emitted by the agents: prefix declarations, IRIs, prefixed
+    names, predicate/object lists and plain or language-tagged string literals
+    """
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self.prefixes = {}
+        self.triples = {}
+
+    def skip(self):
+        self.pos = _WHITESPACE.match(self.text, self.pos).end()
+
+    def expect(self, char: str):
+        self.skip()
+        if not self.text.startswith(char, self.pos):
+            raise _Unsupported()
+        self.pos += len(char)
+
+    def parse(self) -> List[Tuple[str, str, str]]:
+        self.skip()
+        while self.pos < len(self.text):
+            directive = _PREFIX_DIRECTIVE.match(self.text, self.pos)
+            if directive:
+                self.pos = directive.end()
+                self.prefix(sparql_style=not directive.group(0).startswith("@"))
+            else:
+                self.statement()
+            self.skip()
+        # Keys of the dict keep the first-seen order while dropping duplicate triples like an rdflib Graph
+        return list(self.triples)
+
+    def prefix(self, sparql_style: bool):
+        self.skip()
+        match = _PNAME_NS.match(self.text, self.pos)
+        if not match:
+            raise _Unsupported()
+        self.pos = match.end()
+        self.skip()
+        namespace = self.iri()
+        self.prefixes[match.group(1) or ""] = namespace
+        if not sparql_style:
+            self.expect(".")
+
+    def statement(self):
+        subject = self.resource()
+        while True:
+            predicate = self.verb()
+            while True:
+                self.triples[(subject, predicate, self.object())] = None
+                self.skip()
+                if not self.text.startswith(",", self.pos):
+                    break
+                self.pos += 1
+            self.skip()
+            if not self.text.startswith(";", self.pos):
+                break
+            # Multiple and trailing semicolons are allowed before the end of the statement
+            while self.text.startswith(";", self.pos):
+                self.pos += 1
+                self.skip()
+            if self.text.startswith(".", self.pos):
+                break
+        self.expect(".")
+
+    def iri(self) -> str:
+        match = _IRI.match(self.text, self.pos)
+        if not match or ":" not in match.group(1):
+            # Relative IRIs would have to be resolved against a base
+            raise _Unsupported()
+        self.pos = match.end()
+        return match.group(1)
+
+    def resource(self) -> str:
+        self.skip()
+        if self.text.startswith("<", self.pos):
+            return self.iri()
+        match = _PNAME_NS.match(self.text, self.pos)
+        if not match or (match.group(1) or "") not in self.prefixes:
+            raise _Unsupported()
+        local = _PNAME_LOCAL.match(self.text, match.end())
+        self.pos = local.end()
+        return self.prefixes[match.group(1) or ""] + local.group(0)
+
+    def verb(self) -> str:
+        self.skip()
+        match = _A_KEYWORD.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            return RDF_TYPE
+        return self.resource()
+
+    def object(self) -> str:
+        self.skip()
+        if self.text.startswith('"""', self.pos) or self.text.startswith("'''", self.pos):
+            raise _Unsupported()
+        match = _STRING.match(self.text, self.pos)
+        if not match:
+            return self.resource()
+        self.pos = match.end()
+        value = self.unescape(match.group(1) if match.group(1) is not None else match.group(2))
+        langtag = _LANGTAG.match(self.text, self.pos)
+        if langtag:
+            self.pos = langtag.end()
+        elif self.text.startswith("^^", self.pos):
+            self.pos += 2
+            # rdflib normalizes the lexical form of typed literals, e.g. "01"^^xsd:integer to "1"
+            if self.resource() != XSD_STRING:
+                raise _Unsupported()
+        return value
+
+    @staticmethod
+    def unescape(value: str) -> str:
+        if "\\" not in value:
+            return value
+        result = []
+        chars = iter(value)
+        for char in chars:
+            if char == "\\":
+                char = next(chars)
+                if char not in _ESCAPES:
+                    raise _Unsupported()
+                char = _ESCAPES[char]
+            result.append(char)
+        return "".join(result)
+
+
+def _parse_with_rdflib(turtle_string: str) -> Tuple[List[Tuple[str, str, str]], Optional[TurtleParseError]]:
+    try:
+        graph = Graph()
+        graph.parse(data=turtle_string, format="turtle")
+        return [(str(s), str(p), str(o)) for s, p, o in graph], None
+    except Exception as e:
+        line = getattr(e, "lines", None)
+        return [], TurtleParseError(str(e), line + 1 if isinstance(line, int) else None)
+
+
+def parse_turtle_triples(turtle_string: str) -> Tuple[List[Tuple[str, str, str]], Optional[TurtleParseError]]:
+    """
+    Parse a Turtle string into plain (subject, predicate, object) string tuples.
+
+    The Turtle subset emitted by the agents is parsed by a lightweight parser. Other syntax and syntax errors are
+    passed on to rdflib, so results and error messages are the same as parsing into an rdflib Graph.
+
+    Args:
+        turtle_string (str): The Turtle string to parse
+
+    Returns:
+        tuple: The list of unique triples, and a TurtleParseError if the string could not be parsed (None otherwise)
+    """
+    try:
+        return _FastTurtleParser(turtle_string).parse(), None
+    except (_Unsupported, StopIteration):
+        return _parse_with_rdflib(turtle_string)
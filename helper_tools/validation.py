@@ -1,8 +1,20 @@
+import os
 import re
 
-from rdflib import Graph, URIRef
-from helper_tools.wikidata_loader import get_types, send_query
+from helper_tools.turtle_parser import parse_turtle_triples
+from helper_tools.wikidata_loader import WIKIDATA_BACKEND, LABEL_BATCH_SIZE, VALID_IRI_PATTERN, get_types, get_types_batch, send_query
+from helper_tools.wikidata_snapshot import get_wikidata_snapshot
 from helper_tools.base_setup import wikidata_class_hierarchy
+from helper_tools.class_hierarchy import CLASSES_PATH, get_class_hierarchy, is_available as class_hierarchy_available
+
+SUBCLASS_BATCH_SIZE = 500
+
+# "memory" answers subClassOf* checks from the index of classes.nt, "fuseki" asks the wikidata_class_hierarchy
+# dataset. Defaults to "memory" if classes.nt or its index is available.
+CLASS_HIERARCHY_BACKEND = os.getenv(
+    "CLASS_HIERARCHY_BACKEND",
+    "memory" if class_hierarchy_available(os.getenv("CLASSES_PATH", CLASSES_PATH)) else "fuseki"
+)
 
 
 def validate_turtle_response(response):
@@ -11,13 +23,10 @@ def validate_turtle_response(response):
         turtle_string = turtle_string_match.group(1)
     else:
         turtle_string = response
-    try:
-        # Load the Turtle file into an RDF graph
-        result_graph = Graph()
-        result_graph.parse(data=turtle_string, format="turtle")
-        return True, ""
-    except Exception as e:
-        return False, str(e)
+    triples, error = parse_turtle_triples(turtle_string)
+    if error:
+        return False, str(error)
+    return True, ""
 
 
 def check_type_constraint(entity_uri, constraint_uri):
@@ -33,6 +42,13 @@ def check_type_constraint(entity_uri, constraint_uri):
     """
     # Get all types of the entity
     entity_types = get_types(entity_uri, output_uri=True)
+
+    if WIKIDATA_BACKEND == "snapshot":
+        snapshot = get_wikidata_snapshot()
+        return any(snapshot.is_subclass(type_uri, constraint_uri) for type_uri in entity_types)
+    if CLASS_HIERARCHY_BACKEND == "memory":
+        class_hierarchy = get_class_hierarchy()
+        return any(class_hierarchy.is_subclass(type_uri, constraint_uri) for type_uri in entity_types)
     
     # For each type of the entity, check if it matches the constraint
     for type_uri in entity_types:
@@ -49,6 +65,181 @@ def check_type_constraint(entity_uri, constraint_uri):
     return False
 
 
+def get_type_constraints(property_uri, constraint_type):
+    """
+    Get the subject or value type constraints of a property.
+    
+    Args:
+        property_uri: URI of the property
+        constraint_type: "subject" for subject type constraints, "value" for value type constraints
+        
+    Returns:
+        list: (constraint_uri, constraint_label) tuples, where the label falls back to the URI
+    """
+    if WIKIDATA_BACKEND == "snapshot":
+        return get_wikidata_snapshot().get_type_constraints(property_uri, constraint_type)
+
+    constraint_item = "wd:Q21503250" if constraint_type == "subject" else "wd:Q21510865"
+    query = f"""
+    SELECT DISTINCT ?typeConstraint ?typeLabel
+    WHERE {{
+      <{property_uri}> p:P2302 ?cs .
+      ?cs ps:P2302 {constraint_item} .  # {constraint_type} type constraint
+      ?cs pq:P2308 ?typeConstraint .
+      OPTIONAL {{ ?typeConstraint rdfs:label ?typeLabel . FILTER(LANG(?typeLabel) = "en") }}
+    }}
+    """
+    results = send_query(query)
+    try:
+        return [
+            (binding["typeConstraint"]["value"],
+             binding.get("typeLabel", {}).get("value", binding["typeConstraint"]["value"]))
+            for binding in results["results"]["bindings"]
+            if "typeConstraint" in binding
+        ]
+    except Exception:
+        return []
+
+
+def get_type_constraints_batch(property_uris, return_failed=False):
+    """
+    Get the subject and value type constraints of multiple properties with one query per chunk of properties.
+    
+    Args:
+        property_uris: URIs of the properties
+        return_failed (bool, optional): Whether to also return the properties whose query failed. Defaults to False.
+        
+    Returns:
+        dict: Mapping of (property_uri, constraint_type) to the list of (constraint_uri, constraint_label) tuples,
+              for constraint_type "subject" and "value" of every property. Properties of failed queries have
+              empty lists, like properties without constraints.
+        set: Only with return_failed, the URIs of the properties whose query failed
+    """
+    property_uris = list(dict.fromkeys(property_uris))
+    constraints = {
+        (property_uri, constraint_type): []
+        for property_uri in property_uris for constraint_type in ("subject", "value")
+    }
+    failed = set()
+    if WIKIDATA_BACKEND == "snapshot":
+        for property_uri, constraint_type in constraints:
+            constraints[(property_uri, constraint_type)] = get_type_constraints(property_uri, constraint_type)
+        return (constraints, failed) if return_failed else constraints
+
+    valid_uris = [uri for uri in property_uris if VALID_IRI_PATTERN.match(uri)]
+    for start in range(0, len(valid_uris), LABEL_BATCH_SIZE):
+        chunk = valid_uris[start:start + LABEL_BATCH_SIZE]
+        values = " ".join(f"<{uri}>" for uri in chunk)
+        query = f"""
+        SELECT DISTINCT ?property ?constraintType ?typeConstraint ?typeLabel
+        WHERE {{
+          VALUES ?property {{ {values} }}
+          VALUES ?constraintType {{ wd:Q21503250 wd:Q21510865 }}  # subject and value type constraint
+          ?property p:P2302 ?cs .
+          ?cs ps:P2302 ?constraintType .
+          ?cs pq:P2308 ?typeConstraint .
+          OPTIONAL {{ ?typeConstraint rdfs:label ?typeLabel . FILTER(LANG(?typeLabel) = "en") }}
+        }}
+        """
+        results = send_query(query)
+        if not results:
+            failed.update(chunk)
+            continue
+        for binding in results["results"]["bindings"]:
+            constraint_type = "subject" if binding["constraintType"]["value"].endswith("/Q21503250") else "value"
+            constraint_uri = binding["typeConstraint"]["value"]
+            constraints[(binding["property"]["value"], constraint_type)].append(
+                (constraint_uri, binding.get("typeLabel", {}).get("value", constraint_uri))
+            )
+    return (constraints, failed) if return_failed else constraints
+
+
+def get_subclass_pairs(pairs):
+    """
+    Resolve rdfs:subClassOf* reachability for multiple (class, superclass) pairs with one query per chunk.
+    
+    Args:
+        pairs: Iterable of (class_uri, superclass_uri) tuples
+        
+    Returns:
+        set: The pairs for which class_uri is a (reflexive, transitive) subclass of superclass_uri
+    """
+    pairs = sorted({(class_uri, superclass_uri) for class_uri, superclass_uri in pairs
+                    if VALID_IRI_PATTERN.match(class_uri) and VALID_IRI_PATTERN.match(superclass_uri)})
+    if WIKIDATA_BACKEND == "snapshot":
+        snapshot = get_wikidata_snapshot()
+        return {pair for pair in pairs if snapshot.is_subclass(*pair)}
+    if CLASS_HIERARCHY_BACKEND == "memory":
+        class_hierarchy = get_class_hierarchy()
+        return {pair for pair in pairs if class_hierarchy.is_subclass(*pair)}
+
+    reachable = set()
+    for start in range(0, len(pairs), SUBCLASS_BATCH_SIZE):
+        values = " ".join(
+            f"(<{class_uri}> <{superclass_uri}>)" for class_uri, superclass_uri in pairs[start:start + SUBCLASS_BATCH_SIZE]
+        )
+        query = f"""
+        SELECT ?class ?superclass WHERE {{
+            VALUES (?class ?superclass) {{ {values} }}
+            ?class <http://www.w3.org/2000/01/rdf-schema#subClassOf>* ?superclass .
+        }}
+        """
+        try:
+            results = wikidata_class_hierarchy.query(query)
+        except Exception:
+            # Like a failing ASK in validate_triple, unresolved pairs count as not matched
+            continue
+        reachable.update((result.bindings["class"].value, result.bindings["superclass"].value) for result in results)
+    return reachable
+
+
+def get_type_matches(entity_class_pairs):
+    """
+    Batched version of check_type_constraint, resolving the types of all entities and the class hierarchy checks
+    of all pairs with one query each (per chunk).
+
+    Args:
+        entity_class_pairs: Iterable of (entity_uri, class_uri) tuples
+
+    Returns:
+        set: The pairs for which a type of the entity is a (reflexive, transitive) subclass of the class
+    """
+    entity_class_pairs = set(entity_class_pairs)
+    types = get_types_batch([entity_uri for entity_uri, _ in entity_class_pairs])
+    reachable = get_subclass_pairs(
+        (type_uri, class_uri) for entity_uri, class_uri in entity_class_pairs for type_uri in types[entity_uri]
+    )
+    return {
+        (entity_uri, class_uri) for entity_uri, class_uri in entity_class_pairs
+        if any((type_uri, class_uri) in reachable for type_uri in types[entity_uri])
+    }
+
+
+def match_type_constraints(entity_uri, constraints, check=check_type_constraint):
+    """
+    Check an entity against type constraints, where at least one constraint has to be matched.
+    
+    Args:
+        entity_uri: URI of the entity to check
+        constraints: (constraint_uri, constraint_label) tuples as returned by get_type_constraints
+        check: Function deciding whether the entity matches a constraint URI. Defaults to check_type_constraint.
+        
+    Returns:
+        tuple containing:
+        - bool: Whether the constraints are matched (True if there are no constraints)
+        - list: Labels of the constraints that weren't matched (empty if matched)
+    """
+    unmatched_constraints = []
+    try:
+        for constraint_uri, constraint_label in constraints:
+            if check(entity_uri, constraint_uri):
+                return True, []  # Stop at first match
+            unmatched_constraints.append(constraint_label)
+    except Exception:
+        return False, unmatched_constraints
+    return not constraints, unmatched_constraints
+
+
 def validate_triple(subject_uri, property_uri, object_uri):
     """
     Validate a triple by checking if its subject and object types match the property's type constraints.
@@ -66,71 +257,51 @@ def validate_triple(subject_uri, property_uri, object_uri):
         - bool: Whether object type constraints are matched
         - list: List of object type constraints that weren't matched (empty if matched)
     """
-    # Get subject type constraints
-    subject_constraints_query = f"""
-    SELECT DISTINCT ?subjectTypeConstraint ?subjectTypeLabel
-    WHERE {{
-      <{property_uri}> p:P2302 ?csST .
-      ?csST ps:P2302 wd:Q21503250 .  # subject type constraint
-      ?csST pq:P2308 ?subjectTypeConstraint .
-      OPTIONAL {{ ?subjectTypeConstraint rdfs:label ?subjectTypeLabel . FILTER(LANG(?subjectTypeLabel) = "en") }}
-    }}
+    subject_restriction_matched, unmatched_subject_constraints = match_type_constraints(
+        subject_uri, get_type_constraints(property_uri, "subject")
+    )
+    object_restriction_matched, unmatched_object_constraints = match_type_constraints(
+        object_uri, get_type_constraints(property_uri, "value")
+    )
+    return subject_restriction_matched, unmatched_subject_constraints, object_restriction_matched, unmatched_object_constraints
+
+
+def validate_triples(triples):
     """
+    Batched version of validate_triple, resolving the constraints of all predicates, the types of all entities and
+    the class hierarchy checks of all triples with one query each (per chunk).
     
-    # Get object type constraints
-    object_constraints_query = f"""
-    SELECT DISTINCT ?objectTypeConstraint ?objectTypeLabel
-    WHERE {{
-      <{property_uri}> p:P2302 ?csVT .
-      ?csVT ps:P2302 wd:Q21510865 .  # value type constraint
-      ?csVT pq:P2308 ?objectTypeConstraint .
-      OPTIONAL {{ ?objectTypeConstraint rdfs:label ?objectTypeLabel . FILTER(LANG(?objectTypeLabel) = "en") }}
-    }}
+    Args:
+        triples: Iterable of (subject_uri, property_uri, object_uri) tuples
+        
+    Returns:
+        list: The validate_triple result tuple of every triple, in the same order
     """
-    
-    # Execute queries
-    subject_results = send_query(subject_constraints_query)
-    object_results = send_query(object_constraints_query)
-    
-    # Check subject type constraints
-    subject_restriction_matched = True  # Default to True if no constraints
-    unmatched_subject_constraints = []
-    try:
-        if subject_results["results"]["bindings"]:
-            subject_restriction_matched = False  # Set to False if there are constraints
-            for binding in subject_results["results"]["bindings"]:
-                if "subjectTypeConstraint" in binding:
-                    constraint_uri = binding["subjectTypeConstraint"]["value"]
-                    constraint_label = binding.get("subjectTypeLabel", {}).get("value", constraint_uri)
-                    if check_type_constraint(subject_uri, constraint_uri):
-                        subject_restriction_matched = True
-                        unmatched_subject_constraints = []
-                        break  # Stop at first match
-                    else:
-                        unmatched_subject_constraints.append(constraint_label)
-    except Exception:
-        pass
-    
-    # Check object type constraints
-    object_restriction_matched = True  # Default to True if no constraints
-    unmatched_object_constraints = []
-    try:
-        if object_results["results"]["bindings"]:
-            object_restriction_matched = False  # Set to False if there are constraints
-            for binding in object_results["results"]["bindings"]:
-                if "objectTypeConstraint" in binding:
-                    constraint_uri = binding["objectTypeConstraint"]["value"]
-                    constraint_label = binding.get("objectTypeLabel", {}).get("value", constraint_uri)
-                    if check_type_constraint(object_uri, constraint_uri):
-                        object_restriction_matched = True
-                        unmatched_object_constraints = []
-                        break  # Stop at first match
-                    else:
-                        unmatched_object_constraints.append(constraint_label)
-    except Exception:
-        pass
-            
-    return subject_restriction_matched, unmatched_subject_constraints, object_restriction_matched, unmatched_object_constraints
+    triples = [(str(subject_uri), str(property_uri), str(object_uri)) for subject_uri, property_uri, object_uri in triples]
+    constraints = get_type_constraints_batch([property_uri for _, property_uri, _ in triples])
+
+    # Only entities that have to satisfy a constraint need their types
+    matches = get_type_matches(
+        (entity_uri, constraint_uri)
+        for subject_uri, property_uri, object_uri in triples
+        for entity_uri, constraint_type in ((subject_uri, "subject"), (object_uri, "value"))
+        for constraint_uri, _ in constraints[(property_uri, constraint_type)]
+    )
+
+    def check(entity_uri, constraint_uri):
+        return (entity_uri, constraint_uri) in matches
+
+    results = []
+    for subject_uri, property_uri, object_uri in triples:
+        subject_restriction_matched, unmatched_subject_constraints = match_type_constraints(
+            subject_uri, constraints[(property_uri, "subject")], check
+        )
+        object_restriction_matched, unmatched_object_constraints = match_type_constraints(
+            object_uri, constraints[(property_uri, "value")], check
+        )
+        results.append((subject_restriction_matched, unmatched_subject_constraints,
+                        object_restriction_matched, unmatched_object_constraints))
+    return results
 
 
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_qdrant import QdrantVectorStore
+from qdrant_client import models
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class SearchRequest(NamedTuple):
+    """
+    A single similarity search of a batch
+
+    Attributes:
+        query (str): Text to search for
+        vector_store: Vector store to search in, e.g. label_vector_store of base_setup
+        k (int): Number of results. Defaults to 3.
+        filter: Optional filter of the vector store, e.g. a qdrant models.Filter
+    """
+    query: str
+    vector_store: Any
+    k: int = 3
+    filter: Optional[Any] = None
+
+
+def type_filter(mode):
+    """
+    Create the metadata.type filter of the search modes Q and P
+
+    Args:
+        mode (str): "Q" for entities, "P" for predicates
+
+    Returns:
+        models.Filter: The filter, None for any other mode
+    """
+    if mode not in ("Q", "P"):
+        return None
+    return models.Filter(
+        must=[
+            models.FieldCondition(
+                key="metadata.type",
+                match=models.MatchValue(value="entity" if mode == "Q" else "predicate")
+            )
+        ]
+    )
+
+
+def _embed(requests):
+    """Embed the distinct queries of all requests with one call per embedding model"""
+    vectors = {}
+    by_embeddings = {}
+    for request in requests:
+        embeddings = request.vector_store.embeddings
+        queries = by_embeddings.setdefault(id(embeddings), (embeddings, {}))[1]
+        queries.setdefault(request.query, None)
+    for key, (embeddings, queries) in by_embeddings.items():
+        texts = list(queries)
+        for text, vector in zip(texts, embeddings.embed_documents(texts)):
+            vectors[(key, text)] = vector
+    return [vectors[(id(request.vector_store.embeddings), request.query)] for request in requests]
+
+
+def _document_from_point(point, vector_store):
+    payload = point.payload or {}
+    metadata = dict(payload.get(vector_store.metadata_payload_key) or {})
+    metadata["_id"] = point.id
+    metadata["_collection_name"] = vector_store.collection_name
+    return Document(page_content=payload.get(vector_store.content_payload_key, ""), metadata=metadata)
+
+
+def batch_similarity_search_with_score(requests: List[SearchRequest]) -> List[List[Tuple[Document, float]]]:
+    """
+    Run multiple similarity searches, embedding all queries in one batch and sending one query_batch_points request
+    per Qdrant collection instead of one embedding and search round trip per query
+
+    Args:
+        requests (list): SearchRequest objects
+
+    Returns:
+        list: The (Document, score) results of every request, in the same order, as returned by
+            similarity_search_with_score
+    """
+    requests = list(requests)
+    if not requests:
+        return []
+    vectors = _embed(requests)
+    logger.debug(f"Searching {len(requests)} queries in batch")
+
+    results = [None] * len(requests)
+    collections = {}
+    for i, request in enumerate(requests):
+        store = request.vector_store
+        if isinstance(store, QdrantVectorStore):
+            collections.setdefault((id(store.client), store.collection_name), []).append(i)
+        else:
+            # Other vector stores, e.g. the FAISS fallback of base_setup, are searched one by one
+            results[i] = store.similarity_search_with_score_by_vector(vectors[i], k=request.k, filter=request.filter)
+
+    for indices in collections.values():
+        store = requests[indices[0]].vector_store
+        responses = store.client.query_batch_points(
+            collection_name=store.collection_name,
+            requests=[
+                models.QueryRequest(
+                    query=vectors[i],
+                    using=store.vector_name,
+                    filter=requests[i].filter,
+                    limit=requests[i].k,
+                    with_payload=True,
+                )
+                for i in indices
+            ],
+        )
+        for i, response in zip(indices, responses):
+            results[i] = [(_document_from_point(point, store), point.score) for point in response.points]
+    return results
+
+
+async def abatch_similarity_search_with_score(requests: List[SearchRequest]) -> List[List[Tuple[Document, float]]]:
+    """
+    Run multiple similarity searches without blocking the event loop, see batch_similarity_search_with_score
+    """
+    return await asyncio.to_thread(batch_similarity_search_with_score, requests)
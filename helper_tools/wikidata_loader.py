@@ -1,11 +1,35 @@
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from distutils.core import run_setup
 
 from SPARQLWrapper import SPARQLWrapper, JSON
 from helper_tools.base_setup import sparql
-from helper_tools.redis_handler import get_element_info, element_info_upload
+from helper_tools.sparql_client import SPARQLRequestError, request_layer_from_env
+from helper_tools.redis_handler import get_element_info, element_info_upload, get_element_infos, element_infos_upload
+from helper_tools.wikidata_snapshot import fetch_property_examples, get_wikidata_snapshot
+
+# "sparql" queries query.wikidata.org (cached in Redis), "snapshot" reads the offline snapshot built by
+# helper_tools/wikidata_snapshot.py without any network access
+WIKIDATA_BACKEND = os.getenv("WIKIDATA_BACKEND", "sparql")
+
+logger = logging.getLogger(__name__)
+
+# Shared by all threads, configured by WIKIDATA_REQUESTS_PER_SECOND, WIKIDATA_MAX_RETRIES etc.
+wikidata_requests = request_layer_from_env("wikidata", "WIKIDATA")
+
+_thread_local = threading.local()
+
+def _get_sparql():
+    """Get a SPARQLWrapper for the current thread, as setQuery mutates the shared wrapper state"""
+    if not hasattr(_thread_local, "sparql"):
+        _thread_local.sparql = SPARQLWrapper(sparql.endpoint, agent=sparql.agent)
+    return _thread_local.sparql
 
 def send_query(query):
-    """Helper function to send a SPARQL query and handle retries
+    """Helper function to send a SPARQL query through the rate limited, retrying request layer
     
     Args:
         query (str): The SPARQL query to execute
@@ -13,19 +37,19 @@ def send_query(query):
     Returns:
         dict: The query results or empty string if failed
     """
+    sparql = _get_sparql()
     sparql.setQuery(query)
     sparql.setReturnFormat(JSON)
-    results = ""
-    retry = 0
-    max_retries = 10
-    while results == "" and retry < max_retries:
-        try:
-            results = sparql.query().convert()
-        except Exception as e:
-            retry += 1
-    return results
+    try:
+        return wikidata_requests.execute(lambda: sparql.query().convert())
+    except SPARQLRequestError as e:
+        logger.warning(str(e))
+        return ""
 
 def get_description(uri):
+    if WIKIDATA_BACKEND == "snapshot":
+        return get_wikidata_snapshot().get_element_info(uri).get("description", "No Description Found")
+
     # Check if the description exists in Redis
     redis_info = get_element_info(uri)
     if redis_info and "description" in redis_info:
@@ -59,6 +83,9 @@ def get_description(uri):
     return description
 
 def get_label(uri):
+    if WIKIDATA_BACKEND == "snapshot":
+        return get_wikidata_snapshot().get_element_info(uri).get("label", "No Label Found")
+
     # Check if the label exists in Redis
     redis_info = get_element_info(uri)
     if redis_info and "label" in redis_info:
@@ -79,6 +106,227 @@ def get_label(uri):
     
     return label
 
+LABEL_BATCH_SIZE = 100
+# Number of chunks of get_uri_labels that are queried concurrently
+LABEL_FETCH_WORKERS = int(os.getenv("LABEL_FETCH_WORKERS", 4))
+
+VALID_IRI_PATTERN = re.compile(r'^[A-Za-z][A-Za-z0-9+.\-]*:[^<>"{}|^`\\\s]*$')
+
+def fetch_element_infos_from_sparql(uris):
+    """Helper function to fetch the labels and descriptions of multiple URIs with one VALUES query per chunk
+
+    Args:
+        uris (list): The URIs to resolve, which have to be valid IRIs
+
+    Returns:
+        dict: Mapping of URI to a (label, description) tuple for every URI of a successfully answered chunk
+    """
+    element_infos = {}
+    for start in range(0, len(uris), LABEL_BATCH_SIZE):
+        chunk = uris[start:start + LABEL_BATCH_SIZE]
+        values = " ".join(f"<{uri}>" for uri in chunk)
+        query = f"""
+            PREFIX schema: <http://schema.org/>
+            SELECT ?item ?label ?description WHERE {{
+                VALUES ?item {{ {values} }}
+                OPTIONAL {{
+                    ?item rdfs:label ?label .
+                    FILTER(langmatches(lang(?label), "en"))
+                }}
+                OPTIONAL {{
+                    ?item schema:description ?description .
+                    FILTER(langmatches(lang(?description), "en"))
+                }}
+            }}
+        """
+        results = send_query(query)
+        if not results:
+            # Failed chunks are not cached, so they are retried on the next lookup
+            continue
+        labels = {}
+        descriptions = {}
+        for binding in results["results"]["bindings"]:
+            uri = binding["item"]["value"]
+            if "label" in binding:
+                labels.setdefault(uri, binding["label"]["value"])
+            if "description" in binding:
+                descriptions.setdefault(uri, binding["description"]["value"])
+        for uri in chunk:
+            element_infos[uri] = (
+                labels.get(uri, "No Label Found"),
+                descriptions.get(uri, "No Description Found")
+            )
+    return element_infos
+
+def get_element_infos_batch(uris):
+    """Resolve the labels and descriptions of multiple URIs using Redis and batched SPARQL queries
+
+    All URIs are looked up in Redis in one pipeline. Missing URIs are resolved with one VALUES query per chunk
+    of LABEL_BATCH_SIZE URIs and written back to Redis in one pipeline. With the snapshot backend, all URIs
+    are read from the snapshot instead.
+
+    Args:
+        uris (list): The URIs to resolve, may contain duplicates
+
+    Returns:
+        dict: Mapping of every unique URI to a dict with "label" and "description"
+    """
+    unique_uris = list(dict.fromkeys(uris))
+    valid_uris = [uri for uri in unique_uris if isinstance(uri, str) and VALID_IRI_PATTERN.match(uri)]
+    element_infos = {uri: {} for uri in unique_uris}
+    if WIKIDATA_BACKEND == "snapshot":
+        cached_infos = get_wikidata_snapshot().get_element_infos(valid_uris)
+    else:
+        cached_infos = get_element_infos(valid_uris)
+    for uri, cached_info in zip(valid_uris, cached_infos):
+        element_infos[uri] = cached_info
+
+    missing = [uri for uri in valid_uris
+               if "label" not in element_infos[uri] or "description" not in element_infos[uri]]
+    if missing and WIKIDATA_BACKEND != "snapshot":
+        fetched = fetch_element_infos_from_sparql(missing)
+        upload = {}
+        for uri, (label, description) in fetched.items():
+            # Keep the values that were already cached, like get_label and get_description do
+            label = element_infos[uri].get("label", label)
+            description = element_infos[uri].get("description", description)
+            element_infos[uri] = {"label": label, "description": description}
+            upload[uri] = (label, description)
+        if upload:
+            element_infos_upload(upload)
+
+    return {
+        uri: {
+            "label": info.get("label", "No Label Found"),
+            "description": info.get("description", "No Description Found")
+        }
+        for uri, info in element_infos.items()
+    }
+
+def get_labels(uris):
+    """Batched version of get_label
+
+    Args:
+        uris (list): The URIs to get the labels for
+
+    Returns:
+        list: The label of every URI, in the same order as uris
+    """
+    element_infos = get_element_infos_batch(uris)
+    return [element_infos[uri]["label"] for uri in uris]
+
+def get_descriptions(uris):
+    """Batched version of get_description
+
+    Args:
+        uris (list): The URIs to get the descriptions for
+
+    Returns:
+        list: The description of every URI, in the same order as uris
+    """
+    element_infos = get_element_infos_batch(uris)
+    return [element_infos[uri]["description"] for uri in uris]
+
+def fetch_uri_labels_from_sparql(uris):
+    """Helper function to check the existence of multiple URIs and fetch their labels and descriptions with one
+    VALUES query per chunk, querying up to LABEL_FETCH_WORKERS chunks concurrently
+
+    Args:
+        uris (list): The URIs to resolve, which have to be valid IRIs
+
+    Returns:
+        dict: Mapping of URI to an (exists, label, description) tuple for every URI of a successfully answered chunk
+    """
+    def fetch_chunk(chunk):
+        values = " ".join(f"<{uri}>" for uri in chunk)
+        query = f"""
+            PREFIX schema: <http://schema.org/>
+            SELECT ?item ?exists ?label ?description WHERE {{
+                VALUES ?item {{ {values} }}
+                BIND(EXISTS {{ ?item ?p ?o . }} AS ?exists)
+                OPTIONAL {{
+                    ?item rdfs:label ?label .
+                    FILTER(langmatches(lang(?label), "en"))
+                }}
+                OPTIONAL {{
+                    ?item schema:description ?description .
+                    FILTER(langmatches(lang(?description), "en"))
+                }}
+            }}
+        """
+        results = send_query(query)
+        if not results:
+            return {}
+        existing = set()
+        labels = {}
+        descriptions = {}
+        for binding in results["results"]["bindings"]:
+            uri = binding["item"]["value"]
+            if binding.get("exists", {}).get("value") in ("true", "1"):
+                existing.add(uri)
+            if "label" in binding:
+                labels.setdefault(uri, binding["label"]["value"])
+            if "description" in binding:
+                descriptions.setdefault(uri, binding["description"]["value"])
+        return {
+            uri: (uri in existing, labels.get(uri, "No Label Found"), descriptions.get(uri, "No Description Found"))
+            for uri in chunk
+        }
+
+    chunks = [uris[start:start + LABEL_BATCH_SIZE] for start in range(0, len(uris), LABEL_BATCH_SIZE)]
+    uri_labels = {}
+    if len(chunks) == 1:
+        uri_labels.update(fetch_chunk(chunks[0]))
+    elif chunks:
+        with ThreadPoolExecutor(max_workers=LABEL_FETCH_WORKERS) as executor:
+            for chunk_labels in executor.map(fetch_chunk, chunks):
+                uri_labels.update(chunk_labels)
+    return uri_labels
+
+def get_uri_labels(uris):
+    """Check whether multiple URIs exist and get their English labels, using Redis and batched SPARQL queries
+
+    URIs with a cached label are known to exist and are answered from Redis. The other URIs are resolved with
+    fetch_uri_labels_from_sparql, and the infos of the existing ones are written back to Redis like in
+    get_element_infos_batch. With the snapshot backend, a URI exists if it is part of the snapshot.
+
+    Args:
+        uris (list): The URIs to resolve, may contain duplicates and values that are no IRIs
+
+    Returns:
+        dict: Mapping of every unique URI to an (exists, label) tuple, where label is None if the URI has no
+              English label. URIs of failed queries are reported as not existing.
+    """
+    unique_uris = list(dict.fromkeys(uris))
+    valid_uris = [uri for uri in unique_uris if isinstance(uri, str) and VALID_IRI_PATTERN.match(uri)]
+    uri_labels = {uri: (False, None) for uri in unique_uris}
+    if WIKIDATA_BACKEND == "snapshot":
+        for uri, info in zip(valid_uris, get_wikidata_snapshot().get_element_infos(valid_uris)):
+            if info:
+                label = info.get("label", "No Label Found")
+                uri_labels[uri] = (True, None if label == "No Label Found" else label)
+        return uri_labels
+
+    cached_infos = dict(zip(valid_uris, get_element_infos(valid_uris)))
+    missing = []
+    for uri in valid_uris:
+        label = cached_infos[uri].get("label", "No Label Found")
+        if label == "No Label Found":
+            missing.append(uri)
+        else:
+            uri_labels[uri] = (True, label)
+
+    if missing:
+        upload = {}
+        for uri, (exists, label, description) in fetch_uri_labels_from_sparql(missing).items():
+            if not exists:
+                continue
+            uri_labels[uri] = (True, None if label == "No Label Found" else label)
+            upload[uri] = (label, cached_infos[uri].get("description", description))
+        if upload:
+            element_infos_upload(upload)
+    return uri_labels
+
 def fetch_label_from_sparql(uri):
     """Helper function to fetch a label directly from SPARQL without Redis checks"""
     query = f"""
@@ -111,6 +359,10 @@ def fetch_description_from_sparql(uri):
         return "No Description Found"
 
 def get_types(uri, output_uri=False):
+    if WIKIDATA_BACKEND == "snapshot":
+        type_uris = get_wikidata_snapshot().get_objects(uri, "P31")
+        return type_uris if output_uri else [get_label(type_uri) for type_uri in type_uris]
+
     query = f"""
         SELECT ?o WHERE {{
             <{uri}> wdt:P31 ?o .
@@ -128,7 +380,44 @@ def get_types(uri, output_uri=False):
     except Exception:
         return ["No Types Found"]
 
+def get_types_batch(uris):
+    """Batched version of get_types with output_uri=True, using one VALUES query per chunk of LABEL_BATCH_SIZE URIs
+
+    Args:
+        uris (list): The URIs to get the types for
+
+    Returns:
+        dict: Mapping of every unique URI to the list of its type URIs, empty for values that are no IRIs and
+              for URIs of failed queries
+    """
+    unique_uris = list(dict.fromkeys(uris))
+    types = {uri: [] for uri in unique_uris}
+    valid_uris = [uri for uri in unique_uris if isinstance(uri, str) and VALID_IRI_PATTERN.match(uri)]
+    if WIKIDATA_BACKEND == "snapshot":
+        snapshot = get_wikidata_snapshot()
+        for uri in valid_uris:
+            types[uri] = snapshot.get_objects(uri, "P31")
+        return types
+
+    for start in range(0, len(valid_uris), LABEL_BATCH_SIZE):
+        values = " ".join(f"<{uri}>" for uri in valid_uris[start:start + LABEL_BATCH_SIZE])
+        query = f"""
+            SELECT ?item ?o WHERE {{
+                VALUES ?item {{ {values} }}
+                ?item wdt:P31 ?o .
+            }}
+        """
+        results = send_query(query)
+        if not results:
+            continue
+        for binding in results["results"]["bindings"]:
+            types[binding["item"]["value"]].append(binding["o"]["value"])
+    return types
+
 def get_superclasses(uri):
+    if WIKIDATA_BACKEND == "snapshot":
+        return [get_label(class_uri) for class_uri in get_wikidata_snapshot().get_objects(uri, "P279")]
+
     query = f"""
             SELECT ?o WHERE {{
                 <{uri}> wdt:P279 ?o .
@@ -160,6 +449,9 @@ def get_property_example(property_uri):
     # Ensure we have just the P-number
     if not property_id.startswith('P'):
         property_id = f"P{property_id}" if property_id.isdigit() else property_id
+
+    if WIKIDATA_BACKEND == "snapshot":
+        return get_wikidata_snapshot().get_property_example(f"http://www.wikidata.org/entity/{property_id}")
     
     # Construct the SPARQL query to find examples
     query = f"""
@@ -194,5 +486,27 @@ def get_property_example(property_uri):
     except (IndexError, KeyError):
         return {}
 
+def get_property_examples(property_uris):
+    """
+    Batched version of get_property_example, with one query per chunk of properties
+
+    Args:
+        property_uris (list): The full URIs of the properties
+
+    Returns:
+        dict: Mapping of every property URI to its example as returned by get_property_example
+    """
+    property_uris = list(dict.fromkeys(property_uris))
+    if WIKIDATA_BACKEND == "snapshot":
+        snapshot = get_wikidata_snapshot()
+        return {uri: snapshot.get_property_example(uri) for uri in property_uris}
+
+    fetched = fetch_property_examples([uri for uri in property_uris if VALID_IRI_PATTERN.match(uri)])
+    return {
+        uri: dict(zip(["subject_uri", "subject_label", "object_uri", "object_label"], fetched[uri]))
+        if uri in fetched else {}
+        for uri in property_uris
+    }
+
 if __name__ == "__main__":
     print(get_property_example("http://www.wikidata.org/entity/P17"))
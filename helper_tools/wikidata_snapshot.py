@@ -0,0 +1,416 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+WIKIDATA_SNAPSHOT_PATH = Path(__file__).parent.parent / "infrastructure" / "wikidata_snapshot.sqlite"
+
+WIKIDATA_ENTITY_PREFIX = "http://www.wikidata.org/entity/"
+SUBJECT_TYPE_CONSTRAINT = "http://www.wikidata.org/entity/Q21503250"
+VALUE_TYPE_CONSTRAINT = "http://www.wikidata.org/entity/Q21510865"
+
+SNAPSHOT_BATCH_SIZE = 100
+EXAMPLE_BATCH_SIZE = 25
+
+SCHEMA = """
+    CREATE TABLE elements (
+        uri TEXT PRIMARY KEY,
+        label TEXT NOT NULL,
+        description TEXT NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE edges (
+        subject TEXT NOT NULL,
+        predicate TEXT NOT NULL,
+        object TEXT NOT NULL,
+        PRIMARY KEY (subject, predicate, object)
+    ) WITHOUT ROWID;
+    CREATE TABLE type_constraints (
+        property TEXT NOT NULL,
+        constraint_type TEXT NOT NULL,
+        class_uri TEXT NOT NULL,
+        PRIMARY KEY (property, constraint_type, class_uri)
+    ) WITHOUT ROWID;
+    CREATE TABLE property_examples (
+        property TEXT PRIMARY KEY,
+        subject_uri TEXT NOT NULL,
+        subject_label TEXT NOT NULL,
+        object_uri TEXT NOT NULL,
+        object_label TEXT NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    ) WITHOUT ROWID;
+"""
+
+
+class WikidataSnapshot:
+    """
+    Read-only, memory-mapped SQLite snapshot of the Wikidata labels, descriptions, P31/P279 edges, P2302 type
+    constraints and P1855 property examples of the entity/predicate universe of our datasets
+    """
+    def __init__(self, path=WIKIDATA_SNAPSHOT_PATH):
+        """
+        Initialize the snapshot
+
+        Args:
+            path (str, optional): Path to the SQLite snapshot. Defaults to infrastructure/wikidata_snapshot.sqlite.
+        """
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(
+                f"Wikidata snapshot {self.path} not found, build it with python -m helper_tools.wikidata_snapshot"
+            )
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        """SQLite connection of the current thread, as connections must not be shared between threads"""
+        if not hasattr(self._local, "connection"):
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            connection.execute("PRAGMA mmap_size = 1073741824")
+            self._local.connection = connection
+        return self._local.connection
+
+    def get_element_info(self, uri):
+        """
+        Get the label and description of a URI, in the format of redis_handler.get_element_info
+
+        Args:
+            uri (str): The URI to look up
+
+        Returns:
+            dict: The label and description if found, empty dict if not found
+        """
+        row = self.connection.execute("SELECT label, description FROM elements WHERE uri = ?", (uri,)).fetchone()
+        if row is None:
+            return {}
+        return {"label": row[0], "description": row[1]}
+
+    def get_element_infos(self, uris):
+        """
+        Get the labels and descriptions of multiple URIs
+
+        Args:
+            uris (list): The URIs to look up
+
+        Returns:
+            list: The info of every URI in the same order, empty dicts for URIs that are not found
+        """
+        return [self.get_element_info(uri) for uri in uris]
+
+    def get_objects(self, uri, predicate):
+        """
+        Get the objects of the P31 or P279 edges of a URI
+
+        Args:
+            uri (str): The subject URI
+            predicate (str): "P31" or "P279"
+
+        Returns:
+            list: The object URIs
+        """
+        rows = self.connection.execute(
+            "SELECT object FROM edges WHERE subject = ? AND predicate = ?", (uri, predicate)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def is_subclass(self, class_uri, superclass_uri):
+        """
+        Check whether class_uri wdt:P279* superclass_uri holds
+
+        Args:
+            class_uri (str): URI of the potential subclass
+            superclass_uri (str): URI of the potential superclass
+
+        Returns:
+            bool: True if the classes are equal or superclass_uri is reachable over P279 edges
+        """
+        row = self.connection.execute(
+            """
+            WITH RECURSIVE ancestors(uri) AS (
+                SELECT ?
+                UNION
+                SELECT edges.object FROM edges JOIN ancestors ON edges.subject = ancestors.uri
+                WHERE edges.predicate = 'P279'
+            )
+            SELECT 1 FROM ancestors WHERE uri = ? LIMIT 1
+            """,
+            (class_uri, superclass_uri)
+        ).fetchone()
+        return row is not None
+
+    def get_type_constraints(self, property_uri, constraint_type):
+        """
+        Get the classes of the subject or value type constraints of a property
+
+        Args:
+            property_uri (str): URI of the property
+            constraint_type (str): "subject" or "value"
+
+        Returns:
+            list: (class_uri, class_label) tuples, where the label falls back to the URI
+        """
+        rows = self.connection.execute(
+            """
+            SELECT type_constraints.class_uri, elements.label FROM type_constraints
+            LEFT JOIN elements ON elements.uri = type_constraints.class_uri
+            WHERE type_constraints.property = ? AND type_constraints.constraint_type = ?
+            """,
+            (property_uri, constraint_type)
+        ).fetchall()
+        return [
+            (class_uri, label if label and label != "No Label Found" else class_uri)
+            for class_uri, label in rows
+        ]
+
+    def get_property_example(self, property_uri):
+        """
+        Get the example usage of a property, in the format of wikidata_loader.get_property_example
+
+        Args:
+            property_uri (str): URI of the property
+
+        Returns:
+            dict: Example subject and object with their labels, or empty dict if no example is known
+        """
+        row = self.connection.execute(
+            "SELECT subject_uri, subject_label, object_uri, object_label FROM property_examples WHERE property = ?",
+            (property_uri,)
+        ).fetchone()
+        if row is None:
+            return {}
+        return dict(zip(["subject_uri", "subject_label", "object_uri", "object_label"], row))
+
+
+_wikidata_snapshot = None
+_wikidata_snapshot_lock = threading.Lock()
+
+
+def get_wikidata_snapshot():
+    """
+    Get the process-wide Wikidata snapshot, opening it on first use
+
+    Returns:
+        WikidataSnapshot: The snapshot at WIKIDATA_SNAPSHOT_PATH
+    """
+    global _wikidata_snapshot
+    with _wikidata_snapshot_lock:
+        if _wikidata_snapshot is None:
+            _wikidata_snapshot = WikidataSnapshot(os.getenv("WIKIDATA_SNAPSHOT_PATH", WIKIDATA_SNAPSHOT_PATH))
+    return _wikidata_snapshot
+
+
+def _values(uris):
+    return " ".join(f"<{uri}>" for uri in uris)
+
+
+def _query_chunks(uris, build_query, batch_size=SNAPSHOT_BATCH_SIZE):
+    """Yield the bindings of one VALUES query per chunk of uris, skipping failed chunks"""
+    from helper_tools.wikidata_loader import send_query
+    for start in range(0, len(uris), batch_size):
+        results = send_query(build_query(_values(uris[start:start + batch_size])))
+        if not results:
+            logger.warning(f"Query for {len(uris[start:start + batch_size])} URIs failed, skipping them")
+            continue
+        yield from results["results"]["bindings"]
+
+
+def fetch_edges(uris, predicate):
+    """
+    Fetch the P31 or P279 edges of multiple URIs from Wikidata
+
+    Args:
+        uris (list): The subject URIs
+        predicate (str): "P31" or "P279"
+
+    Returns:
+        set: (subject, predicate, object) tuples
+    """
+    bindings = _query_chunks(uris, lambda values: f"""
+        SELECT ?item ?o WHERE {{
+            VALUES ?item {{ {values} }}
+            ?item wdt:{predicate} ?o .
+        }}
+    """)
+    return {(binding["item"]["value"], predicate, binding["o"]["value"]) for binding in bindings}
+
+
+def fetch_type_constraints(property_uris):
+    """
+    Fetch the subject and value type constraints of multiple properties from Wikidata
+
+    Args:
+        property_uris (list): The property URIs
+
+    Returns:
+        set: (property, constraint_type, class_uri) tuples
+    """
+    bindings = _query_chunks(property_uris, lambda values: f"""
+        SELECT ?property ?constraintType ?class WHERE {{
+            VALUES ?property {{ {values} }}
+            VALUES ?constraintType {{ wd:Q21503250 wd:Q21510865 }}
+            ?property p:P2302 ?cs .
+            ?cs ps:P2302 ?constraintType .
+            ?cs pq:P2308 ?class .
+        }}
+    """)
+    return {
+        (
+            binding["property"]["value"],
+            "subject" if binding["constraintType"]["value"] == SUBJECT_TYPE_CONSTRAINT else "value",
+            binding["class"]["value"]
+        )
+        for binding in bindings
+    }
+
+
+def fetch_property_examples(property_uris):
+    """
+    Fetch one P1855 example usage per property from Wikidata, like wikidata_loader.get_property_example
+
+    Args:
+        property_uris (list): The property URIs
+
+    Returns:
+        dict: Mapping of property URI to (subject_uri, subject_label, object_uri, object_label)
+    """
+    bindings = _query_chunks(property_uris, lambda values: f"""
+        SELECT ?property ?exampleSubject ?exampleSubjectLabel ?exampleObject ?exampleObjectLabel WHERE {{
+            VALUES ?property {{ {values} }}
+            ?property wikibase:directClaim ?directClaim .
+            ?property wdt:P1855 ?exampleSubject .
+            ?exampleSubject ?directClaim ?exampleObject .
+            SERVICE wikibase:label {{
+                bd:serviceParam wikibase:language "en" .
+                ?exampleSubject rdfs:label ?exampleSubjectLabel .
+                ?exampleObject rdfs:label ?exampleObjectLabel .
+            }}
+        }}
+    """, batch_size=EXAMPLE_BATCH_SIZE)
+    examples = {}
+    for binding in bindings:
+        try:
+            example = (
+                binding["exampleSubject"]["value"],
+                binding["exampleSubjectLabel"]["value"],
+                binding["exampleObject"]["value"],
+                binding["exampleObjectLabel"]["value"],
+            )
+        except KeyError:
+            continue
+        examples.setdefault(binding["property"]["value"], example)
+    return examples
+
+
+def build_snapshot(uris, path=WIKIDATA_SNAPSHOT_PATH):
+    """
+    Build a Wikidata snapshot for a set of entity and property URIs.
+
+    Besides the given URIs, the snapshot contains all classes reachable over P31 and P279 edges and all classes
+    of the type constraints, so validate_triple can run on the snapshot alone.
+
+    Args:
+        uris: Iterable of Wikidata entity and property URIs
+        path (str, optional): Path of the SQLite snapshot. Defaults to infrastructure/wikidata_snapshot.sqlite.
+    """
+    from helper_tools.wikidata_loader import fetch_element_infos_from_sparql
+
+    uris = sorted({uri for uri in uris if isinstance(uri, str) and uri.startswith(WIKIDATA_ENTITY_PREFIX)})
+    property_uris = [uri for uri in uris if uri.startswith(WIKIDATA_ENTITY_PREFIX + "P")]
+    entity_uris = [uri for uri in uris if not uri.startswith(WIKIDATA_ENTITY_PREFIX + "P")]
+    logger.info(f"Building Wikidata snapshot for {len(entity_uris)} entities and {len(property_uris)} properties")
+
+    edges = fetch_edges(entity_uris, "P31")
+    type_constraints = fetch_type_constraints(property_uris)
+    logger.info(f"Fetched {len(edges)} P31 edges and {len(type_constraints)} type constraints")
+
+    # Follow P279 until all superclasses of the types and constraint classes are known
+    visited = set()
+    frontier = {edge[2] for edge in edges} | {constraint[2] for constraint in type_constraints}
+    while frontier:
+        visited |= frontier
+        superclass_edges = fetch_edges(sorted(frontier), "P279")
+        edges |= superclass_edges
+        frontier = {edge[2] for edge in superclass_edges} - visited
+    logger.info(f"Fetched the P279 closure of {len(visited)} classes")
+
+    examples = fetch_property_examples(property_uris)
+    logger.info(f"Fetched examples of {len(examples)} properties")
+
+    element_infos = fetch_element_infos_from_sparql(sorted(set(uris) | visited))
+    logger.info(f"Fetched labels and descriptions of {len(element_infos)} elements")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    connection = sqlite3.connect(tmp_path)
+    connection.executescript(SCHEMA)
+    with connection:
+        connection.executemany(
+            "INSERT INTO elements VALUES (?, ?, ?)",
+            ((uri, label, description) for uri, (label, description) in element_infos.items())
+        )
+        connection.executemany("INSERT INTO edges VALUES (?, ?, ?)", sorted(edges))
+        connection.executemany("INSERT INTO type_constraints VALUES (?, ?, ?)", sorted(type_constraints))
+        connection.executemany(
+            "INSERT INTO property_examples VALUES (?, ?, ?, ?, ?)",
+            ((uri, *example) for uri, example in examples.items())
+        )
+        connection.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [("seed_uris", str(len(uris))), ("elements", str(len(element_infos))), ("edges", str(len(edges)))]
+        )
+    connection.execute("VACUUM")
+    connection.close()
+    # Swap the finished snapshot in, so readers never see a partially written file
+    os.replace(tmp_path, path)
+    logger.info(f"Wikidata snapshot written to {path}")
+
+
+def dataset_uris(dataset, split, number_of_samples):
+    """
+    Collect the entity and predicate URIs of a dataset split
+
+    Args:
+        dataset (str): Name of the dataset, as accepted by parser.unified_parser
+        split (str): Dataset split
+        number_of_samples (int): Number of documents to parse, None or -1 for all
+
+    Returns:
+        set: The URIs of the subjects, predicates, objects and entities of the split
+    """
+    from helper_tools.parser import unified_parser
+    if number_of_samples is not None and number_of_samples < 0:
+        number_of_samples = None
+    relation_df, entity_df, docs = unified_parser(dataset, split, number_of_samples, upload=False)
+    return set(relation_df["subject_uri"]) | set(relation_df["predicate_uri"]) | \
+        set(relation_df["object_uri"]) | set(entity_df["entity_uri"])
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Build the offline Wikidata snapshot used by WIKIDATA_BACKEND=snapshot")
+    arg_parser.add_argument("--dataset", type=str, nargs="+", required=True, help="Datasets, e.g. synthie_code rebel")
+    arg_parser.add_argument("--split", type=str, nargs="+", default=["test"], help="Splits of every dataset")
+    arg_parser.add_argument("--num_samples", type=int, required=True, help="Number of samples of every split, -1 for all")
+    arg_parser.add_argument("--uris_file", type=str, help="Optional file with additional URIs, one per line")
+    arg_parser.add_argument("--output", type=str, default=str(WIKIDATA_SNAPSHOT_PATH), help="Path of the snapshot")
+    args = arg_parser.parse_args()
+
+    snapshot_uris = set()
+    for dataset in args.dataset:
+        for split in args.split:
+            snapshot_uris |= dataset_uris(dataset, split, args.num_samples)
+    if args.uris_file:
+        with open(args.uris_file) as f:
+            snapshot_uris |= {line.strip() for line in f if line.strip()}
+
+    build_snapshot(snapshot_uris, args.output)
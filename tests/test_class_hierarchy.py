@@ -0,0 +1,118 @@
+import random
+
+import pytest
+
+from helper_tools.class_hierarchy import WIKIDATA_ITEM_PREFIX, ClassHierarchy
+
+
+def uri(qid):
+    return f"{WIKIDATA_ITEM_PREFIX}{qid}"
+
+
+def brute_force_is_subclass(edges, sub_qid, super_qid):
+    """rdfs:subClassOf* by a plain breadth-first search over the edge list"""
+    if sub_qid == super_qid:
+        return True
+    superclasses = {}
+    for sub, sup in edges:
+        superclasses.setdefault(sub, set()).add(sup)
+    reached = set()
+    frontier = [sub_qid]
+    while frontier:
+        current = frontier.pop()
+        for sup in superclasses.get(current, ()):
+            if sup == super_qid:
+                return True
+            if sup not in reached:
+                reached.add(sup)
+                frontier.append(sup)
+    return False
+
+
+def random_edges(seed, classes=60, edges=150):
+    rng = random.Random(seed)
+    qids = rng.sample(range(1, 10 ** 6), classes)
+    return [(rng.choice(qids), rng.choice(qids)) for _ in range(edges)]
+
+
+def assert_matches_brute_force(hierarchy, edges):
+    qids = sorted({qid for edge in edges for qid in edge})
+    for sub_qid in qids:
+        for super_qid in qids:
+            assert hierarchy.is_subclass(uri(sub_qid), uri(super_qid)) == \
+                brute_force_is_subclass(edges, sub_qid, super_qid), (sub_qid, super_qid)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_is_subclass_matches_brute_force(seed):
+    edges = random_edges(seed)
+    sub_qids, super_qids = zip(*edges)
+    assert_matches_brute_force(ClassHierarchy.from_edges(sub_qids, super_qids), edges)
+
+
+def test_is_subclass_with_cycles():
+    # 1 -> 2 -> 3 -> 1 is a cycle, 3 -> 4 leaves it, 5 -> 2 enters it
+    edges = [(1, 2), (2, 3), (3, 1), (3, 4), (5, 2)]
+    sub_qids, super_qids = zip(*edges)
+    hierarchy = ClassHierarchy.from_edges(sub_qids, super_qids)
+
+    assert hierarchy.is_subclass(uri(1), uri(3))
+    assert hierarchy.is_subclass(uri(3), uri(2))
+    assert hierarchy.is_subclass(uri(5), uri(4))
+    assert not hierarchy.is_subclass(uri(4), uri(1))
+    assert not hierarchy.is_subclass(uri(1), uri(5))
+    assert_matches_brute_force(hierarchy, edges)
+
+
+def test_is_subclass_with_memoized_ancestors():
+    edges = random_edges(42)
+    sub_qids, super_qids = zip(*edges)
+    hierarchy = ClassHierarchy.from_edges(sub_qids, super_qids)
+    # The second pass is answered from the memoized ancestor sets
+    assert_matches_brute_force(hierarchy, edges)
+    assert hierarchy._ancestors
+    assert_matches_brute_force(hierarchy, edges)
+
+
+def test_is_subclass_with_unknown_uris():
+    hierarchy = ClassHierarchy.from_edges([1, 2], [2, 3])
+
+    assert not hierarchy.is_subclass(uri(1), uri(99))
+    assert not hierarchy.is_subclass(uri(99), uri(3))
+    assert not hierarchy.is_subclass("http://www.wikidata.org/entity/P31", uri(3))
+    assert not hierarchy.is_subclass("http://www.wikidata.org/entity/Qfoo", uri(3))
+    assert not hierarchy.is_subclass("not a uri", uri(3))
+    # Equal URIs are reflexively subclasses, even if they are not part of the hierarchy
+    assert hierarchy.is_subclass(uri(99), uri(99))
+
+
+def test_save_and_open_round_trip(tmp_path):
+    edges = random_edges(7)
+    sub_qids, super_qids = zip(*edges)
+    hierarchy = ClassHierarchy.from_edges(sub_qids, super_qids)
+    hierarchy.save(tmp_path / "classes.index", source_mtime=123.0)
+
+    opened = ClassHierarchy.open(tmp_path / "classes.index")
+
+    for name in ("qids", "indptr", "indices"):
+        assert getattr(opened, name).tolist() == getattr(hierarchy, name).tolist()
+        assert getattr(opened, name).filename is not None  # memory-mapped
+    assert_matches_brute_force(opened, edges)
+
+
+def test_load_builds_and_reuses_index(tmp_path):
+    path = tmp_path / "classes.nt"
+    path.write_text(
+        f"<{uri(1)}> <http://www.wikidata.org/prop/direct/P279> <{uri(2)}> .\n"
+        f"<{uri(2)}> <http://www.w3.org/2000/01/rdf-schema#subClassOf> <{uri(3)}> .\n"
+        f"<{uri(3)}> <http://www.w3.org/2000/01/rdf-schema#label> \"label\"@en .\n"
+    )
+
+    hierarchy = ClassHierarchy.load(path)
+    assert (tmp_path / "classes.index" / "meta.json").exists()
+    assert hierarchy.is_subclass(uri(1), uri(3))
+
+    reloaded = ClassHierarchy.load(path)
+    assert reloaded.qids.tolist() == [1, 2, 3]
+    assert reloaded.is_subclass(uri(1), uri(3))
+    assert not reloaded.is_subclass(uri(3), uri(1))
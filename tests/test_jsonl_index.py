@@ -0,0 +1,46 @@
+import json
+import random
+
+import pytest
+
+from helper_tools.jsonl_index import JsonlIndex
+
+
+def write_jsonl(path, docids):
+    with open(path, "w") as f:
+        for docid in docids:
+            f.write(json.dumps({"docid": docid, "text": f"text {docid}"}) + "\n")
+
+
+@pytest.fixture
+def shuffled_index(tmp_path):
+    docids = list(range(1, 51))
+    random.Random(0).shuffle(docids)
+    path = tmp_path / "shuffled.jsonl"
+    write_jsonl(path, docids)
+    return JsonlIndex.load(str(path)), docids
+
+
+@pytest.mark.parametrize("number_of_samples", [None, -1, 50, 100])
+def test_head_reads_all_records(shuffled_index, number_of_samples):
+    index, docids = shuffled_index
+    assert [record["docid"] for record in index.head(number_of_samples)] == sorted(docids)
+
+
+def test_head_with_start(shuffled_index):
+    index, _ = shuffled_index
+    assert [record["docid"] for record in index.head(3, start=5)] == [6, 7, 8]
+    assert [record["docid"] for record in index.head(-1, start=47)] == [48, 49, 50]
+
+
+@pytest.mark.parametrize("number_of_samples", [0, 1, 7, 49])
+def test_file_positions_of_first_records(shuffled_index, number_of_samples):
+    index, docids = shuffled_index
+    positions = index.file_positions(number_of_samples)
+    assert index.docids[positions].tolist() == docids[:number_of_samples]
+
+
+@pytest.mark.parametrize("number_of_samples", [None, -1, 50, 100])
+def test_file_positions_of_all_records(shuffled_index, number_of_samples):
+    index, docids = shuffled_index
+    assert index.docids[index.file_positions(number_of_samples)].tolist() == docids
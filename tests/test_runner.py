@@ -0,0 +1,66 @@
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("SPARQLWrapper")
+
+from helper_tools.runner import ErrorRow, RunJournal, run_documents
+
+
+@pytest.fixture
+def docs():
+    return pd.DataFrame({"docid": [1, 2, 3], "text": ["a", "b", "c"]})
+
+
+def run(path, docs, process_doc, overwrite=False):
+    journal = RunJournal(path, overwrite=overwrite)
+    results = run_documents(process_doc, docs, journal=journal)
+    journal.close()
+    journal.finish()
+    return results
+
+
+def test_journal_is_removed_after_successful_run(tmp_path, docs):
+    path = str(tmp_path / "journals" / "run.jsonl")
+    assert run(path, docs, lambda doc_id, text: [doc_id, text]) == [[1, "a"], [2, "b"], [3, "c"]]
+    assert not os.path.exists(path)
+
+
+def test_failed_documents_are_processed_again(tmp_path, docs):
+    path = str(tmp_path / "journals" / "run.jsonl")
+    calls = []
+
+    def process_doc(doc_id, text):
+        calls.append(doc_id)
+        return ErrorRow([doc_id, 0]) if doc_id == 2 and calls.count(2) == 1 else [doc_id, 1]
+
+    assert run(path, docs, process_doc) == [[1, 1], [2, 0], [3, 1]]
+    assert os.path.exists(path)
+
+    assert run(path, docs, process_doc) == [[1, 1], [2, 1], [3, 1]]
+    assert sorted(calls) == [1, 2, 2, 3]
+    assert not os.path.exists(path)
+
+
+def test_interrupted_run_is_resumed(tmp_path, docs):
+    path = str(tmp_path / "journals" / "run.jsonl")
+    journal = RunJournal(path)
+    journal.append(1, [1, "journaled"])
+    journal.close()
+    with open(path, "a") as f:
+        f.write('{"doc_id": 2, "ro')  # killed while writing
+
+    calls = []
+    results = run(path, docs, lambda doc_id, text: calls.append(doc_id) or [doc_id, text])
+    assert results == [[1, "journaled"], [2, "b"], [3, "c"]]
+    assert sorted(calls) == [2, 3]
+
+
+def test_overwrite_starts_from_scratch(tmp_path, docs):
+    path = str(tmp_path / "journals" / "run.jsonl")
+    journal = RunJournal(path)
+    journal.append(1, [1, "journaled"])
+    journal.close()
+
+    assert RunJournal(path, overwrite=True).finished == {}